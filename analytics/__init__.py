@@ -0,0 +1,10 @@
+# All analytics modules, imported on first attribute access so that
+# importing one of them doesn't load the rest
+import importlib
+
+__all__ = ["comments", "best_time"]
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
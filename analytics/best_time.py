@@ -0,0 +1,123 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from database.best_time_db import (
+    UNBINNED_POST_COLUMNS,
+    iter_unbinned_posts,
+    fold_best_time_bins,
+    get_best_time_bins
+)
+
+WEEKDAYS = ["Mon", "Tue", "Wed", "Thu", "Fri", "Sat", "Sun"]
+
+# Weights of the previous, same and next hour, and of the same hour on
+# neighbouring days; hours wrap across midnight into the next weekday
+HOUR_KERNEL = (0.25, 0.5, 0.25)
+DAY_WEIGHT = 0.15
+
+# Pseudo-posts at the account average mixed into every slot, so a slot
+# with one lucky post doesn't top the ranking
+PRIOR_POSTS = 2.0
+
+# Seconds a computed heatmap stays cached (refreshes also clear it)
+CACHE_TTL_SECONDS = 3600
+
+def bin_posts(posts):
+    """Per-slot deltas of post count and engagement as two 7x24 arrays"""
+    counts = np.zeros((7, 24))
+    engagement = np.zeros((7, 24))
+    if posts.empty:
+        return counts, engagement
+    
+    posted_at = pd.to_datetime(posts["posted_at"])
+    weekdays = posted_at.dt.dayofweek.to_numpy()
+    hours = posted_at.dt.hour.to_numpy()
+    is_new = posts["binned_engagement"].isna().to_numpy()
+    previous = posts["binned_engagement"].fillna(0).to_numpy(dtype=float)
+    
+    np.add.at(counts, (weekdays, hours), is_new.astype(float))
+    np.add.at(engagement, (weekdays, hours), posts["engagement"].to_numpy(dtype=float) - previous)
+    return counts, engagement
+
+def refresh_best_time_bins(account_id, itersize=None):
+    """Fold new posts and engagement changes into the account's bins
+    
+    Only posts added or re-counted since the last refresh are read, so this
+    is cheap enough to run after every sync. Returns the number of posts
+    folded in.
+    """
+    records = [row for rows in iter_unbinned_posts(account_id, itersize) for row in rows]
+    if not records:
+        return 0
+    
+    def bin_deltas(marked):
+        posts = pd.DataFrame.from_records(
+            [row for row in records if row[0] in marked], columns=UNBINNED_POST_COLUMNS
+        )
+        counts, engagement = bin_posts(posts)
+        weekdays, hours = np.nonzero(counts + np.abs(engagement))
+        return [
+            (int(weekday), int(hour), int(counts[weekday, hour]), int(engagement[weekday, hour]))
+            for weekday, hour in zip(weekdays, hours)
+        ]
+    
+    folded = fold_best_time_bins(account_id, records, bin_deltas)
+    if folded:
+        best_times.clear()
+    return folded
+
+def smooth(grid):
+    """Blend each slot with its neighbouring hours and days"""
+    ring = grid.reshape(-1)
+    ring = HOUR_KERNEL[0] * np.roll(ring, 1) + HOUR_KERNEL[1] * ring + HOUR_KERNEL[2] * np.roll(ring, -1)
+    grid = ring.reshape(7, 24)
+    return (1 - 2 * DAY_WEIGHT) * grid + DAY_WEIGHT * (np.roll(grid, 1, axis=0) + np.roll(grid, -1, axis=0))
+
+def engagement_scores(counts, engagement):
+    """Smoothed expected engagement per post for every slot"""
+    average = engagement.sum() / counts.sum()
+    return (smooth(engagement) + PRIOR_POSTS * average) / (smooth(counts) + PRIOR_POSTS)
+
+def recommended_slots(scores, counts, top=3):
+    """Best slots, at most one per weekday, among those with posting history nearby"""
+    average = scores.mean()
+    supported = smooth(counts) > 0
+    order = np.argsort(np.where(supported, scores, -np.inf), axis=None)[::-1]
+    
+    slots = []
+    days = set()
+    for weekday, hour in zip(*np.unravel_index(order, scores.shape)):
+        if not supported[weekday, hour] or weekday in days:
+            continue
+        days.add(weekday)
+        slots.append({
+            "weekday": WEEKDAYS[weekday],
+            "hour": int(hour),
+            "score": float(scores[weekday, hour]),
+            "lift": float(scores[weekday, hour] / average - 1) if average else 0.0,
+        })
+        if len(slots) == top:
+            break
+    return slots
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def best_times(account_id):
+    """Heatmap of expected engagement by weekday and hour plus the top slots
+    
+    Returns None until the account has posts with engagement binned.
+    """
+    counts = np.zeros((7, 24))
+    engagement = np.zeros((7, 24))
+    for weekday, hour, posts, total in get_best_time_bins(account_id):
+        counts[weekday, hour] = posts
+        engagement[weekday, hour] = total
+    
+    if counts.sum() == 0:
+        return None
+    
+    scores = engagement_scores(counts, engagement)
+    return {
+        "heatmap": pd.DataFrame(scores, index=WEEKDAYS, columns=range(24)),
+        "slots": recommended_slots(scores, counts) if engagement.sum() > 0 else [],
+        "posts": int(counts.sum()),
+    }
@@ -0,0 +1,147 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+from database.account_db import get_account_by_id
+from database.comment_db import COMMENT_CHUNK_COLUMNS, iter_comment_chunks
+from database.post_db import PostRow, iter_posts
+
+# Words of three or more letters
+WORD_PATTERN = r"[^\W\d_]{3,}"
+
+# Common words left out of keyword frequencies
+STOPWORDS = frozenset("""
+    the and for are but not you all any can had her was one our out has have him his how its
+    may new now old see two way who did get got let say she too use that with this from they
+    will would there their what about which when make like time just know take into your some
+    could them than then these want been were very well also here more much only over such
+    thanks thank please yes okay
+""".split())
+
+# Seconds an account's analytics stay cached
+CACHE_TTL_SECONDS = 600
+
+def load_comments(account_id, itersize=None):
+    """Load an account's comments into a DataFrame, one fetched chunk at a time"""
+    frames = [
+        pd.DataFrame.from_records(rows, columns=COMMENT_CHUNK_COLUMNS)
+        for rows in iter_comment_chunks(account_id, itersize)
+    ]
+    if not frames:
+        return pd.DataFrame(columns=COMMENT_CHUNK_COLUMNS).astype({"commented_at": "datetime64[ns]"})
+    
+    comments = pd.concat(frames, ignore_index=True)
+    comments["commented_at"] = pd.to_datetime(comments["commented_at"])
+    comments["author_name"] = comments["author_name"].astype("category")
+    return comments
+
+def load_posts(account_id, itersize=None):
+    """Load an account's posts into a DataFrame"""
+    posts = pd.DataFrame.from_records(iter_posts(account_id, itersize), columns=PostRow._fields)
+    posts["posted_at"] = pd.to_datetime(posts["posted_at"])
+    return posts
+
+def page_authored(comments, page_id):
+    """Boolean mask of comments written by the page itself"""
+    return comments["author_id"].eq(page_id) if page_id else pd.Series(False, index=comments.index)
+
+def volume_over_time(comments, page_id, freq="D"):
+    """Count audience comments and page replies per period"""
+    if comments.empty:
+        return pd.DataFrame(columns=["Audience comments", "Page replies"])
+    
+    source = np.where(page_authored(comments, page_id), "Page replies", "Audience comments")
+    volume = (
+        comments.groupby([pd.Grouper(key="commented_at", freq=freq), source])
+        .size()
+        .unstack(fill_value=0)
+    )
+    return volume.reindex(columns=["Audience comments", "Page replies"], fill_value=0)
+
+def response_stats(comments, page_id):
+    """Share of top-level audience comments the page replied to, and how fast"""
+    by_page = page_authored(comments, page_id)
+    audience = comments[~by_page & comments["parent_id"].isna()]
+    
+    # Earliest page reply under each comment
+    first_reply = comments[by_page & comments["parent_id"].notna()].groupby("parent_id")["commented_at"].min()
+    # reindex rather than map: mapping through an empty datetime Series fails
+    replied_at = pd.Series(first_reply.reindex(audience["id"]).to_numpy(), index=audience.index)
+    delays = (replied_at - audience["commented_at"]).dropna()
+    
+    return {
+        "audience_comments": len(audience),
+        "responded": int(replied_at.notna().sum()),
+        "response_rate": float(replied_at.notna().mean()) if len(audience) else 0.0,
+        "median_response_minutes": delays.median().total_seconds() / 60 if len(delays) else None,
+    }
+
+def commenter_recurrence(comments, page_id):
+    """Per-commenter activity, most active first, plus the share of repeat commenters"""
+    audience = comments[comments["author_id"].notna() & ~page_authored(comments, page_id)]
+    
+    commenters = (
+        audience.groupby("author_id", observed=True)
+        .agg(
+            name=("author_name", "last"),
+            comments=("id", "size"),
+            posts=("post_id", "nunique"),
+            first_seen=("commented_at", "min"),
+            last_seen=("commented_at", "max"),
+        )
+        .sort_values(["comments", "last_seen"], ascending=False)
+    )
+    
+    summary = {
+        "commenters": len(commenters),
+        "repeat_rate": float((commenters["posts"] > 1).mean()) if len(commenters) else 0.0,
+    }
+    return commenters, summary
+
+def keyword_frequencies(comments, page_id, top_n=20):
+    """Most frequent words in audience comments"""
+    text = comments.loc[~page_authored(comments, page_id), "content"].dropna()
+    words = text.str.lower().str.findall(WORD_PATTERN).explode().dropna()
+    words = words[~words.isin(STOPWORDS)]
+    return words.value_counts().head(top_n).rename_axis("keyword").reset_index(name="count")
+
+def post_engagement(comments, posts, page_id):
+    """Reactions, comments and distinct commenters per post, most engaging first"""
+    if posts.empty:
+        return pd.DataFrame(columns=["content", "posted_at", "reactions", "comments", "commenters", "page_replies", "engagement"])
+    
+    by_page = page_authored(comments, page_id)
+    stored = comments.groupby("post_id").agg(stored_comments=("id", "size"), commenters=("author_id", "nunique"))
+    replies = comments[by_page].groupby("post_id").size().rename("page_replies")
+    
+    engagement = posts.set_index("id")[["content", "posted_at", "comment_count", "reaction_count"]].join([stored, replies])
+    engagement[["stored_comments", "commenters", "page_replies"]] = (
+        engagement[["stored_comments", "commenters", "page_replies"]].fillna(0).astype(int)
+    )
+    
+    # Graph totals where synced, otherwise what is stored locally
+    engagement["comments"] = engagement["comment_count"].fillna(engagement["stored_comments"]).astype(int)
+    engagement["reactions"] = engagement["reaction_count"].fillna(0).astype(int)
+    engagement["engagement"] = engagement["comments"] + engagement["reactions"]
+    
+    return engagement[["content", "posted_at", "reactions", "comments", "commenters", "page_replies", "engagement"]].sort_values(
+        "engagement", ascending=False
+    )
+
+@st.cache_data(ttl=CACHE_TTL_SECONDS, show_spinner=False)
+def account_analytics(account_id):
+    """Compute every comment metric for an account (cached per account)"""
+    account = get_account_by_id(account_id)
+    page_id = account["page_id"] if account else None
+    
+    comments = load_comments(account_id)
+    posts = load_posts(account_id)
+    commenters, recurrence = commenter_recurrence(comments, page_id)
+    
+    return {
+        "volume": volume_over_time(comments, page_id),
+        "responses": response_stats(comments, page_id),
+        "commenters": commenters,
+        "recurrence": recurrence,
+        "keywords": keyword_frequencies(comments, page_id),
+        "posts": post_engagement(comments, posts, page_id),
+    }
@@ -1,6 +1,10 @@
 import streamlit as st
-from pages import login, dashboard, accounts, posts, profile
-from utils.session import check_session
+import metrics
+from config import get_setting
+from database import cache
+from database.connection import get_db_connection
+from pages import PAGES, load_page
+from utils.session import check_session, is_admin
 from utils.ui import set_page_config
 
 def main():
@@ -8,6 +12,15 @@ def main():
     # Set page configuration
     set_page_config()
     
+    # Expose hot-path metrics on a local Prometheus endpoint (once per process)
+    if get_setting("metrics_enabled", True):
+        st.session_state.metrics_address = metrics.start_metrics_server(
+            get_setting("metrics_host", "127.0.0.1"), int(get_setting("metrics_port", 9464))
+        )
+    
+    # Evict cached rows that other replicas and workers change (once per process)
+    cache.listener.ensure_running(get_db_connection())
+    
     # Initialize session state if not already done
     if "authenticated" not in st.session_state:
         st.session_state.authenticated = False
@@ -16,8 +29,15 @@ def main():
     
     # Navigation based on authentication status
     if not st.session_state.authenticated:
-        login.show()
+        with metrics.timer("page_render", "Login"):
+            load_page("Login").show()
     else:
+        # Send auto-replies left queued by a previous run (once per process);
+        # imported here so the login page doesn't load the facebook package
+        if get_setting("auto_reply_enabled", True):
+            from facebook import auto_reply
+            auto_reply.dispatcher.ensure_running()
+        
         # Sidebar navigation with improved styling
         with st.sidebar:
             st.markdown("""
@@ -43,8 +63,11 @@ def main():
                 "Dashboard": "📊",
                 "Accounts": "🔗",
                 "Posts": "📝",
+                "Moderation": "🛡️",
                 "Profile": "👤"
             }
+            if is_admin(st.session_state.username):
+                nav_items["Admin"] = "🛠️"
             
             # Get current page from session state or default to Dashboard
             current_page = st.session_state.get("navigation", "Dashboard")
@@ -88,14 +111,9 @@ def main():
         # Display the selected page based on navigation state
         page = st.session_state.get("navigation", "Dashboard")
         
-        if page == "Dashboard":
-            dashboard.show()
-        elif page == "Accounts":
-            accounts.show()
-        elif page == "Posts":
-            posts.show()
-        elif page == "Profile":
-            profile.show()
+        with metrics.timer("page_render", page):
+            if page in PAGES:
+                load_page(page).show()
 
 def logout():
     """Log out the user by clearing session state"""
@@ -0,0 +1,10 @@
+import streamlit as st
+from streamlit.errors import StreamlitSecretNotFoundError
+
+def get_setting(key, default=None):
+    """Get an optional setting from Streamlit secrets, falling back to a default"""
+    try:
+        return st.secrets.get(key, default)
+    except (StreamlitSecretNotFoundError, FileNotFoundError):
+        # No secrets.toml at all (e.g. CLI tools and benchmarks)
+        return default
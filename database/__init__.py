@@ -1,2 +1,10 @@
-# Import all database modules
-from database import connection, user_db, account_db, post_db, comment_db
+# All database modules, imported on first attribute access so that
+# importing one of them doesn't load the rest
+import importlib
+
+__all__ = ["connection", "cache", "user_db", "account_db", "post_db", "comment_db", "moderation_db", "auto_reply_db", "insights_db", "best_time_db"]
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
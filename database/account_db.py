@@ -1,35 +1,42 @@
 from database.connection import get_db_connection
+from database.cache import ACCOUNT, cached, invalidate
 import streamlit as st
+from collections import namedtuple
 from datetime import datetime
 
+# Compact row yielded by iter_accounts()
+AccountRow = namedtuple("AccountRow", [
+    "id", "user_id", "account_name", "access_token", "page_id", "expires_at"
+])
+
 def add_facebook_account(user_id, account_name, access_token, page_id=None, expires_at=None):
     """Add a new Facebook account for a user"""
     db = get_db_connection()
     
-    # Check if account with same name already exists for this user
-    query = """
-        SELECT id FROM fb_accounts 
-        WHERE user_id = %s AND account_name = %s
-    """
-    result = db.execute_single_fetch(query, (user_id, account_name))
-    
-    if result:
-        return False, "An account with this name already exists"
-    
-    # Insert the new account
-    query = """
-        INSERT INTO fb_accounts (user_id, account_name, access_token, page_id, expires_at)
-        VALUES (%s, %s, %s, %s, %s)
-        RETURNING id
-    """
-    result = db.execute_single_fetch(
-        query, (user_id, account_name, access_token, page_id, expires_at)
-    )
-    
-    if result:
-        return True, result[0]
-    else:
+    # Check and insert as one unit, so two sessions of this process can't both pass the check
+    try:
+        with db.transaction():
+            query = """
+                SELECT id FROM fb_accounts 
+                WHERE user_id = %s AND account_name = %s
+            """
+            if db.execute_single_fetch(query, (user_id, account_name)):
+                return False, "An account with this name already exists"
+            
+            # Insert the new account
+            query = """
+                INSERT INTO fb_accounts (user_id, account_name, access_token, page_id, expires_at)
+                VALUES (%s, %s, %s, %s, %s)
+                RETURNING id
+            """
+            result = db.execute_single_fetch(
+                query, (user_id, account_name, access_token, page_id, expires_at)
+            )
+    except Exception as e:
+        st.error(f"Query execution error: {e}")
         return False, "Failed to add Facebook account"
+    
+    return True, result[0]
 
 def get_user_facebook_accounts(user_id):
     """Get all Facebook accounts for a user"""
@@ -58,6 +65,15 @@ def get_user_facebook_accounts(user_id):
 
 def get_account_by_id(account_id, user_id=None):
     """Get Facebook account by ID, optionally checking user ownership"""
+    account = load_account(account_id)
+    
+    if account and user_id and account["user_id"] != user_id:
+        return None
+    return account
+
+@cached(ACCOUNT)
+def load_account(account_id):
+    """Read an account row, through the entity cache"""
     db = get_db_connection()
     
     query = """
@@ -65,13 +81,7 @@ def get_account_by_id(account_id, user_id=None):
         FROM fb_accounts
         WHERE id = %s
     """
-    params = (account_id,)
-    
-    if user_id:
-        query += " AND user_id = %s"
-        params = (account_id, user_id)
-    
-    result = db.execute_single_fetch(query, params)
+    result = db.execute_single_fetch(query, (account_id,))
     
     if result:
         return {
@@ -126,6 +136,7 @@ def update_facebook_account(account_id, user_id, account_name=None, access_token
     success = db.execute_query(query, params)
     
     if success:
+        invalidate(ACCOUNT, account_id)
         return True, "Account updated successfully"
     else:
         return False, "Failed to update account"
@@ -144,6 +155,7 @@ def delete_facebook_account(account_id, user_id):
     success = db.execute_query(query, (account_id, user_id))
     
     if success:
+        invalidate(ACCOUNT, account_id)
         return True, "Account deleted successfully"
     else:
         return False, "Failed to delete account"
@@ -161,3 +173,23 @@ def is_token_expired(account_id):
     
     # If no expiration date is set, assume it's not expired
     return False
+
+def iter_accounts(user_id=None, itersize=None):
+    """Lazily iterate over Facebook accounts (of one user, or all) as AccountRow tuples"""
+    db = get_db_connection()
+    
+    query = """
+        SELECT id, user_id, account_name, access_token, page_id, expires_at
+        FROM fb_accounts
+    """
+    params = ()
+    
+    if user_id is not None:
+        query += " WHERE user_id = %s"
+        params = (user_id,)
+    
+    query += " ORDER BY id"
+    
+    for rows in db.stream_query(query, params, itersize):
+        for row in rows:
+            yield AccountRow._make(row)
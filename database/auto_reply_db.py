@@ -0,0 +1,266 @@
+from datetime import datetime
+from database.connection import get_db_connection
+import streamlit as st
+
+def add_auto_reply_rule(account_id, name, template, keywords="", first_time_only=False, start_hour=None, end_hour=None):
+    """Add an auto-reply rule for an account"""
+    db = get_db_connection()
+    
+    query = """
+        INSERT INTO auto_reply_rules (account_id, name, template, keywords, first_time_only, start_hour, end_hour)
+        VALUES (%s, %s, %s, %s, %s, %s, %s)
+        RETURNING id
+    """
+    result = db.execute_single_fetch(
+        query, (account_id, name, template, keywords, first_time_only, start_hour, end_hour)
+    )
+    
+    if result:
+        return True, result[0]
+    else:
+        return False, "Failed to add auto-reply rule"
+
+def get_auto_reply_rules(account_id, enabled_only=False):
+    """Get an account's auto-reply rules in priority (creation) order"""
+    db = get_db_connection()
+    
+    query = """
+        SELECT id, name, template, keywords, first_time_only, start_hour, end_hour, enabled, created_at
+        FROM auto_reply_rules
+        WHERE account_id = %s
+    """
+    if enabled_only:
+        query += " AND enabled = TRUE"
+    query += " ORDER BY id"
+    
+    results = db.execute_query(query, (account_id,), fetch=True)
+    
+    rules = []
+    if results:
+        for row in results:
+            rules.append({
+                "id": row[0],
+                "name": row[1],
+                "template": row[2],
+                "keywords": row[3] or "",
+                "first_time_only": bool(row[4]),
+                "start_hour": row[5],
+                "end_hour": row[6],
+                "enabled": bool(row[7]),
+                "created_at": row[8]
+            })
+    
+    return rules
+
+def set_auto_reply_rule_enabled(rule_id, account_id, enabled):
+    """Turn an auto-reply rule on or off"""
+    db = get_db_connection()
+    
+    query = "UPDATE auto_reply_rules SET enabled = %s WHERE id = %s AND account_id = %s"
+    return bool(db.execute_query(query, (enabled, rule_id, account_id)))
+
+def delete_auto_reply_rule(rule_id, account_id):
+    """Delete an auto-reply rule"""
+    db = get_db_connection()
+    
+    query = "DELETE FROM auto_reply_rules WHERE id = %s AND account_id = %s"
+    return bool(db.execute_query(query, (rule_id, account_id)))
+
+def get_first_comment_ids(account_id, author_ids):
+    """Get the Facebook ID of each author's earliest stored comment on the account's posts"""
+    if not author_ids:
+        return set()
+    
+    db = get_db_connection()
+    
+    placeholders = ", ".join(["%s"] * len(author_ids))
+    query = f"""
+        SELECT c.fb_comment_id
+        FROM comments c
+        JOIN posts p ON p.id = c.post_id
+        WHERE p.account_id = %s AND c.author_id IN ({placeholders})
+        AND c.id = (
+            SELECT c2.id
+            FROM comments c2
+            JOIN posts p2 ON p2.id = c2.post_id
+            WHERE p2.account_id = p.account_id AND c2.author_id = c.author_id
+            ORDER BY c2.commented_at, c2.id
+            LIMIT 1
+        )
+    """
+    results = db.execute_query(query, [account_id] + list(author_ids), fetch=True)
+    
+    return {row[0] for row in results} if results else set()
+
+def claim_auto_replies(account_id, replies):
+    """Queue replies, ignoring comments that already have one
+    
+    replies is a list of (fb_comment_id, rule_id, message) tuples. The
+    unique fb_comment_id makes each comment get at most one reply even
+    when several syncs see it at once.
+    """
+    if not replies:
+        return True
+    
+    db = get_db_connection()
+    
+    values = ", ".join(["(%s, %s, %s, %s)"] * len(replies))
+    params = []
+    for reply in replies:
+        params.append(account_id)
+        params.extend(reply)
+    
+    query = f"""
+        INSERT INTO auto_replies (account_id, fb_comment_id, rule_id, message)
+        VALUES {values}
+        ON CONFLICT (fb_comment_id) DO NOTHING
+    """
+    return bool(db.execute_query(query, params))
+
+def get_accounts_with_queued_replies():
+    """Get the ids of accounts with replies waiting to be sent"""
+    db = get_db_connection()
+    
+    query = "SELECT DISTINCT account_id FROM auto_replies WHERE status = 'queued'"
+    results = db.execute_query(query, fetch=True)
+    
+    return [row[0] for row in results] if results else []
+
+def get_queued_auto_replies(account_id, limit):
+    """Claim an account's oldest queued replies with the local comment they answer
+    
+    The rows are switched to 'sending' in the same transaction that reads
+    them, so no other dispatcher can send them too. The caller records each
+    outcome with update_auto_reply or hands the rows back with
+    requeue_auto_replies; claims it never settles are expired by
+    expire_auto_reply_claims.
+    """
+    db = get_db_connection()
+    
+    # A CTE so PostgreSQL picks the rows once; a plain IN (subselect) may be
+    # rescanned per updated row and claim more than the limit
+    claim = f"""
+        WITH picked AS (
+            SELECT id FROM auto_replies
+            WHERE account_id = %s AND status = 'queued'
+            ORDER BY id
+            LIMIT %s{db.skip_locked}
+        )
+        UPDATE auto_replies
+        SET status = 'sending', claimed_at = %s
+        WHERE status = 'queued' AND id IN (SELECT id FROM picked)
+        RETURNING id
+    """
+    try:
+        with db.transaction():
+            claimed = db.execute_query(claim, (account_id, limit, datetime.now()), fetch=True)
+            if not claimed:
+                return []
+            
+            placeholders = ", ".join(["%s"] * len(claimed))
+            query = f"""
+                SELECT a.id, a.fb_comment_id, a.message, c.id, c.post_id
+                FROM auto_replies a
+                LEFT JOIN comments c ON c.fb_comment_id = a.fb_comment_id
+                WHERE a.id IN ({placeholders})
+                ORDER BY a.id
+            """
+            results = db.execute_query(query, [row[0] for row in claimed], fetch=True)
+    except Exception as e:
+        st.error(f"Query execution error: {e}")
+        return []
+    
+    replies = []
+    if results:
+        for row in results:
+            replies.append({
+                "id": row[0],
+                "fb_comment_id": row[1],
+                "message": row[2],
+                "comment_id": row[3],
+                "post_id": row[4]
+            })
+    
+    return replies
+
+def requeue_auto_replies(reply_ids):
+    """Put claimed replies back in the queue, e.g. after Graph rate-limited them"""
+    if not reply_ids:
+        return True
+    
+    db = get_db_connection()
+    
+    placeholders = ", ".join(["%s"] * len(reply_ids))
+    query = f"UPDATE auto_replies SET status = 'queued' WHERE status = 'sending' AND id IN ({placeholders})"
+    return bool(db.execute_query(query, list(reply_ids)))
+
+def expire_auto_reply_claims(claimed_before):
+    """Mark replies claimed before a time but never settled as 'unknown'
+    
+    Their sender died or failed to record the outcome, so they may or may
+    not have been posted; they are not resent. Returns how many expired.
+    """
+    db = get_db_connection()
+    
+    query = """
+        UPDATE auto_replies
+        SET status = 'unknown', error = 'Outcome was never recorded'
+        WHERE status = 'sending' AND (claimed_at IS NULL OR claimed_at < %s)
+        RETURNING id
+    """
+    try:
+        with db.transaction():
+            expired = db.execute_query(query, (claimed_before,), fetch=True)
+    except Exception as e:
+        st.error(f"Query execution error: {e}")
+        return 0
+    return len(expired or [])
+
+def update_auto_reply(reply_id, status, fb_reply_id=None, error=None):
+    """Record the outcome of sending a reply"""
+    db = get_db_connection()
+    
+    query = """
+        UPDATE auto_replies
+        SET status = %s, fb_reply_id = %s, error = %s, sent_at = CURRENT_TIMESTAMP
+        WHERE id = %s
+    """
+    return bool(db.execute_query(query, (status, fb_reply_id, error, reply_id)))
+
+def count_auto_replies_by_status(account_id):
+    """Get {status: count} of an account's auto-replies"""
+    db = get_db_connection()
+    
+    query = "SELECT status, COUNT(*) FROM auto_replies WHERE account_id = %s GROUP BY status"
+    results = db.execute_query(query, (account_id,), fetch=True)
+    
+    return {row[0]: row[1] for row in results} if results else {}
+
+def get_recent_auto_replies(account_id, limit=50):
+    """Get an account's latest auto-replies with the rule that produced them"""
+    db = get_db_connection()
+    
+    query = """
+        SELECT a.fb_comment_id, a.message, a.status, a.error, a.created_at, a.sent_at, r.name
+        FROM auto_replies a
+        LEFT JOIN auto_reply_rules r ON r.id = a.rule_id
+        WHERE a.account_id = %s
+        ORDER BY a.id DESC
+        LIMIT %s
+    """
+    results = db.execute_query(query, (account_id, limit), fetch=True)
+    
+    replies = []
+    if results:
+        for row in results:
+            replies.append({
+                "fb_comment_id": row[0],
+                "message": row[1],
+                "status": row[2],
+                "error": row[3],
+                "created_at": row[4],
+                "sent_at": row[5],
+                "rule": row[6]
+            })
+    
+    return replies
@@ -0,0 +1,141 @@
+from database.connection import get_db_connection
+import pandas as pd
+import streamlit as st
+
+# Engagement of a post as counted in best_time_bins
+ENGAGEMENT_SQL = "COALESCE(fb_comment_count, 0) + COALESCE(fb_reaction_count, 0)"
+
+UNBINNED_POST_COLUMNS = ["id", "posted_at", "engagement", "binned_engagement"]
+
+# Posts marked as counted per statement
+MARK_CHUNK = 500
+
+def iter_unbinned_posts(account_id, itersize=None):
+    """Yield, in fetched chunks, posts that are new to the bins or whose engagement changed
+    
+    Columns are UNBINNED_POST_COLUMNS; binned_engagement is None for posts
+    not counted yet.
+    """
+    db = get_db_connection()
+    
+    query = f"""
+        SELECT id, posted_at, {ENGAGEMENT_SQL}, binned_engagement
+        FROM posts
+        WHERE account_id = %s AND posted_at IS NOT NULL
+        AND (binned_engagement IS NULL OR binned_engagement <> {ENGAGEMENT_SQL})
+    """
+    
+    yield from db.stream_query(query, (account_id,), itersize)
+
+def add_best_time_bins(account_id, rows):
+    """Add post and engagement deltas to bins
+    
+    rows is a list of (weekday, hour, posts delta, engagement delta) tuples.
+    """
+    if not rows:
+        return True
+    
+    db = get_db_connection()
+    
+    values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(rows))
+    params = []
+    for row in rows:
+        params.append(account_id)
+        params.extend(row)
+    
+    query = f"""
+        INSERT INTO best_time_bins (account_id, weekday, hour, posts, engagement)
+        VALUES {values}
+        ON CONFLICT (account_id, weekday, hour) DO UPDATE SET
+            posts = best_time_bins.posts + excluded.posts,
+            engagement = best_time_bins.engagement + excluded.engagement
+    """
+    return bool(db.execute_query(query, params))
+
+def mark_posts_binned(posts):
+    """Record posts as counted at the engagement they were read with
+    
+    posts are (id, posted_at, engagement, binned_engagement) rows from
+    iter_unbinned_posts. A post is only marked if its binned_engagement is
+    still the one that was read, so a concurrent refresh or reset is never
+    counted over. Returns the ids of the posts marked.
+    """
+    db = get_db_connection()
+    
+    marked = set()
+    for start in range(0, len(posts), MARK_CHUNK):
+        chunk = posts[start:start + MARK_CHUNK]
+        # Cast so an all-NULL column of read values still compares as integers
+        values = ", ".join(["(CAST(%s AS INTEGER), CAST(%s AS INTEGER), CAST(%s AS INTEGER))"] * len(chunk))
+        params = []
+        for post_id, _, engagement, binned_engagement in chunk:
+            params.extend((post_id, engagement, binned_engagement))
+        
+        query = f"""
+            WITH read_posts (id, engagement, binned_engagement) AS (VALUES {values})
+            UPDATE posts SET binned_engagement = read_posts.engagement
+            FROM read_posts
+            WHERE posts.id = read_posts.id
+            AND posts.binned_engagement IS NOT DISTINCT FROM read_posts.binned_engagement
+            RETURNING posts.id
+        """
+        marked.update(row[0] for row in db.execute_query(query, params, fetch=True) or [])
+    return marked
+
+def fold_best_time_bins(account_id, posts, bin_deltas):
+    """Mark posts as counted and add the bin deltas of those marked, in one transaction
+    
+    bin_deltas is called with the ids of the posts actually marked and
+    returns their rows for add_best_time_bins. Either both happen or
+    neither, so no post is counted twice. Returns the number of posts
+    folded in.
+    """
+    db = get_db_connection()
+    
+    try:
+        with db.transaction():
+            marked = mark_posts_binned(posts)
+            add_best_time_bins(account_id, bin_deltas(marked))
+    except Exception as e:
+        st.error(f"Query execution error: {e}")
+        return 0
+    return len(marked)
+
+def unbin_post(account_id, posted_at, binned_engagement):
+    """Take a deleted post's share back out of its bin
+    
+    Call in the transaction that deletes the post, with the values the
+    delete returned.
+    """
+    if posted_at is None or binned_engagement is None:
+        return True
+    
+    # The same slot bin_posts in analytics/best_time.py put it in
+    slot = pd.Timestamp(posted_at)
+    return add_best_time_bins(account_id, [(slot.dayofweek, slot.hour, -1, -binned_engagement)])
+
+def get_best_time_bins(account_id):
+    """Get an account's (weekday, hour, posts, engagement) bins"""
+    db = get_db_connection()
+    
+    query = """
+        SELECT weekday, hour, posts, engagement
+        FROM best_time_bins
+        WHERE account_id = %s
+    """
+    results = db.execute_query(query, (account_id,), fetch=True)
+    
+    return [tuple(row) for row in results] if results else []
+
+def reset_best_time_bins(account_id):
+    """Drop an account's bins so the next refresh recounts every post"""
+    db = get_db_connection()
+    
+    try:
+        with db.transaction():
+            db.execute_query("DELETE FROM best_time_bins WHERE account_id = %s", (account_id,))
+            db.execute_query("UPDATE posts SET binned_engagement = NULL WHERE account_id = %s", (account_id,))
+    except Exception as e:
+        st.error(f"Query execution error: {e}")
+        return False
+    return True
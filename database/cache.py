@@ -0,0 +1,232 @@
+"""In-process cache of account and post rows, kept coherent across replicas
+
+Reads go through @cached functions keyed by entity id. Every write path
+in database/*_db.py calls invalidate(), which evicts the local entry and
+publishes the (entity, id) pair with NOTIFY on INVALIDATION_CHANNEL. Each
+process runs an InvalidationListener thread that LISTENs on the channel
+and evicts the same entries, so replicas and workers writing the same
+database see each other's changes without polling. The TTL only bounds
+staleness while the listener is reconnecting, or on SQLite, which has
+no notifications.
+"""
+import copy
+import functools
+import json
+import logging
+import os
+import select
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from config import get_setting
+from database.connection import get_db_connection
+
+ACCOUNT = "account"
+POST = "post"
+
+INVALIDATION_CHANNEL = "fb_manager_invalidate"
+
+# Defaults for the db_cache_* settings
+DEFAULT_TTL_SECONDS = 300
+DEFAULT_MAX_ENTRIES = 5000
+
+# Seconds the listener waits for a notification before checking its connection
+LISTEN_TIMEOUT = 5.0
+
+# Reconnect delays of the listener after the connection drops
+MIN_BACKOFF = 1.0
+MAX_BACKOFF = 60.0
+
+# Identifies this process's own notifications, which were applied locally already
+ORIGIN = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+
+logger = logging.getLogger("fb_manager.cache")
+
+def is_enabled():
+    return bool(get_setting("db_cache_enabled", True))
+
+class EntityCache:
+    """LRU cache of rows by (entity, id), each holding results per call arguments"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        # Bumped by every eviction; a read that started before one isn't cached
+        self.generation = 0
+        self.callbacks = {}
+        self.reset_stats()
+    
+    def reset_stats(self):
+        self.stats = {
+            "hits": 0,
+            "misses": 0,
+            "local_invalidations": 0,
+            "remote_invalidations": 0,
+            "flushes": 0,
+        }
+    
+    def get(self, entity, entity_id, args):
+        """Get (True, value) for a live entry, else (False, None)"""
+        ttl = float(get_setting("db_cache_ttl", DEFAULT_TTL_SECONDS))
+        with self.lock:
+            values = self.entries.get((entity, entity_id))
+            stored = values.get(args) if values else None
+            if stored is None or time.monotonic() - stored[0] >= ttl:
+                self.stats["misses"] += 1
+                return False, None
+            self.entries.move_to_end((entity, entity_id))
+            self.stats["hits"] += 1
+            return True, stored[1]
+    
+    def put(self, entity, entity_id, args, value, generation):
+        """Store a value read while the cache was at the given generation
+        
+        If anything was evicted since, the value is dropped rather than
+        cached, since it may predate the write behind the eviction.
+        """
+        max_entries = int(get_setting("db_cache_max_entries", DEFAULT_MAX_ENTRIES))
+        with self.lock:
+            if generation != self.generation:
+                return
+            self.entries.setdefault((entity, entity_id), {})[args] = (time.monotonic(), value)
+            self.entries.move_to_end((entity, entity_id))
+            while len(self.entries) > max_entries:
+                self.entries.popitem(last=False)
+    
+    def evict(self, entity, entity_id=None, remote=False):
+        """Drop one row's entries, or every entry of an entity when entity_id is None"""
+        with self.lock:
+            self.generation += 1
+            if entity_id is None:
+                for key in [key for key in self.entries if key[0] == entity]:
+                    del self.entries[key]
+            else:
+                self.entries.pop((entity, entity_id), None)
+            self.stats["remote_invalidations" if remote else "local_invalidations"] += 1
+            callbacks = list(self.callbacks.get(entity, ()))
+        
+        for callback in callbacks:
+            try:
+                callback(entity_id)
+            except Exception:
+                logger.exception("Invalidation callback for %s failed", entity)
+    
+    def on_invalidate(self, entity, callback):
+        """Call callback(entity_id) whenever rows of an entity are invalidated, here or elsewhere"""
+        with self.lock:
+            self.callbacks.setdefault(entity, []).append(callback)
+    
+    def flush(self):
+        """Drop everything, e.g. after notifications may have been missed"""
+        with self.lock:
+            self.entries.clear()
+            self.generation += 1
+            self.stats["flushes"] += 1
+    
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self.entries)
+        lookups = stats["hits"] + stats["misses"]
+        stats["hit_ratio"] = stats["hits"] / lookups if lookups else 0.0
+        return stats
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        self.reset_stats()
+
+def cached(entity):
+    """Cache a function whose first argument is the id of an entity row
+    
+    None results (row not found) aren't cached, and callers get a copy so
+    they can't modify the cached row.
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(entity_id, *args):
+            if not is_enabled():
+                return function(entity_id, *args)
+            
+            hit, value = cache.get(entity, entity_id, args)
+            if not hit:
+                generation = cache.generation
+                value = function(entity_id, *args)
+                if value is None:
+                    return None
+                cache.put(entity, entity_id, args, value, generation)
+            return copy.copy(value)
+        return wrapper
+    return decorator
+
+def invalidate(entity, entity_id=None):
+    """Evict a row (or a whole entity when entity_id is None) here and in every other process"""
+    cache.evict(entity, entity_id)
+    
+    payload = json.dumps({"entity": entity, "id": entity_id, "origin": ORIGIN})
+    get_db_connection().notify(INVALIDATION_CHANNEL, payload)
+
+def apply_notification(payload):
+    """Evict what another process's invalidate() named"""
+    try:
+        message = json.loads(payload)
+        entity, entity_id, origin = message["entity"], message["id"], message["origin"]
+    except (ValueError, KeyError, TypeError):
+        logger.warning("Ignoring malformed invalidation %r", payload)
+        return
+    
+    if origin != ORIGIN:
+        cache.evict(entity, entity_id, remote=True)
+
+class InvalidationListener:
+    """Background thread that LISTENs for other processes' invalidations"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.thread = None
+        self.connected = False
+    
+    def ensure_running(self, db):
+        """Start the thread unless it's already running or the backend can't notify"""
+        if not db.supports_notify:
+            return
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, args=(db,), name="cache-invalidation", daemon=True)
+                self.thread.start()
+    
+    def run(self, db):
+        backoff = MIN_BACKOFF
+        while True:
+            try:
+                self.listen(db)
+            except Exception:
+                logger.exception("Invalidation listener lost its connection")
+            backoff = MIN_BACKOFF if self.connected else min(backoff * 2, MAX_BACKOFF)
+            self.connected = False
+            time.sleep(backoff)
+    
+    def listen(self, db):
+        conn = db.open_connection()
+        try:
+            conn.autocommit = True
+            conn.cursor().execute(f"LISTEN {INVALIDATION_CHANNEL}")
+            # Whatever was invalidated while disconnected went unheard
+            cache.flush()
+            self.connected = True
+            
+            while True:
+                if select.select([conn], [], [], LISTEN_TIMEOUT) == ([], [], []):
+                    # Nothing arrived; a cheap query notices a dead connection
+                    conn.cursor().execute("SELECT 1")
+                    continue
+                conn.poll()
+                while conn.notifies:
+                    apply_notification(conn.notifies.pop(0).payload)
+        finally:
+            conn.close()
+
+# Process-wide cache and listener
+cache = EntityCache()
+listener = InvalidationListener()
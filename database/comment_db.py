@@ -1,44 +1,98 @@
-from database.connection import get_db_connection
+from database.connection import get_db_connection, use_denormalized_counts, content_hash
 import streamlit as st
+from collections import namedtuple
 from datetime import datetime
 
-def save_comment(fb_comment_id, post_id, content, commented_at=None):
-    """Save a Facebook comment to the database"""
+# Columns of the chunks yielded by iter_comment_chunks()
+COMMENT_CHUNK_COLUMNS = [
+    "id", "post_id", "parent_id", "author_id", "author_name", "content", "commented_at"
+]
+
+# Compact row yielded by iter_comments()
+CommentRow = namedtuple("CommentRow", [
+    "id", "fb_comment_id", "post_id", "parent_id", "content", "commented_at"
+])
+
+def save_comment(fb_comment_id, post_id, content, commented_at=None, parent_id=None, stats=None,
+                 author_id=None, author_name=None):
+    """Save a Facebook comment to the database
+    
+    parent_id is the local id of the comment being replied to, if any, and
+    author_id/author_name identify who wrote it (kept when not provided).
+    The row is only rewritten when its content hash changed; stats works as
+    in save_post.
+    """
     db = get_db_connection()
+    row_hash = content_hash(content, commented_at, parent_id, author_id, author_name)
     
     # Check if comment already exists
-    query = "SELECT id FROM comments WHERE fb_comment_id = %s"
+    query = "SELECT id, content_hash FROM comments WHERE fb_comment_id = %s"
     result = db.execute_single_fetch(query, (fb_comment_id,))
     
     if result:
-        # Update existing comment
         comment_id = result[0]
+        if result[1] == row_hash:
+            if stats is not None:
+                stats["unchanged"] += 1
+            return True, comment_id
+        
+        # Update existing comment
         query = """
             UPDATE comments 
-            SET content = %s, commented_at = %s
+            SET content = %s, commented_at = %s, parent_id = COALESCE(%s, parent_id),
+                author_id = COALESCE(%s, author_id), author_name = COALESCE(%s, author_name),
+                content_hash = %s
             WHERE id = %s
         """
-        success = db.execute_query(query, (content, commented_at or datetime.now(), comment_id))
+        success = db.execute_query(
+            query, (content, commented_at or datetime.now(), parent_id, author_id, author_name,
+                    row_hash, comment_id)
+        )
         
         if success:
+            if stats is not None:
+                stats["updated"] += 1
             return True, comment_id
         else:
             return False, "Failed to update comment"
     else:
         # Insert new comment
         query = """
-            INSERT INTO comments (fb_comment_id, post_id, content, commented_at)
-            VALUES (%s, %s, %s, %s)
+            INSERT INTO comments (fb_comment_id, post_id, content, commented_at, parent_id,
+                                  author_id, author_name, content_hash)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
             RETURNING id
         """
-        result = db.execute_single_fetch(
-            query, (fb_comment_id, post_id, content, commented_at or datetime.now())
-        )
-        
-        if result:
-            return True, result[0]
-        else:
+        try:
+            with db.transaction():
+                # Partitioned comments are only unique per (fb_comment_id, month), so
+                # inserts of one comment are serialized and the lookup repeated
+                db.lock_key(f"comment:{fb_comment_id}")
+                existing = db.execute_single_fetch(
+                    "SELECT id FROM comments WHERE fb_comment_id = %s", (fb_comment_id,)
+                )
+                if existing is None:
+                    result = db.execute_single_fetch(
+                        query, (fb_comment_id, post_id, content, commented_at or datetime.now(), parent_id,
+                                author_id, author_name, row_hash)
+                    )
+                    if use_denormalized_counts():
+                        db.execute_query(
+                            "UPDATE posts SET stored_comment_count = stored_comment_count + 1 WHERE id = %s", (post_id,)
+                        )
+        except Exception as e:
+            st.error(f"Query execution error: {e}")
             return False, "Failed to save comment"
+        
+        if existing:
+            # Another sync stored it first
+            if stats is not None:
+                stats["unchanged"] += 1
+            return True, existing[0]
+        
+        if stats is not None:
+            stats["inserted"] += 1
+        return True, result[0]
 
 def get_comments_by_post(post_id, limit=100, offset=0):
     """Get comments for a specific post"""
@@ -51,7 +105,7 @@ def get_comments_by_post(post_id, limit=100, offset=0):
         ORDER BY commented_at DESC
         LIMIT %s OFFSET %s
     """
-    results = db.execute_query(query, (post_id, limit, offset), fetch=True)
+    results = db.execute_query(query, (post_id, limit, offset), fetch=True, replica=True)
     
     comments = []
     if results:
@@ -66,13 +120,49 @@ def get_comments_by_post(post_id, limit=100, offset=0):
     
     return comments
 
+def get_latest_comments_for_posts(post_ids, per_post=3):
+    """Get the latest top-level comments of several posts in one query
+    
+    Returns a dict mapping post id to its comments, newest first.
+    """
+    if not post_ids:
+        return {}
+    
+    db = get_db_connection()
+    
+    placeholders = ", ".join(["%s"] * len(post_ids))
+    query = f"""
+        SELECT post_id, id, fb_comment_id, content, commented_at
+        FROM (
+            SELECT post_id, id, fb_comment_id, content, commented_at,
+                   ROW_NUMBER() OVER (PARTITION BY post_id ORDER BY commented_at DESC, id DESC) AS position
+            FROM comments
+            WHERE post_id IN ({placeholders}) AND parent_id IS NULL
+        ) latest
+        WHERE position <= %s
+        ORDER BY post_id, position
+    """
+    results = db.execute_query(query, (*post_ids, per_post), fetch=True, replica=True)
+    
+    comments = {post_id: [] for post_id in post_ids}
+    if results:
+        for row in results:
+            comments[row[0]].append({
+                "id": row[1],
+                "fb_comment_id": row[2],
+                "content": row[3],
+                "commented_at": row[4]
+            })
+    
+    return comments
+
 def get_comment_by_id(comment_id):
     """Get a comment by its ID"""
     db = get_db_connection()
     
     query = """
         SELECT c.id, c.fb_comment_id, c.post_id, c.content, c.commented_at, c.created_at,
-               p.fb_post_id, p.account_id
+               p.fb_post_id, p.account_id, c.parent_id
         FROM comments c
         JOIN posts p ON c.post_id = p.id
         WHERE c.id = %s
@@ -88,7 +178,8 @@ def get_comment_by_id(comment_id):
             "commented_at": result[4],
             "created_at": result[5],
             "fb_post_id": result[6],
-            "account_id": result[7]
+            "account_id": result[7],
+            "parent_id": result[8]
         }
     else:
         return None
@@ -105,23 +196,128 @@ def get_comment_by_fb_id(fb_comment_id):
     else:
         return None
 
-def delete_comment(comment_id):
-    """Delete a comment from the database"""
+def get_comment_thread(post_id, root_comment_id=None):
+    """Get a post's comments with all nested replies in one recursive query
+    
+    Rows come back in display order: each comment is followed by its replies,
+    siblings oldest first, with depth 0 for top-level comments. Passing
+    root_comment_id returns just that comment's subtree.
+    """
     db = get_db_connection()
     
-    query = "DELETE FROM comments WHERE id = %s"
-    success = db.execute_query(query, (comment_id,))
+    # sort_path concatenates "commented_at#id" down the tree so a plain text
+    # sort yields depth-first, chronological order. Ids are offset to a fixed
+    # width (portable zero-padding) so equal timestamps still sort by id
+    query = """
+        WITH RECURSIVE thread AS (
+            SELECT id, fb_comment_id, parent_id, content, commented_at, created_at,
+                   0 AS depth,
+                   CAST(COALESCE(CAST(commented_at AS TEXT), '') || '#' || CAST(id + 1000000000000 AS TEXT) AS TEXT) AS sort_path
+            FROM comments
+            WHERE post_id = %s AND {root_condition}
+            UNION ALL
+            SELECT c.id, c.fb_comment_id, c.parent_id, c.content, c.commented_at, c.created_at,
+                   t.depth + 1,
+                   CAST(t.sort_path || '/' || COALESCE(CAST(c.commented_at AS TEXT), '') || '#' || CAST(c.id + 1000000000000 AS TEXT) AS TEXT)
+            FROM comments c
+            JOIN thread t ON c.parent_id = t.id
+        )
+        SELECT id, fb_comment_id, parent_id, content, commented_at, created_at, depth
+        FROM thread
+        ORDER BY sort_path
+    """
+    if root_comment_id:
+        query = query.format(root_condition="id = %s")
+        params = (post_id, root_comment_id)
+    else:
+        query = query.format(root_condition="parent_id IS NULL")
+        params = (post_id,)
+    
+    results = db.execute_query(query, params, fetch=True, replica=True)
     
-    return success
+    comments = []
+    if results:
+        for row in results:
+            comments.append({
+                "id": row[0],
+                "fb_comment_id": row[1],
+                "parent_id": row[2],
+                "content": row[3],
+                "commented_at": row[4],
+                "created_at": row[5],
+                "depth": row[6]
+            })
+    
+    return comments
+
+def delete_comment(comment_id):
+    """Delete a comment and any replies to it from the database"""
+    db = get_db_connection()
+    
+    try:
+        with db.transaction():
+            post = db.execute_single_fetch("SELECT post_id FROM comments WHERE id = %s", (comment_id,))
+            
+            query = """
+                DELETE FROM comments WHERE id IN (
+                    WITH RECURSIVE subtree AS (
+                        SELECT id FROM comments WHERE id = %s
+                        UNION ALL
+                        SELECT c.id FROM comments c JOIN subtree s ON c.parent_id = s.id
+                    )
+                    SELECT id FROM subtree
+                )
+            """
+            db.execute_query(query, (comment_id,))
+            
+            # Replies went too, so recount the post rather than decrementing by one
+            if post and use_denormalized_counts():
+                query = """
+                    UPDATE posts SET stored_comment_count = (
+                        SELECT COUNT(*) FROM comments WHERE post_id = %s
+                    )
+                    WHERE id = %s
+                """
+                db.execute_query(query, (post[0], post[0]))
+    except Exception as e:
+        st.error(f"Query execution error: {e}")
+        return None
+    return True
 
 def count_comments_by_post(post_id):
     """Count the number of comments for a post"""
+    return count_comments_by_posts([post_id])[post_id]
+
+def count_comments_by_posts(post_ids):
+    """Count stored comments for several posts in one query
+    
+    Returns a dict mapping every post id to its comment count. With
+    denormalized counts enabled this reads posts.stored_comment_count
+    instead of aggregating.
+    """
+    if not post_ids:
+        return {}
+    
     db = get_db_connection()
     
-    query = "SELECT COUNT(*) FROM comments WHERE post_id = %s"
-    result = db.execute_single_fetch(query, (post_id,))
+    placeholders = ", ".join(["%s"] * len(post_ids))
+    if use_denormalized_counts():
+        query = f"SELECT id, stored_comment_count FROM posts WHERE id IN ({placeholders})"
+    else:
+        query = f"""
+            SELECT post_id, COUNT(*)
+            FROM comments
+            WHERE post_id IN ({placeholders})
+            GROUP BY post_id
+        """
+    results = db.execute_query(query, tuple(post_ids), fetch=True, replica=True)
+    
+    counts = {post_id: 0 for post_id in post_ids}
+    if results:
+        for row in results:
+            counts[row[0]] = row[1]
     
-    return result[0] if result else 0
+    return counts
 
 def search_comments(post_id, search_term, limit=100, offset=0):
     """Search comments by content for a specific post"""
@@ -135,7 +331,7 @@ def search_comments(post_id, search_term, limit=100, offset=0):
         LIMIT %s OFFSET %s
     """
     search_pattern = f"%{search_term}%"
-    results = db.execute_query(query, (post_id, search_pattern, limit, offset), fetch=True)
+    results = db.execute_query(query, (post_id, search_pattern, limit, offset), fetch=True, replica=True)
     
     comments = []
     if results:
@@ -149,3 +345,48 @@ def search_comments(post_id, search_term, limit=100, offset=0):
             })
     
     return comments
+
+def iter_comments(post_id=None, account_id=None, itersize=None):
+    """Lazily iterate over comments as CommentRow tuples
+    
+    Filter by post_id or by account_id (every post of the account); with
+    neither, every stored comment is scanned.
+    """
+    db = get_db_connection()
+    
+    query = """
+        SELECT c.id, c.fb_comment_id, c.post_id, c.parent_id, c.content, c.commented_at
+        FROM comments c
+    """
+    params = ()
+    
+    if post_id is not None:
+        query += " WHERE c.post_id = %s"
+        params = (post_id,)
+    elif account_id is not None:
+        query += " JOIN posts p ON p.id = c.post_id WHERE p.account_id = %s"
+        params = (account_id,)
+    
+    query += " ORDER BY c.id"
+    
+    for rows in db.stream_query(query, params, itersize, replica=True):
+        for row in rows:
+            yield CommentRow._make(row)
+
+def iter_comment_chunks(account_id, itersize=None):
+    """Yield an account's comments as lists of rows, one fetch at a time
+    
+    Columns are COMMENT_CHUNK_COLUMNS; meant for building column-oriented
+    frames for analytics without going through per-row dicts.
+    """
+    db = get_db_connection()
+    
+    query = """
+        SELECT c.id, c.post_id, c.parent_id, c.author_id, c.author_name, c.content, c.commented_at
+        FROM comments c
+        JOIN posts p ON p.id = c.post_id
+        WHERE p.account_id = %s
+        ORDER BY c.id
+    """
+    
+    yield from db.stream_query(query, (account_id,), itersize, replica=True)
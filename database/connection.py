@@ -1,24 +1,93 @@
+import hashlib
+import json
+import sys
+import threading
+import time
+from contextlib import contextmanager
 import psycopg2
 import streamlit as st
+import metrics
+from config import get_setting
+from database import partitions, replicas, slow_query_log, statements
+
+# Rows fetched per round trip by stream_query() unless db_itersize is set
+DEFAULT_ITERSIZE = 1000
+
+# Idle primary connections kept for stream_query() and copy_to_csv()
+READ_POOL_SIZE = 4
+
+# app_state key recording whether ingestion maintains the counter columns
+COUNTERS_STATE_KEY = "denormalized_counts"
+
+# Connection plumbing skipped when naming a query after its caller
+EXECUTION_METHODS = frozenset((
+    "_execute", "_fetch_replica", "execute_query", "execute_single_fetch", "stream_query", "copy_to_csv"
+))
+
+def caller_name(depth=2):
+    """Name of the first function outside the connection plumbing
+    
+    This is the *_db.py function (search_posts, get_comments_by_post, ...)
+    that issued the query, and is used to label metrics and logs.
+    """
+    frame = sys._getframe(depth)
+    while frame is not None and frame.f_code.co_name in EXECUTION_METHODS:
+        frame = frame.f_back
+    return frame.f_code.co_name if frame is not None else "unknown"
 
 class DatabaseConnection:
+    """Storage backend interface used by the database/*_db.py modules
+    
+    Queries are written once in PostgreSQL flavour with %s placeholders;
+    each backend translates them as needed and owns its own schema DDL.
+    """
+    
+    name = None
+    
+    # Column definition for auto-incrementing ids in tables added by upgrade_schema
+    serial_primary_key = None
+    
+    # Whether notify() reaches other processes (see database/cache.py)
+    supports_notify = False
+    
+    # Row lock clause for subselects that claim queue rows; SQLite's write lock
+    # already serializes the claiming transactions (see begin)
+    skip_locked = ""
+    
     def __init__(self):
         self.conn = None
         self.cursor = None
+        # Page reruns and background workers share the cursor, so a statement
+        # and the fetch of its results must not interleave with another thread's
+        self.lock = threading.RLock()
+        # Whether the counter columns are known to be maintained (see sync_denormalized_counts)
+        self.counters_maintained = None
+        # Nesting depth of transaction() blocks and the thread running them
+        self.tx_depth = 0
+        self.tx_owner = None
+        # Reads passed replica=True go here when the backend has replicas
+        self.replicas = replicas.ReplicaPool([])
+        # Dedicated primary connections for long reads, so a scan after every
+        # sync doesn't pay for a new connection (see open_read_connection)
+        self.read_pool_lock = threading.Lock()
+        self.idle_read_connections = []
+        self.read_connection_ids = set()
     
     def connect(self):
-        """Connect to PostgreSQL database using Streamlit secrets"""
-        try:
-            # Get database URL from Streamlit secrets
-            db_url = st.secrets["db_url"]
-            
-            # Connect to the database
-            self.conn = psycopg2.connect(db_url)
-            self.cursor = self.conn.cursor()
-            return True
-        except Exception as e:
-            st.error(f"Database connection error: {e}")
-            return False
+        """Open the underlying connection"""
+        raise NotImplementedError
+    
+    def open_connection(self):
+        """Open a new raw DB-API connection to the same database"""
+        raise NotImplementedError
+    
+    def open_stream_cursor(self, conn):
+        """Open a cursor that fetches rows from the server incrementally"""
+        return conn.cursor()
+    
+    def is_connected(self):
+        """Check if the underlying connection is open"""
+        raise NotImplementedError
     
     def disconnect(self):
         """Close database connection"""
@@ -26,40 +95,594 @@ class DatabaseConnection:
             self.cursor.close()
         if self.conn:
             self.conn.close()
+        with self.read_pool_lock:
+            idle, self.idle_read_connections = self.idle_read_connections, []
+            self.read_connection_ids.clear()
+        for conn in idle:
+            conn.close()
+    
+    def translate_query(self, query):
+        """Rewrite a query for this backend's SQL dialect"""
+        return query
+    
+    def is_write_query(self, query):
+        """Check if a statement modifies data"""
+        return query.lstrip().split(None, 1)[0].upper() in ("INSERT", "UPDATE", "DELETE")
+    
+    def _execute(self, query, params):
+        """Run a statement on the shared cursor, recording its latency"""
+        name = caller_name()
+        start = time.perf_counter()
+        try:
+            self.run_statement(query, params or ())
+        except Exception:
+            metrics.observe("db_query", name, time.perf_counter() - start, error=True)
+            raise
+        elapsed = time.perf_counter() - start
+        metrics.observe("db_query", name, elapsed)
+        
+        if self.replicas and self.is_write_query(query):
+            replicas.mark_write()
+        
+        threshold_ms = slow_query_log.get_threshold_ms()
+        if threshold_ms is not None and elapsed * 1000 >= threshold_ms:
+            slow_query_log.record(self, name, query, params, elapsed)
+    
+    def run_statement(self, query, params):
+        """Send one statement through the shared cursor"""
+        self.cursor.execute(self.translate_query(query), params)
+    
+    def _fetch_replica(self, query, params, one=False):
+        """Run a read on a replica if one qualifies
+        
+        Returns (True, rows or first row), or (False, None) when the primary
+        should serve the read instead.
+        """
+        replica = self.replicas.choose()
+        if replica is None:
+            return False, None
+        
+        name = caller_name()
+        start = time.perf_counter()
+        try:
+            result = replica.fetch(self.translate_query(query), params, one)
+        except Exception:
+            replica.record_failure()
+            metrics.observe("db_replica", replica.name, time.perf_counter() - start, error=True)
+            return False, None
+        elapsed = time.perf_counter() - start
+        replica.record_success(elapsed)
+        metrics.observe("db_query", name, elapsed)
+        metrics.observe("db_replica", replica.name, elapsed)
+        return True, result
+    
+    def open_read_connection(self, replica=False):
+        """Get a connection for a long read, on a replica if asked and one qualifies
+        
+        Primary connections are reused from a small idle pool. Hand every
+        connection back with close_read_connection.
+        """
+        source = self.replicas.choose() if replica else None
+        if source is not None:
+            try:
+                return source.open_connection()
+            except Exception:
+                source.record_failure()
+        
+        with self.read_pool_lock:
+            if self.idle_read_connections:
+                return self.idle_read_connections.pop()
+        conn = self.open_connection()
+        with self.read_pool_lock:
+            self.read_connection_ids.add(id(conn))
+        return conn
+    
+    def close_read_connection(self, conn, reusable=True):
+        """Hand back a connection from open_read_connection
+        
+        Primary connections go back to the idle pool unless the read failed
+        or the pool is full; replica connections are closed.
+        """
+        with self.read_pool_lock:
+            pooled = id(conn) in self.read_connection_ids
+            if pooled and reusable and len(self.idle_read_connections) < READ_POOL_SIZE:
+                try:
+                    # Ends the read's transaction, and with it any open server-side cursor
+                    conn.rollback()
+                    self.idle_read_connections.append(conn)
+                    return
+                except Exception:
+                    pass
+            self.read_connection_ids.discard(id(conn))
+        try:
+            conn.close()
+        except Exception:
+            pass
     
-    def execute_query(self, query, params=None, fetch=False):
-        """Execute a database query with optional parameters"""
+    def explain(self, query, params=None):
+        """Return the execution plan of a read query as text"""
+        raise NotImplementedError
+    
+    def stream_query(self, query, params=None, itersize=None, replica=False):
+        """Iterate over a large result in chunks of up to itersize rows
+        
+        Rows are pulled from the server as the caller consumes them, so memory
+        stays flat however big the result is. A dedicated connection, reused
+        between scans, is used so a long scan neither ties up the shared
+        cursor nor gets cut off when another session commits on the shared
+        connection. With replica=True the scan may run on a read replica.
+        """
+        itersize = itersize or int(get_setting("db_itersize", DEFAULT_ITERSIZE))
+        # The connection is opened here rather than on first iteration, so the
+        # replica choice sees the caller's session
+        return self._stream(caller_name(), self.open_read_connection(replica), query, params, itersize)
+    
+    def _stream(self, name, conn, query, params, itersize):
+        start = time.perf_counter()
+        error = False
+        cursor = None
         try:
-            self.cursor.execute(query, params or ())
+            cursor = self.open_stream_cursor(conn)
+            cursor.execute(self.translate_query(query), params or ())
+            while True:
+                rows = cursor.fetchmany(itersize)
+                if not rows:
+                    break
+                yield rows
+        except Exception:
+            error = True
+            raise
+        finally:
+            # Closed before the connection is reused, even if the caller stopped early
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Exception:
+                    error = True
+            self.close_read_connection(conn, reusable=not error)
+            metrics.observe("db_query", name, time.perf_counter() - start, error)
+    
+    def copy_to_csv(self, query, params, file, replica=False):
+        """Write a query result as CSV with a header row using a bulk copy
+        
+        Returns the number of rows written, or None if the backend has no
+        bulk copy and the caller should stream rows instead.
+        """
+        return None
+    
+    def begin(self):
+        """Start a transaction explicitly where the driver wouldn't before the first statement"""
+    
+    def in_transaction(self):
+        """Check if the current thread is inside a transaction() block"""
+        return self.tx_depth > 0 and self.tx_owner == threading.get_ident()
+    
+    @contextmanager
+    def transaction(self):
+        """Group the statements of a block into one unit of work
+        
+        execute_query/execute_single_fetch inside the block don't commit and
+        raise on error instead of returning None. The outermost block commits
+        once at the end, or rolls everything back if an exception escapes it.
+        A nested block runs under a savepoint, so a caller that catches its
+        error keeps the rest of the enclosing transaction. The connection's
+        lock is held throughout, so other threads' statements can't land in
+        the middle of the unit.
+        """
+        with self.lock:
+            if self.tx_depth == 0:
+                self.begin()
+                self.tx_owner = threading.get_ident()
+                self.tx_depth = 1
+                try:
+                    yield self
+                    self.conn.commit()
+                except BaseException:
+                    self.conn.rollback()
+                    raise
+                finally:
+                    self.tx_depth = 0
+                    self.tx_owner = None
+                return
             
-            if fetch:
-                return self.cursor.fetchall()
-            else:
+            savepoint = f"unit_of_work_{self.tx_depth}"
+            self.cursor.execute(f"SAVEPOINT {savepoint}")
+            self.tx_depth += 1
+            try:
+                yield self
+            except BaseException:
+                self.cursor.execute(f"ROLLBACK TO SAVEPOINT {savepoint}")
+                raise
+            finally:
+                self.tx_depth -= 1
+                self.cursor.execute(f"RELEASE SAVEPOINT {savepoint}")
+    
+    def lock_key(self, key):
+        """Hold a lock on a key until the enclosing transaction() ends
+        
+        Serializes check-then-insert sequences across processes. SQLite
+        transactions already hold the database's write lock (see begin), so
+        there is nothing to do by default.
+        """
+    
+    def execute_query(self, query, params=None, fetch=False, replica=False):
+        """Execute a database query with optional parameters
+        
+        Reads passed replica=True may be served by a read replica (see
+        database/replicas.py); use it only where slightly stale rows are fine.
+        Inside transaction() nothing is committed and errors are raised.
+        """
+        if replica and fetch and not self.in_transaction():
+            served, rows = self._fetch_replica(query, params)
+            if served:
+                return rows
+        
+        with self.lock:
+            try:
+                self._execute(query, params)
+                
+                if fetch:
+                    return self.cursor.fetchall()
+                else:
+                    if not self.tx_depth:
+                        self.conn.commit()
+                    return True
+            except Exception as e:
+                if self.tx_depth:
+                    raise
+                self.conn.rollback()
+                st.error(f"Query execution error: {e}")
+                return None
+    
+    def execute_single_fetch(self, query, params=None, replica=False):
+        """Execute a query and fetch a single result"""
+        if replica and not self.is_write_query(query) and not self.in_transaction():
+            served, row = self._fetch_replica(query, params, one=True)
+            if served:
+                return row
+        
+        with self.lock:
+            self._execute(query, params)
+            result = self.cursor.fetchone()
+            
+            # INSERT ... RETURNING goes through here too and must not be left pending
+            if self.is_write_query(query) and not self.tx_depth:
                 self.conn.commit()
-                return True
+            
+            return result
+    
+    def notify(self, channel, payload):
+        """Publish a message to other processes' listeners, if the backend has any"""
+        return False
+    
+    def table_exists(self, table_name):
+        """Check if a table exists in the database"""
+        raise NotImplementedError
+    
+    def column_exists(self, table_name, column_name):
+        """Check if a column exists on a table"""
+        raise NotImplementedError
+    
+    def add_column(self, table_name, column_name, definition):
+        """Add a column to an existing table unless it is already there
+        
+        Returns True if the column was added.
+        """
+        if self.column_exists(table_name, column_name):
+            return False
+        return bool(self.execute_query(f"ALTER TABLE {table_name} ADD COLUMN {column_name} {definition}"))
+    
+    def create_tables(self):
+        """Create necessary tables if they don't exist and bring them up to date"""
+        self.create_core_tables()
+        self.upgrade_schema()
+    
+    def create_core_tables(self):
+        """Create the original tables using backend-specific DDL"""
+        raise NotImplementedError
+    
+    def upgrade_schema(self):
+        """Add columns and indexes introduced after the original schema
+        
+        Everything here uses portable DDL so both backends share it, and every
+        step is idempotent so it can run on each connect.
+        """
+        # Threaded comments: replies point at their parent comment
+        self.add_column("comments", "parent_id", "INTEGER REFERENCES comments(id)")
+        self.execute_query("CREATE INDEX IF NOT EXISTS idx_comments_parent_id ON comments (parent_id)")
+        
+        # Comment and reaction totals reported by Graph during feed sync
+        self.add_column("posts", "fb_comment_count", "INTEGER")
+        self.add_column("posts", "fb_reaction_count", "INTEGER")
+        
+        # Indexes behind per-post and per-account listings and counts
+        self.execute_query("CREATE INDEX IF NOT EXISTS idx_comments_post_id ON comments (post_id, commented_at)")
+        self.execute_query("CREATE INDEX IF NOT EXISTS idx_posts_account_id ON posts (account_id, posted_at)")
+        self.execute_query("CREATE INDEX IF NOT EXISTS idx_posts_posted_at ON posts (posted_at, id)")
+        
+        # Denormalized counters, and whether ingestion has been maintaining them
+        self.add_column("posts", "stored_comment_count", "INTEGER NOT NULL DEFAULT 0")
+        self.add_column("fb_accounts", "post_count", "INTEGER NOT NULL DEFAULT 0")
+        self.execute_query("""
+            CREATE TABLE IF NOT EXISTS app_state (
+                key VARCHAR(100) PRIMARY KEY,
+                value TEXT
+            )
+        """)
+        self.sync_denormalized_counts(bool(get_setting("denormalized_counts", False)))
+        
+        # Hash of the synced fields, so unchanged Graph objects aren't rewritten
+        self.add_column("posts", "content_hash", "VARCHAR(64)")
+        self.add_column("comments", "content_hash", "VARCHAR(64)")
+        
+        # Comment authors, for engagement analytics
+        self.add_column("comments", "author_id", "VARCHAR(255)")
+        self.add_column("comments", "author_name", "VARCHAR(255)")
+        
+        # Per-account moderation rules and the Graph actions they triggered
+        self.execute_query(f"""
+            CREATE TABLE IF NOT EXISTS moderation_rules (
+                id {self.serial_primary_key},
+                account_id INTEGER REFERENCES fb_accounts(id) ON DELETE CASCADE,
+                pattern TEXT NOT NULL,
+                match_type VARCHAR(20) NOT NULL DEFAULT 'keyword',
+                action VARCHAR(20) NOT NULL DEFAULT 'hide',
+                enabled BOOLEAN NOT NULL DEFAULT TRUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self.execute_query(f"""
+            CREATE TABLE IF NOT EXISTS moderation_actions (
+                id {self.serial_primary_key},
+                account_id INTEGER REFERENCES fb_accounts(id) ON DELETE CASCADE,
+                fb_comment_id VARCHAR(255) NOT NULL,
+                rule_id INTEGER REFERENCES moderation_rules(id) ON DELETE SET NULL,
+                action VARCHAR(20) NOT NULL,
+                status VARCHAR(20) NOT NULL,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self.execute_query("CREATE INDEX IF NOT EXISTS idx_moderation_rules_account_id ON moderation_rules (account_id)")
+        self.execute_query("CREATE INDEX IF NOT EXISTS idx_moderation_actions_comment ON moderation_actions (fb_comment_id)")
+        self.execute_query("CREATE INDEX IF NOT EXISTS idx_moderation_actions_account ON moderation_actions (account_id, created_at)")
+        
+        # Auto-reply templates, and one row per comment replied to so no
+        # comment is ever answered twice
+        self.execute_query(f"""
+            CREATE TABLE IF NOT EXISTS auto_reply_rules (
+                id {self.serial_primary_key},
+                account_id INTEGER REFERENCES fb_accounts(id) ON DELETE CASCADE,
+                name VARCHAR(255) NOT NULL,
+                template TEXT NOT NULL,
+                keywords TEXT,
+                first_time_only BOOLEAN NOT NULL DEFAULT FALSE,
+                start_hour INTEGER,
+                end_hour INTEGER,
+                enabled BOOLEAN NOT NULL DEFAULT TRUE,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        self.execute_query(f"""
+            CREATE TABLE IF NOT EXISTS auto_replies (
+                id {self.serial_primary_key},
+                account_id INTEGER REFERENCES fb_accounts(id) ON DELETE CASCADE,
+                fb_comment_id VARCHAR(255) NOT NULL UNIQUE,
+                rule_id INTEGER REFERENCES auto_reply_rules(id) ON DELETE SET NULL,
+                message TEXT NOT NULL,
+                status VARCHAR(20) NOT NULL DEFAULT 'queued',
+                fb_reply_id VARCHAR(255),
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                sent_at TIMESTAMP
+            )
+        """)
+        # When the dispatcher took a reply for sending (see expire_auto_reply_claims)
+        self.add_column("auto_replies", "claimed_at", "TIMESTAMP")
+        self.execute_query("CREATE INDEX IF NOT EXISTS idx_auto_reply_rules_account_id ON auto_reply_rules (account_id)")
+        self.execute_query("CREATE INDEX IF NOT EXISTS idx_auto_replies_status ON auto_replies (status, account_id)")
+        self.execute_query("CREATE INDEX IF NOT EXISTS idx_comments_author_id ON comments (author_id)")
+        
+        # Daily Insights values (post_id 0 holds page-level metrics) and their
+        # weekly/monthly rollups; the primary keys double as the range indexes
+        self.execute_query("""
+            CREATE TABLE IF NOT EXISTS insights (
+                account_id INTEGER NOT NULL REFERENCES fb_accounts(id) ON DELETE CASCADE,
+                post_id INTEGER NOT NULL DEFAULT 0,
+                metric VARCHAR(64) NOT NULL,
+                day DATE NOT NULL,
+                value BIGINT NOT NULL,
+                PRIMARY KEY (account_id, post_id, metric, day)
+            )
+        """)
+        self.execute_query("""
+            CREATE TABLE IF NOT EXISTS insight_rollups (
+                account_id INTEGER NOT NULL REFERENCES fb_accounts(id) ON DELETE CASCADE,
+                metric VARCHAR(64) NOT NULL,
+                period VARCHAR(10) NOT NULL,
+                period_start DATE NOT NULL,
+                total BIGINT NOT NULL,
+                days INTEGER NOT NULL,
+                PRIMARY KEY (account_id, period, period_start, metric)
+            )
+        """)
+        
+        # Posts and engagement per weekday/hour slot for best-time analysis;
+        # posts.binned_engagement is what each post currently contributes
+        self.add_column("posts", "binned_engagement", "INTEGER")
+        self.execute_query("""
+            CREATE TABLE IF NOT EXISTS best_time_bins (
+                account_id INTEGER NOT NULL REFERENCES fb_accounts(id) ON DELETE CASCADE,
+                weekday INTEGER NOT NULL,
+                hour INTEGER NOT NULL,
+                posts INTEGER NOT NULL,
+                engagement BIGINT NOT NULL,
+                PRIMARY KEY (account_id, weekday, hour)
+            )
+        """)
+    
+    def get_state(self, key):
+        """Get a value stored in app_state, or None"""
+        result = self.execute_single_fetch("SELECT value FROM app_state WHERE key = %s", (key,))
+        return result[0] if result else None
+    
+    def set_state(self, key, value):
+        """Store a value in app_state"""
+        query = """
+            INSERT INTO app_state (key, value) VALUES (%s, %s)
+            ON CONFLICT (key) DO UPDATE SET value = excluded.value
+        """
+        return bool(self.execute_query(query, (key, value)))
+    
+    def sync_denormalized_counts(self, enabled):
+        """Bring the counter columns in line with the denormalized_counts setting
+        
+        app_state records whether ingestion has been maintaining the counters.
+        When the setting is turned on after rows were ingested with it off,
+        the counters are rebuilt before anything reads them. Returns whether
+        they are maintained, i.e. whether listings may read them.
+        """
+        if self.counters_maintained == enabled:
+            return enabled
+        
+        state = "on" if enabled else "off"
+        if self.get_state(COUNTERS_STATE_KEY) != state:
+            # Until a recount succeeds, ingestion and listings keep treating the setting as off
+            if enabled and not self.recount_denormalized_counts():
+                return False
+            self.set_state(COUNTERS_STATE_KEY, state)
+        self.counters_maintained = enabled
+        return enabled
+    
+    def recount_denormalized_counts(self):
+        """Rebuild posts.stored_comment_count and fb_accounts.post_count from scratch"""
+        try:
+            with self.transaction():
+                self.execute_query("""
+                    UPDATE posts SET stored_comment_count = (
+                        SELECT COUNT(*) FROM comments WHERE comments.post_id = posts.id
+                    )
+                """)
+                self.execute_query("""
+                    UPDATE fb_accounts SET post_count = (
+                        SELECT COUNT(*) FROM posts WHERE posts.account_id = fb_accounts.id
+                    )
+                """)
         except Exception as e:
-            self.conn.rollback()
             st.error(f"Query execution error: {e}")
             return None
+        return True
+
+class PostgresConnection(DatabaseConnection):
+    name = "postgres"
+    serial_primary_key = "SERIAL PRIMARY KEY"
+    supports_notify = True
+    skip_locked = " FOR UPDATE SKIP LOCKED"
     
-    def execute_single_fetch(self, query, params=None):
-        """Execute a query and fetch a single result"""
-        self.cursor.execute(query, params or ())
-        return self.cursor.fetchone()
+    def __init__(self):
+        super().__init__()
+        self.replicas = replicas.create_pool()
+        self.statements = statements.StatementRegistry()
+    
+    def connect(self):
+        """Connect to PostgreSQL database using Streamlit secrets"""
+        try:
+            # Connect to the database
+            self.conn = self.open_connection()
+            self.cursor = self.conn.cursor()
+            # Statements prepared on the previous connection died with it
+            self.statements.reset()
+            return True
+        except Exception as e:
+            st.error(f"Database connection error: {e}")
+            return False
+    
+    def open_connection(self):
+        """Open a new PostgreSQL connection"""
+        return psycopg2.connect(st.secrets["db_url"])
+    
+    def open_stream_cursor(self, conn):
+        """Open a named (server-side) cursor"""
+        cursor = conn.cursor(name="stream_query")
+        return cursor
+    
+    def copy_to_csv(self, query, params, file, replica=False):
+        """Stream a query result through COPY ... TO STDOUT as CSV"""
+        name = caller_name()
+        conn = self.open_read_connection(replica)
+        start = time.perf_counter()
+        error = False
+        try:
+            cursor = conn.cursor()
+            statement = cursor.mogrify(query, params or ()).decode()
+            cursor.copy_expert(f"COPY ({statement}) TO STDOUT WITH (FORMAT csv, HEADER true)", file)
+            return cursor.rowcount
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.close_read_connection(conn, reusable=not error)
+            metrics.observe("db_query", name, time.perf_counter() - start, error)
+    
+    def is_connected(self):
+        """Check if the PostgreSQL connection is open"""
+        return self.conn is not None and not self.conn.closed
+    
+    def run_statement(self, query, params):
+        """Send one statement, as a server-side prepared statement once it's hot"""
+        self.statements.execute(self.conn, self.cursor, query, params)
+    
+    def lock_key(self, key):
+        """Take a transaction-scoped advisory lock on the key's hash"""
+        self.execute_single_fetch("SELECT pg_advisory_xact_lock(hashtext(%s))", (key,))
+    
+    def notify(self, channel, payload):
+        """NOTIFY the channel's listeners once the shared connection commits"""
+        return bool(self.execute_query("SELECT pg_notify(%s, %s)", (channel, payload)))
+    
+    def explain(self, query, params=None):
+        """Run EXPLAIN (ANALYZE, BUFFERS) on a separate cursor
+        
+        It runs under a savepoint that is always rolled back, so whatever the
+        statement did the second time (and a failing EXPLAIN) leaves the
+        caller's transaction as it was.
+        """
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("SAVEPOINT slow_query_explain")
+            try:
+                cursor.execute("EXPLAIN (ANALYZE, BUFFERS) " + query, params or ())
+                return "\n".join(row[0] for row in cursor.fetchall())
+            finally:
+                cursor.execute("ROLLBACK TO SAVEPOINT slow_query_explain")
+                cursor.execute("RELEASE SAVEPOINT slow_query_explain")
+        finally:
+            cursor.close()
     
     def table_exists(self, table_name):
         """Check if a table exists in the database"""
         query = """
             SELECT EXISTS (
-                SELECT FROM information_schema.tables 
+                SELECT FROM information_schema.tables
                 WHERE table_name = %s
             );
         """
         result = self.execute_single_fetch(query, (table_name,))
         return result[0] if result else False
     
-    def create_tables(self):
-        """Create necessary tables if they don't exist"""
+    def column_exists(self, table_name, column_name):
+        """Check if a column exists on a table"""
+        query = """
+            SELECT EXISTS (
+                SELECT FROM information_schema.columns
+                WHERE table_name = %s AND column_name = %s
+            );
+        """
+        result = self.execute_single_fetch(query, (table_name, column_name))
+        return result[0] if result else False
+    
+    def create_core_tables(self):
+        """Create the original tables if they don't exist"""
         # Users table
         self.execute_query("""
             CREATE TABLE IF NOT EXISTS users (
@@ -108,13 +731,53 @@ class DatabaseConnection:
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
             );
         """)
+    
+    def upgrade_schema(self):
+        """Apply the shared upgrades, then partition comments if enabled"""
+        super().upgrade_schema()
+        
+        if get_setting("comments_partitioned", False):
+            try:
+                partitions.enable_partitioning(self)
+            except Exception as e:
+                st.error(f"Comment partitioning error: {e}")
+
+def create_connection():
+    """Create the storage backend selected by the db_backend setting"""
+    backend = get_setting("db_backend", "postgres")
+    
+    if backend == "postgres":
+        return PostgresConnection()
+    elif backend == "sqlite":
+        # Imported lazily so the sqlite module can subclass DatabaseConnection
+        from database.sqlite_connection import SQLiteConnection
+        return SQLiteConnection()
+    else:
+        raise ValueError(f"Unknown db_backend: {backend}")
+
+def content_hash(*values):
+    """Stable SHA-256 of the values a sync would write for one Graph object"""
+    payload = json.dumps(values, default=str, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+def use_denormalized_counts():
+    """Check if ingestion maintains counter columns that listings read directly
+    
+    Turning the denormalized_counts setting on recounts the columns first, so
+    rows ingested while it was off aren't missing from them.
+    """
+    enabled = bool(get_setting("denormalized_counts", False))
+    return get_db_connection().sync_denormalized_counts(enabled)
 
 # Database connection as a singleton
-db = DatabaseConnection()
+db = None
 
 def get_db_connection():
     """Get the database connection singleton"""
-    if not db.conn or db.conn.closed:
+    global db
+    if db is None:
+        db = create_connection()
+    if not db.is_connected():
         db.connect()
         db.create_tables()
-    return db
+    return db
\ No newline at end of file
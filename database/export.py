@@ -0,0 +1,208 @@
+import argparse
+import csv
+import io
+import json
+import os
+import re
+import sys
+import time
+from datetime import datetime
+from database.connection import get_db_connection
+
+FORMATS = ("csv", "ndjson", "parquet")
+FILE_EXTENSIONS = {"csv": "csv", "ndjson": "ndjson", "parquet": "parquet"}
+MIME_TYPES = {
+    "csv": "text/csv",
+    "ndjson": "application/x-ndjson",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+# Rows fetched per round trip while streaming
+DEFAULT_ITERSIZE = 2000
+
+# Files named by export_filename(), the only ones prune_exports() removes
+EXPORT_FILE_NAME = re.compile(r"^[a-z]+_account\d+_\d{8}_\d{6}\.(csv|ndjson|parquet)$")
+
+# kind -> (query, column names with their Parquet types)
+EXPORTS = {
+    "posts": (
+        """
+        SELECT id, fb_post_id, content, post_url, posted_at,
+               fb_comment_count, fb_reaction_count, created_at
+        FROM posts
+        WHERE account_id = %s
+        ORDER BY posted_at, id
+        """,
+        [
+            ("id", "int64"),
+            ("fb_post_id", "string"),
+            ("content", "string"),
+            ("post_url", "string"),
+            ("posted_at", "timestamp"),
+            ("fb_comment_count", "int64"),
+            ("fb_reaction_count", "int64"),
+            ("created_at", "timestamp"),
+        ],
+    ),
+    "comments": (
+        """
+        SELECT c.id, c.fb_comment_id, c.post_id, p.fb_post_id, c.parent_id,
+               c.content, c.commented_at, c.created_at
+        FROM comments c
+        JOIN posts p ON p.id = c.post_id
+        WHERE p.account_id = %s
+        ORDER BY c.post_id, c.commented_at, c.id
+        """,
+        [
+            ("id", "int64"),
+            ("fb_comment_id", "string"),
+            ("post_id", "int64"),
+            ("fb_post_id", "string"),
+            ("parent_id", "int64"),
+            ("content", "string"),
+            ("commented_at", "timestamp"),
+            ("created_at", "timestamp"),
+        ],
+    ),
+}
+
+class ExportError(Exception):
+    """Raised when an export can't be produced (e.g. a missing optional dependency)"""
+
+def export_filename(kind, account_id, fmt):
+    """Build a timestamped file name for an export"""
+    stamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    return f"{kind}_account{account_id}_{stamp}.{FILE_EXTENSIONS[fmt]}"
+
+def prune_exports(directory, max_age_seconds):
+    """Delete export files in a directory older than max_age_seconds; returns how many went"""
+    if not os.path.isdir(directory):
+        return 0
+    
+    cutoff = time.time() - max_age_seconds
+    removed = 0
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if not EXPORT_FILE_NAME.match(name):
+            continue
+        try:
+            if os.path.getmtime(path) < cutoff:
+                os.remove(path)
+                removed += 1
+        except FileNotFoundError:
+            # Downloaded and removed by another session meanwhile
+            pass
+    return removed
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat(" ")
+    return value
+
+def write_csv(db, query, params, columns, binary_file, itersize):
+    """Write rows as CSV, using COPY when the backend supports it"""
+    text_file = io.TextIOWrapper(binary_file, encoding="utf-8", newline="", write_through=True)
+    try:
+        count = db.copy_to_csv(query, params, text_file, replica=True)
+        if count is not None:
+            return count
+        
+        writer = csv.writer(text_file)
+        writer.writerow([name for name, _ in columns])
+        count = 0
+        for rows in db.stream_query(query, params, itersize, replica=True):
+            writer.writerows([_csv_value(value) for value in row] for row in rows)
+            count += len(rows)
+        return count
+    finally:
+        # Leave the caller's file open
+        text_file.flush()
+        text_file.detach()
+
+def write_ndjson(db, query, params, columns, binary_file, itersize):
+    """Write one JSON object per row"""
+    names = [name for name, _ in columns]
+    count = 0
+    for rows in db.stream_query(query, params, itersize, replica=True):
+        chunk = "".join(json.dumps(dict(zip(names, row)), default=str) + "\n" for row in rows)
+        binary_file.write(chunk.encode("utf-8"))
+        count += len(rows)
+    return count
+
+def write_parquet(db, query, params, columns, binary_file, itersize):
+    """Write one Parquet row group per fetched chunk"""
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        raise ExportError("Parquet export requires pyarrow (pip install pyarrow)")
+    
+    types = {"int64": pa.int64(), "string": pa.string(), "timestamp": pa.timestamp("us")}
+    schema = pa.schema([(name, types[kind]) for name, kind in columns])
+    
+    count = 0
+    with pq.ParquetWriter(binary_file, schema) as writer:
+        for rows in db.stream_query(query, params, itersize, replica=True):
+            table = pa.Table.from_pylist([dict(zip(schema.names, row)) for row in rows], schema=schema)
+            writer.write_table(table)
+            count += len(rows)
+        
+        # An empty export still gets a valid file with the schema
+        if not count:
+            writer.write_table(schema.empty_table())
+    return count
+
+WRITERS = {"csv": write_csv, "ndjson": write_ndjson, "parquet": write_parquet}
+
+def export_rows(kind, account_id, fmt, binary_file, itersize=DEFAULT_ITERSIZE):
+    """Stream an account's posts or comments into a binary file
+    
+    Returns the number of rows written.
+    """
+    if kind not in EXPORTS:
+        raise ExportError(f"Unknown export: {kind}")
+    if fmt not in WRITERS:
+        raise ExportError(f"Unknown format: {fmt}")
+    
+    db = get_db_connection()
+    query, columns = EXPORTS[kind]
+    return WRITERS[fmt](db, query, (account_id,), columns, binary_file, itersize)
+
+def export_to_file(kind, account_id, fmt, path, itersize=DEFAULT_ITERSIZE):
+    """Export to a file path, removing the partial file if the export fails"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    
+    try:
+        with open(path, "wb") as file:
+            return export_rows(kind, account_id, fmt, file, itersize)
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Stream posts or comments for an account to a file")
+    parser.add_argument("kind", choices=sorted(EXPORTS))
+    parser.add_argument("--account-id", type=int, required=True)
+    parser.add_argument("--format", choices=FORMATS, default="csv")
+    parser.add_argument("--output", default="-", help="Output path, or - for stdout")
+    parser.add_argument("--itersize", type=int, default=DEFAULT_ITERSIZE)
+    args = parser.parse_args(argv)
+    
+    try:
+        if args.output == "-":
+            count = export_rows(args.kind, args.account_id, args.format, sys.stdout.buffer, args.itersize)
+            sys.stdout.buffer.flush()
+        else:
+            count = export_to_file(args.kind, args.account_id, args.format, args.output, args.itersize)
+    except ExportError as e:
+        print(e, file=sys.stderr)
+        return 1
+    
+    print(f"Exported {count} {args.kind}", file=sys.stderr)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,180 @@
+from database.connection import get_db_connection
+from collections import defaultdict
+from datetime import date, timedelta
+import streamlit as st
+
+# post_id of page-level rows in the insights table
+PAGE_LEVEL = 0
+
+ROLLUP_PERIODS = ("week", "month")
+
+# Rows per multi-row upsert statement
+UPSERT_CHUNK = 500
+
+def period_start(day, period):
+    """First day of the week (Monday) or month containing a day"""
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    return day.replace(day=1)
+
+def save_insight_values(account_id, rows):
+    """Insert or overwrite daily values
+    
+    rows is a list of (post_id, metric, day, value) tuples; use PAGE_LEVEL
+    as the post_id of page metrics.
+    """
+    if not rows:
+        return True
+    
+    db = get_db_connection()
+    
+    # All chunks are committed together, so a failed sync leaves no partial days
+    try:
+        with db.transaction():
+            for start in range(0, len(rows), UPSERT_CHUNK):
+                chunk = rows[start:start + UPSERT_CHUNK]
+                values = ", ".join(["(%s, %s, %s, %s, %s)"] * len(chunk))
+                params = []
+                for row in chunk:
+                    params.append(account_id)
+                    params.extend(row)
+                
+                query = f"""
+                    INSERT INTO insights (account_id, post_id, metric, day, value)
+                    VALUES {values}
+                    ON CONFLICT (account_id, post_id, metric, day) DO UPDATE SET value = excluded.value
+                """
+                db.execute_query(query, params)
+    except Exception as e:
+        st.error(f"Query execution error: {e}")
+        return False
+    
+    return True
+
+def get_last_insight_day(account_id):
+    """Get the latest day with page-level values, or None before the first sync"""
+    db = get_db_connection()
+    
+    query = "SELECT MAX(day) FROM insights WHERE account_id = %s AND post_id = %s"
+    result = db.execute_single_fetch(query, (account_id, PAGE_LEVEL))
+    
+    day = result[0] if result else None
+    # SQLite hands back aggregates of DATE columns as text
+    if isinstance(day, str):
+        day = date.fromisoformat(day)
+    return day
+
+def get_daily_insights(account_id, since, post_id=PAGE_LEVEL):
+    """Get (metric, day, value) rows from a day onwards"""
+    db = get_db_connection()
+    
+    query = """
+        SELECT metric, day, value
+        FROM insights
+        WHERE account_id = %s AND post_id = %s AND day >= %s
+        ORDER BY day
+    """
+    results = db.execute_query(query, (account_id, post_id, since), fetch=True)
+    
+    return [(row[0], row[1], row[2]) for row in results] if results else []
+
+def refresh_insight_rollups(account_id, since):
+    """Recompute the weekly and monthly rollups of page metrics touched since a day"""
+    start = min(period_start(since, period) for period in ROLLUP_PERIODS)
+    daily = get_daily_insights(account_id, start)
+    
+    totals = defaultdict(lambda: [0, 0])
+    for metric, day, value in daily:
+        for period in ROLLUP_PERIODS:
+            bucket = period_start(day, period)
+            if bucket >= period_start(since, period):
+                total = totals[(metric, period, bucket)]
+                total[0] += value
+                total[1] += 1
+    
+    if not totals:
+        return True
+    
+    db = get_db_connection()
+    
+    rows = list(totals.items())
+    # Every chunk is committed at once, so readers never see half-updated periods
+    try:
+        with db.transaction():
+            for offset in range(0, len(rows), UPSERT_CHUNK):
+                chunk = rows[offset:offset + UPSERT_CHUNK]
+                values = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(chunk))
+                params = []
+                for (metric, period, bucket), (total, days) in chunk:
+                    params.extend([account_id, metric, period, bucket, total, days])
+                
+                query = f"""
+                    INSERT INTO insight_rollups (account_id, metric, period, period_start, total, days)
+                    VALUES {values}
+                    ON CONFLICT (account_id, period, period_start, metric)
+                    DO UPDATE SET total = excluded.total, days = excluded.days
+                """
+                db.execute_query(query, params)
+    except Exception as e:
+        st.error(f"Query execution error: {e}")
+        return False
+    
+    return True
+
+def get_insight_rollups(account_id, period, since):
+    """Get an account's rollups for one period size from a day onwards
+    
+    This is the single query behind the dashboard charts: a year of weekly
+    rollups for three metrics is about 160 rows.
+    """
+    db = get_db_connection()
+    
+    query = """
+        SELECT metric, period_start, total, days
+        FROM insight_rollups
+        WHERE account_id = %s AND period = %s AND period_start >= %s
+        ORDER BY period_start
+    """
+    results = db.execute_query(query, (account_id, period, since), fetch=True, replica=True)
+    
+    rollups = []
+    if results:
+        for row in results:
+            rollups.append({
+                "metric": row[0],
+                "period_start": row[1],
+                "total": row[2],
+                "days": row[3]
+            })
+    
+    return rollups
+
+def get_top_post_insights(account_id, metric, limit=10):
+    """Get the posts with the highest latest value of a lifetime post metric"""
+    db = get_db_connection()
+    
+    query = """
+        SELECT p.id, p.content, p.posted_at, i.value
+        FROM insights i
+        JOIN posts p ON p.id = i.post_id
+        WHERE i.account_id = %s AND i.metric = %s
+        AND i.day = (
+            SELECT MAX(i2.day) FROM insights i2
+            WHERE i2.account_id = i.account_id AND i2.post_id = i.post_id AND i2.metric = i.metric
+        )
+        ORDER BY i.value DESC
+        LIMIT %s
+    """
+    results = db.execute_query(query, (account_id, metric, limit), fetch=True, replica=True)
+    
+    posts = []
+    if results:
+        for row in results:
+            posts.append({
+                "id": row[0],
+                "content": row[1],
+                "posted_at": row[2],
+                "value": row[3]
+            })
+    
+    return posts
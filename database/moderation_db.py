@@ -0,0 +1,139 @@
+from database.connection import get_db_connection
+import streamlit as st
+
+MATCH_TYPES = ("keyword", "regex")
+ACTIONS = ("hide", "delete", "flag")
+
+def add_moderation_rule(account_id, pattern, match_type="keyword", action="hide"):
+    """Add a moderation rule for an account"""
+    db = get_db_connection()
+    
+    query = """
+        INSERT INTO moderation_rules (account_id, pattern, match_type, action)
+        VALUES (%s, %s, %s, %s)
+        RETURNING id
+    """
+    result = db.execute_single_fetch(query, (account_id, pattern, match_type, action))
+    
+    if result:
+        return True, result[0]
+    else:
+        return False, "Failed to add moderation rule"
+
+def get_moderation_rules(account_id, enabled_only=False):
+    """Get an account's moderation rules, oldest first"""
+    db = get_db_connection()
+    
+    query = """
+        SELECT id, pattern, match_type, action, enabled, created_at
+        FROM moderation_rules
+        WHERE account_id = %s
+    """
+    if enabled_only:
+        query += " AND enabled = TRUE"
+    query += " ORDER BY id"
+    
+    results = db.execute_query(query, (account_id,), fetch=True)
+    
+    rules = []
+    if results:
+        for row in results:
+            rules.append({
+                "id": row[0],
+                "pattern": row[1],
+                "match_type": row[2],
+                "action": row[3],
+                "enabled": bool(row[4]),
+                "created_at": row[5]
+            })
+    
+    return rules
+
+def set_moderation_rule_enabled(rule_id, account_id, enabled):
+    """Turn a rule on or off"""
+    db = get_db_connection()
+    
+    query = "UPDATE moderation_rules SET enabled = %s WHERE id = %s AND account_id = %s"
+    return bool(db.execute_query(query, (enabled, rule_id, account_id)))
+
+def delete_moderation_rule(rule_id, account_id):
+    """Delete a moderation rule"""
+    db = get_db_connection()
+    
+    query = "DELETE FROM moderation_rules WHERE id = %s AND account_id = %s"
+    return bool(db.execute_query(query, (rule_id, account_id)))
+
+def get_moderated_comment_ids(fb_comment_ids, actions=None):
+    """Get which of these comments already had a moderation action carried out
+    
+    actions optionally limits this to some actions, e.g. ("hide", "delete").
+    """
+    if not fb_comment_ids:
+        return set()
+    
+    db = get_db_connection()
+    
+    placeholders = ", ".join(["%s"] * len(fb_comment_ids))
+    params = list(fb_comment_ids)
+    query = f"""
+        SELECT DISTINCT fb_comment_id
+        FROM moderation_actions
+        WHERE fb_comment_id IN ({placeholders}) AND status = 'done'
+    """
+    if actions:
+        query += f" AND action IN ({', '.join(['%s'] * len(actions))})"
+        params.extend(actions)
+    
+    results = db.execute_query(query, params, fetch=True)
+    
+    return {row[0] for row in results} if results else set()
+
+def record_moderation_actions(account_id, actions):
+    """Log moderation outcomes in one statement
+    
+    actions is a list of (fb_comment_id, rule_id, action, status, error) tuples.
+    """
+    if not actions:
+        return True
+    
+    db = get_db_connection()
+    
+    values = ", ".join(["(%s, %s, %s, %s, %s, %s)"] * len(actions))
+    params = []
+    for action in actions:
+        params.append(account_id)
+        params.extend(action)
+    
+    query = f"""
+        INSERT INTO moderation_actions (account_id, fb_comment_id, rule_id, action, status, error)
+        VALUES {values}
+    """
+    return bool(db.execute_query(query, params))
+
+def get_recent_moderation_actions(account_id, limit=50):
+    """Get an account's latest moderation actions with the matching rule"""
+    db = get_db_connection()
+    
+    query = """
+        SELECT a.fb_comment_id, a.action, a.status, a.error, a.created_at, r.pattern
+        FROM moderation_actions a
+        LEFT JOIN moderation_rules r ON r.id = a.rule_id
+        WHERE a.account_id = %s
+        ORDER BY a.created_at DESC, a.id DESC
+        LIMIT %s
+    """
+    results = db.execute_query(query, (account_id, limit), fetch=True)
+    
+    actions = []
+    if results:
+        for row in results:
+            actions.append({
+                "fb_comment_id": row[0],
+                "action": row[1],
+                "status": row[2],
+                "error": row[3],
+                "created_at": row[4],
+                "pattern": row[5]
+            })
+    
+    return actions
@@ -0,0 +1,385 @@
+import argparse
+import csv
+import gzip
+import os
+import re
+import sys
+from datetime import date
+from config import get_setting
+
+# Monthly partitions of comments are named comments_pYYYY_MM
+PARTITION_NAME = re.compile(r"^comments_p(\d{4})_(\d{2})$")
+DEFAULT_PARTITION = "comments_default"
+LEGACY_TABLE = "comments_unpartitioned"
+
+# Defaults for the comment_partition_* / comment_retention_* settings
+DEFAULT_MONTHS_AHEAD = 3
+DEFAULT_RETENTION_ACTION = "archive"
+DEFAULT_ARCHIVE_DIR = "archives"
+RETENTION_ACTIONS = ("archive", "detach", "drop")
+
+class PartitioningError(Exception):
+    """Raised when a partition operation can't be carried out"""
+
+def month_start(value):
+    return date(value.year, value.month, 1)
+
+def add_months(month, months):
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def partition_name(month):
+    return f"comments_p{month.year:04d}_{month.month:02d}"
+
+def partition_bounds(name):
+    """Get the [start, end) month range covered by a partition name"""
+    match = PARTITION_NAME.match(name)
+    if not match:
+        raise PartitioningError(f"Not a comment partition: {name}")
+    start = date(int(match.group(1)), int(match.group(2)), 1)
+    return start, add_months(start, 1)
+
+def archive_path(name):
+    return os.path.join(get_setting("comment_archive_dir", DEFAULT_ARCHIVE_DIR), f"{name}.csv.gz")
+
+def _require_postgres(db):
+    if db.name != "postgres":
+        raise PartitioningError("Comment partitioning is only supported on PostgreSQL")
+
+def _fetchall(db, query, params=None):
+    db._execute(query, params)
+    return db.cursor.fetchall()
+
+def _table_exists(db, name):
+    return _fetchall(db, "SELECT to_regclass(%s) IS NOT NULL", (name,))[0][0]
+
+def is_partitioned(db):
+    """Check if comments is already a partitioned table"""
+    return bool(_fetchall(
+        db, "SELECT 1 FROM pg_partitioned_table WHERE partrelid = to_regclass('comments')"
+    ))
+
+def list_partitions(db):
+    """Get the names of the monthly partitions currently attached to comments"""
+    rows = _fetchall(db, """
+        SELECT c.relname
+        FROM pg_inherits i
+        JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = to_regclass('comments')
+        ORDER BY c.relname
+    """)
+    return [row[0] for row in rows if PARTITION_NAME.match(row[0])]
+
+def _create_partition(db, month):
+    """Create the partition for a month, moving any matching rows out of the default partition
+    
+    Returns True if the partition was created. Must run inside a transaction.
+    """
+    name = partition_name(month)
+    if _table_exists(db, name):
+        return False
+    
+    start, end = month, add_months(month, 1)
+    bounds = f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')"
+    
+    # A new range can't be attached while the default partition holds rows in it
+    stray = _fetchall(
+        db, f"SELECT 1 FROM {DEFAULT_PARTITION} WHERE commented_at >= %s AND commented_at < %s LIMIT 1",
+        (start, end)
+    )
+    if not stray:
+        db._execute(f"CREATE TABLE {name} PARTITION OF comments {bounds}", None)
+        return True
+    
+    db._execute(f"ALTER TABLE comments DETACH PARTITION {DEFAULT_PARTITION}", None)
+    db._execute(f"CREATE TABLE {name} PARTITION OF comments {bounds}", None)
+    _move_default_rows(db, name, start, end)
+    db._execute(f"ALTER TABLE comments ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT", None)
+    return True
+
+def _move_default_rows(db, name, start, end):
+    """Move rows in [start, end) from the detached default partition into a partition"""
+    params = (start, end)
+    # Rows already in the partition (e.g. comments re-synced after being archived) win
+    db._execute(f"""
+        DELETE FROM {DEFAULT_PARTITION} d
+        WHERE d.commented_at >= %s AND d.commented_at < %s
+          AND EXISTS (SELECT 1 FROM {name} p WHERE p.fb_comment_id = d.fb_comment_id)
+    """, params)
+    db._execute(f"""
+        INSERT INTO {name}
+        SELECT * FROM {DEFAULT_PARTITION} WHERE commented_at >= %s AND commented_at < %s
+    """, params)
+    db._execute(
+        f"DELETE FROM {DEFAULT_PARTITION} WHERE commented_at >= %s AND commented_at < %s", params
+    )
+
+def ensure_partitions(db, months_ahead=None):
+    """Create partitions for the current month and the next months_ahead months
+    
+    Returns the names of the partitions that were created.
+    """
+    _require_postgres(db)
+    if months_ahead is None:
+        months_ahead = int(get_setting("comment_partition_months_ahead", DEFAULT_MONTHS_AHEAD))
+    
+    current = month_start(date.today())
+    created = []
+    with db.transaction():
+        for offset in range(months_ahead + 1):
+            month = add_months(current, offset)
+            if _create_partition(db, month):
+                created.append(partition_name(month))
+    return created
+
+def partition_comments(db):
+    """Convert the comments table into one partitioned by commented_at month
+    
+    Existing rows are copied into monthly partitions inside a single
+    transaction. Primary and unique keys must include the partition key, so
+    they become (id, commented_at) and (fb_comment_id, commented_at), and the
+    parent_id self-reference is kept as a plain indexed column. Since the
+    database no longer guarantees that fb_comment_id is unique on its own,
+    save_comment() serializes inserts of the same comment with an advisory
+    lock and re-checks before inserting.
+    """
+    _require_postgres(db)
+    
+    with db.transaction():
+        sequence = _fetchall(db, "SELECT pg_get_serial_sequence('comments', 'id')")[0][0]
+        
+        # The partition key can't be NULL in the primary key
+        db._execute("""
+            UPDATE comments SET commented_at = COALESCE(created_at, CURRENT_TIMESTAMP)
+            WHERE commented_at IS NULL
+        """, None)
+        
+        db._execute(f"ALTER TABLE comments RENAME TO {LEGACY_TABLE}", None)
+        db._execute("DROP INDEX IF EXISTS idx_comments_parent_id, idx_comments_post_id, idx_comments_author_id", None)
+        
+        db._execute(f"""
+            CREATE TABLE comments (LIKE {LEGACY_TABLE} INCLUDING DEFAULTS)
+            PARTITION BY RANGE (commented_at)
+        """, None)
+        db._execute("ALTER TABLE comments ALTER COLUMN commented_at SET NOT NULL", None)
+        db._execute("""
+            ALTER TABLE comments
+                ADD CONSTRAINT comments_partitioned_pkey PRIMARY KEY (id, commented_at),
+                ADD CONSTRAINT comments_partitioned_fb_comment_id_key UNIQUE (fb_comment_id, commented_at),
+                ADD CONSTRAINT comments_partitioned_post_id_fkey FOREIGN KEY (post_id) REFERENCES posts(id)
+        """, None)
+        db._execute("CREATE INDEX idx_comments_post_id ON comments (post_id, commented_at)", None)
+        db._execute("CREATE INDEX idx_comments_parent_id ON comments (parent_id)", None)
+        db._execute("CREATE INDEX idx_comments_fb_comment_id ON comments (fb_comment_id)", None)
+        db._execute("CREATE INDEX idx_comments_author_id ON comments (author_id)", None)
+        db._execute(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF comments DEFAULT", None)
+        
+        months = _fetchall(db, f"SELECT DISTINCT date_trunc('month', commented_at) FROM {LEGACY_TABLE}")
+        for (month,) in months:
+            _create_partition(db, month_start(month))
+        
+        db._execute(f"INSERT INTO comments SELECT * FROM {LEGACY_TABLE}", None)
+        
+        # Keep the id sequence alive when the old table goes
+        if sequence:
+            db._execute(f"ALTER SEQUENCE {sequence} OWNED BY comments.id", None)
+        db._execute(f"DROP TABLE {LEGACY_TABLE}", None)
+
+def enable_partitioning(db):
+    """Partition comments on first use, then keep upcoming months created"""
+    if not is_partitioned(db):
+        partition_comments(db)
+    return ensure_partitions(db)
+
+def detach_partition(db, name):
+    """Detach a partition, leaving it as a standalone table"""
+    _require_postgres(db)
+    partition_bounds(name)
+    with db.transaction():
+        db._execute(f"ALTER TABLE comments DETACH PARTITION {name}", None)
+
+def archive_partition(db, name):
+    """Dump a partition to a gzip-compressed CSV file and drop it
+    
+    The file is written completely before the table is dropped, so a failed
+    archive leaves the data in place.
+    """
+    _require_postgres(db)
+    partition_bounds(name)
+    if not _table_exists(db, name):
+        raise PartitioningError(f"Partition {name} does not exist")
+    
+    if name in list_partitions(db):
+        detach_partition(db, name)
+    
+    path = archive_path(name)
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    partial = path + ".partial"
+    # A dedicated connection, so the dump doesn't hold the shared one's lock
+    conn = db.open_connection()
+    try:
+        with gzip.open(partial, "wt", encoding="utf-8", newline="") as file:
+            conn.cursor().copy_expert(f"COPY {name} TO STDOUT WITH (FORMAT csv, HEADER true)", file)
+    finally:
+        conn.close()
+    os.replace(partial, path)
+    
+    with db.transaction():
+        db._execute(f"DROP TABLE {name}", None)
+    return path
+
+def restore_partition(db, name):
+    """Reattach a detached or archived partition
+    
+    Archived data is loaded back from its compressed file. Comments that were
+    re-synced into the default partition meanwhile are folded into it.
+    """
+    _require_postgres(db)
+    start, end = partition_bounds(name)
+    if name in list_partitions(db):
+        raise PartitioningError(f"Partition {name} is already attached")
+    
+    with db.transaction():
+        if not _table_exists(db, name):
+            path = archive_path(name)
+            if not os.path.exists(path):
+                raise PartitioningError(f"No detached table or archive found for {name}")
+            
+            with gzip.open(path, "rt", encoding="utf-8", newline="") as file:
+                columns = next(csv.reader(file))
+            
+            db._execute(f"CREATE TABLE {name} (LIKE comments INCLUDING DEFAULTS)", None)
+            with gzip.open(path, "rt", encoding="utf-8", newline="") as file:
+                db.cursor.copy_expert(
+                    f"COPY {name} ({', '.join(columns)}) FROM STDIN WITH (FORMAT csv, HEADER true)", file
+                )
+        
+        db._execute(f"ALTER TABLE comments DETACH PARTITION {DEFAULT_PARTITION}", None)
+        _move_default_rows(db, name, start, end)
+        db._execute(
+            f"ALTER TABLE comments ATTACH PARTITION {name} "
+            f"FOR VALUES FROM ('{start.isoformat()}') TO ('{end.isoformat()}')", None
+        )
+        db._execute(f"ALTER TABLE comments ATTACH PARTITION {DEFAULT_PARTITION} DEFAULT", None)
+    
+    _recount(db)
+
+def apply_retention(db, months=None, action=None):
+    """Detach, archive or drop partitions older than the retention window
+    
+    months is how many whole months to keep before the current one (the
+    comment_retention_months setting; no retention when unset). Returns a
+    list of (partition, action) pairs.
+    """
+    _require_postgres(db)
+    if months is None:
+        months = get_setting("comment_retention_months")
+    if months is None:
+        return []
+    action = action or get_setting("comment_retention_action", DEFAULT_RETENTION_ACTION)
+    if action not in RETENTION_ACTIONS:
+        raise PartitioningError(f"Unknown retention action: {action}")
+    
+    cutoff = add_months(month_start(date.today()), -int(months))
+    expired = [name for name in list_partitions(db) if partition_bounds(name)[1] <= cutoff]
+    
+    done = []
+    for name in expired:
+        if action == "archive":
+            archive_partition(db, name)
+        else:
+            with db.transaction():
+                db._execute(f"ALTER TABLE comments DETACH PARTITION {name}", None)
+                if action == "drop":
+                    db._execute(f"DROP TABLE {name}", None)
+        done.append((name, action))
+    
+    # Old comments synced again since their month expired are only thrown away
+    # when expired months are; otherwise restore_partition() folds them back in
+    if action == "drop":
+        with db.transaction():
+            db._execute(f"DELETE FROM {DEFAULT_PARTITION} WHERE commented_at < %s", (cutoff,))
+    
+    if done:
+        _recount(db)
+    return done
+
+def _recount(db):
+    # Imported here: connection.py imports this module
+    from database.connection import use_denormalized_counts
+    if use_denormalized_counts():
+        db.recount_denormalized_counts()
+
+def maintain(db):
+    """Create upcoming partitions and apply retention (run daily, e.g. from cron)"""
+    created = enable_partitioning(db)
+    return created, apply_retention(db)
+
+def partition_status(db):
+    """Describe attached and detached partitions and archive files"""
+    _require_postgres(db)
+    attached = set(list_partitions(db))
+    rows = _fetchall(db, """
+        SELECT relname, reltuples::bigint, pg_total_relation_size(oid)
+        FROM pg_class
+        WHERE relkind = 'r' AND relname ~ '^comments_(p[0-9]{4}_[0-9]{2}|default)$'
+        ORDER BY relname
+    """)
+    
+    status = []
+    for name, rows_estimate, size in rows:
+        status.append({
+            "partition": name,
+            "state": "attached" if name in attached or name == DEFAULT_PARTITION else "detached",
+            "rows": max(rows_estimate, 0),
+            "size_bytes": size,
+        })
+    
+    archive_dir = get_setting("comment_archive_dir", DEFAULT_ARCHIVE_DIR)
+    if os.path.isdir(archive_dir):
+        for file_name in sorted(os.listdir(archive_dir)):
+            name = file_name[:-len(".csv.gz")]
+            if file_name.endswith(".csv.gz") and PARTITION_NAME.match(name):
+                status.append({
+                    "partition": name,
+                    "state": "archived",
+                    "rows": None,
+                    "size_bytes": os.path.getsize(os.path.join(archive_dir, file_name)),
+                })
+    return status
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Manage monthly partitions of the comments table")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    subparsers.add_parser("status", help="List partitions and archives")
+    subparsers.add_parser("maintain", help="Create upcoming partitions and apply retention")
+    for command in ("detach", "archive", "restore"):
+        subparsers.add_parser(command).add_argument("partition", help="e.g. comments_p2024_01")
+    args = parser.parse_args(argv)
+    
+    from database.connection import get_db_connection
+    db = get_db_connection()
+    
+    try:
+        if args.command == "status":
+            for row in partition_status(db):
+                print(f"{row['partition']:<24} {row['state']:<9} {row['rows'] if row['rows'] is not None else '-':>10} {row['size_bytes']:>12}")
+        elif args.command == "maintain":
+            created, retired = maintain(db)
+            for name in created:
+                print(f"created {name}")
+            for name, action in retired:
+                print(f"{action} {name}")
+        elif args.command == "detach":
+            detach_partition(db, args.partition)
+        elif args.command == "archive":
+            print(archive_partition(db, args.partition))
+        elif args.command == "restore":
+            restore_partition(db, args.partition)
+    except PartitioningError as e:
+        print(e, file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
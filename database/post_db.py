@@ -1,57 +1,155 @@
-from database.connection import get_db_connection
+from database.connection import get_db_connection, use_denormalized_counts, content_hash
+from database.cache import ACCOUNT, POST, cache, cached, invalidate
+from database.best_time_db import unbin_post
 import streamlit as st
+from collections import namedtuple
 from datetime import datetime
 
-def save_post(fb_post_id, account_id, content, post_url=None, posted_at=None):
-    """Save a Facebook post to the database"""
+# Cached posts carry their account's name, so account changes evict them all
+cache.on_invalidate(ACCOUNT, lambda account_id: cache.evict(POST))
+
+# Compact row yielded by iter_posts()
+PostRow = namedtuple("PostRow", [
+    "id", "fb_post_id", "account_id", "content", "post_url", "posted_at",
+    "comment_count", "reaction_count"
+])
+
+def save_post(fb_post_id, account_id, content, post_url=None, posted_at=None,
+              comment_count=None, reaction_count=None, stats=None):
+    """Save a Facebook post to the database
+    
+    comment_count and reaction_count are the totals reported by Graph; they
+    are left unchanged when not provided. The row is only rewritten when
+    the hash of these fields changed. If stats (a collections.Counter) is
+    given, the outcome is counted as "inserted", "updated" or "unchanged".
+    """
     db = get_db_connection()
+    row_hash = content_hash(content, post_url, posted_at, comment_count, reaction_count)
     
     # Check if post already exists
-    query = "SELECT id FROM posts WHERE fb_post_id = %s"
+    query = "SELECT id, content_hash FROM posts WHERE fb_post_id = %s"
     result = db.execute_single_fetch(query, (fb_post_id,))
     
     if result:
-        # Update existing post
         post_id = result[0]
+        if result[1] == row_hash:
+            if stats is not None:
+                stats["unchanged"] += 1
+            return True, post_id
+        
+        # Update existing post
         query = """
             UPDATE posts 
-            SET content = %s, post_url = %s, posted_at = %s
+            SET content = %s, post_url = %s, posted_at = %s,
+                fb_comment_count = COALESCE(%s, fb_comment_count),
+                fb_reaction_count = COALESCE(%s, fb_reaction_count),
+                content_hash = %s
             WHERE id = %s
         """
-        success = db.execute_query(query, (content, post_url, posted_at or datetime.now(), post_id))
+        success = db.execute_query(
+            query, (content, post_url, posted_at or datetime.now(), comment_count, reaction_count,
+                    row_hash, post_id)
+        )
         
         if success:
+            invalidate(POST, post_id)
+            if stats is not None:
+                stats["updated"] += 1
             return True, post_id
         else:
             return False, "Failed to update post"
     else:
         # Insert new post
         query = """
-            INSERT INTO posts (fb_post_id, account_id, content, post_url, posted_at)
-            VALUES (%s, %s, %s, %s, %s)
+            INSERT INTO posts (fb_post_id, account_id, content, post_url, posted_at,
+                               fb_comment_count, fb_reaction_count, content_hash)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
             RETURNING id
         """
-        result = db.execute_single_fetch(
-            query, (fb_post_id, account_id, content, post_url, posted_at or datetime.now())
-        )
-        
-        if result:
-            return True, result[0]
-        else:
+        # The row and its account's post count are written together
+        try:
+            with db.transaction():
+                result = db.execute_single_fetch(
+                    query, (fb_post_id, account_id, content, post_url, posted_at or datetime.now(),
+                            comment_count, reaction_count, row_hash)
+                )
+                if use_denormalized_counts():
+                    db.execute_query(
+                        "UPDATE fb_accounts SET post_count = post_count + 1 WHERE id = %s", (account_id,)
+                    )
+        except Exception as e:
+            st.error(f"Query execution error: {e}")
             return False, "Failed to save post"
+        
+        if stats is not None:
+            stats["inserted"] += 1
+        return True, result[0]
+
+def save_posts(posts):
+    """Insert several newly published posts in one statement and transaction
+    
+    posts is a list of (fb_post_id, account_id, content, post_url, posted_at)
+    tuples. Returns a dict mapping each fb_post_id to its local id; posts
+    that were already stored (e.g. by a sync) keep their row and id.
+    """
+    if not posts:
+        return {}
+    
+    db = get_db_connection()
+    
+    values = []
+    params = []
+    for fb_post_id, account_id, content, post_url, posted_at in posts:
+        values.append("(%s, %s, %s, %s, %s, %s)")
+        params.extend([fb_post_id, account_id, content, post_url, posted_at,
+                       content_hash(content, post_url, posted_at, None, None)])
+    
+    query = f"""
+        INSERT INTO posts (fb_post_id, account_id, content, post_url, posted_at, content_hash)
+        VALUES {", ".join(values)}
+        ON CONFLICT (fb_post_id) DO NOTHING
+        RETURNING id, fb_post_id
+    """
+    
+    try:
+        with db.transaction():
+            rows = db.execute_query(query, params, fetch=True)
+            
+            # Posts skipped as already known aren't returned; look their ids up
+            skipped = sorted({post[0] for post in posts} - {row[1] for row in rows})
+            if skipped:
+                rows += db.execute_query(f"""
+                    SELECT id, fb_post_id FROM posts
+                    WHERE fb_post_id IN ({", ".join(["%s"] * len(skipped))})
+                """, skipped, fetch=True)
+            
+            if use_denormalized_counts():
+                account_ids = sorted({post[1] for post in posts})
+                db.execute_query(f"""
+                    UPDATE fb_accounts SET post_count = (
+                        SELECT COUNT(*) FROM posts WHERE posts.account_id = fb_accounts.id
+                    )
+                    WHERE id IN ({", ".join(["%s"] * len(account_ids))})
+                """, account_ids)
+    except Exception as e:
+        st.error(f"Query execution error: {e}")
+        return {}
+    
+    return {fb_post_id: post_id for post_id, fb_post_id in rows}
 
 def get_posts_by_account(account_id, limit=50, offset=0):
     """Get posts for a specific Facebook account"""
     db = get_db_connection()
     
     query = """
-        SELECT id, fb_post_id, content, post_url, posted_at, created_at
+        SELECT id, fb_post_id, content, post_url, posted_at, created_at,
+               fb_comment_count, fb_reaction_count
         FROM posts
         WHERE account_id = %s
         ORDER BY posted_at DESC
         LIMIT %s OFFSET %s
     """
-    results = db.execute_query(query, (account_id, limit, offset), fetch=True)
+    results = db.execute_query(query, (account_id, limit, offset), fetch=True, replica=True)
     
     posts = []
     if results:
@@ -62,11 +160,77 @@ def get_posts_by_account(account_id, limit=50, offset=0):
                 "content": row[2],
                 "post_url": row[3],
                 "posted_at": row[4],
-                "created_at": row[5]
+                "created_at": row[5],
+                "comment_count": row[6],
+                "reaction_count": row[7]
             })
     
     return posts
 
+def get_recent_post_ids(account_id, since):
+    """Get (id, fb_post_id) of an account's posts published since a datetime"""
+    db = get_db_connection()
+    
+    query = """
+        SELECT id, fb_post_id
+        FROM posts
+        WHERE account_id = %s AND posted_at >= %s
+        ORDER BY posted_at DESC
+    """
+    results = db.execute_query(query, (account_id, since), fetch=True)
+    
+    return [(row[0], row[1]) for row in results] if results else []
+
+def get_feed_page(user_id, account_ids=None, cursor=None, limit=20):
+    """Get one page of the unified feed across a user's accounts, newest first
+    
+    Uses keyset pagination on (posted_at, id): pass the returned cursor to
+    get the next page. Returns (posts, cursor), where cursor is None on the
+    last page.
+    """
+    db = get_db_connection()
+    
+    query = """
+        SELECT p.id, p.fb_post_id, p.account_id, a.account_name, p.content, p.post_url,
+               p.posted_at, p.fb_comment_count, p.fb_reaction_count
+        FROM posts p
+        JOIN fb_accounts a ON a.id = p.account_id
+        WHERE a.user_id = %s AND p.posted_at IS NOT NULL
+    """
+    params = [user_id]
+    
+    if account_ids:
+        query += f" AND p.account_id IN ({', '.join(['%s'] * len(account_ids))})"
+        params.extend(account_ids)
+    
+    if cursor:
+        query += " AND (p.posted_at, p.id) < (%s, %s)"
+        params.extend(cursor)
+    
+    # One extra row tells whether another page follows
+    query += " ORDER BY p.posted_at DESC, p.id DESC LIMIT %s"
+    params.append(limit + 1)
+    
+    results = db.execute_query(query, params, fetch=True, replica=True) or []
+    
+    posts = []
+    for row in results[:limit]:
+        posts.append({
+            "id": row[0],
+            "fb_post_id": row[1],
+            "account_id": row[2],
+            "account_name": row[3],
+            "content": row[4],
+            "post_url": row[5],
+            "posted_at": row[6],
+            "comment_count": row[7],
+            "reaction_count": row[8]
+        })
+    
+    next_cursor = (posts[-1]["posted_at"], posts[-1]["id"]) if len(results) > limit else None
+    return posts, next_cursor
+
+@cached(POST)
 def get_post_by_id(post_id):
     """Get a post by its ID"""
     db = get_db_connection()
@@ -110,38 +274,82 @@ def delete_post(post_id):
     """Delete a post from the database"""
     db = get_db_connection()
     
-    # Delete associated comments first
-    query = "DELETE FROM comments WHERE post_id = %s"
-    db.execute_query(query, (post_id,))
-    
-    # Delete the post
-    query = "DELETE FROM posts WHERE id = %s"
-    success = db.execute_query(query, (post_id,))
-    
-    return success
+    # The count, the comments and the post go together or not at all
+    try:
+        with db.transaction():
+            if use_denormalized_counts():
+                query = """
+                    UPDATE fb_accounts SET post_count = post_count - 1
+                    WHERE id = (SELECT account_id FROM posts WHERE id = %s)
+                """
+                db.execute_query(query, (post_id,))
+            
+            # Delete associated comments first
+            query = "DELETE FROM comments WHERE post_id = %s"
+            db.execute_query(query, (post_id,))
+            
+            # Delete the post and take it back out of the best-time bins
+            query = "DELETE FROM posts WHERE id = %s RETURNING account_id, posted_at, binned_engagement"
+            deleted = db.execute_single_fetch(query, (post_id,))
+            if deleted:
+                unbin_post(*deleted)
+            
+            # Other processes hear of it once the transaction commits
+            invalidate(POST, post_id)
+    except Exception as e:
+        st.error(f"Query execution error: {e}")
+        return None
+    return True
 
 def count_posts_by_account(account_id):
     """Count the number of posts for an account"""
+    return count_posts_by_accounts([account_id])[account_id]
+
+def count_posts_by_accounts(account_ids):
+    """Count posts for several accounts in one query
+    
+    Returns a dict mapping every account id to its post count. With
+    denormalized counts enabled this reads fb_accounts.post_count instead
+    of aggregating.
+    """
+    if not account_ids:
+        return {}
+    
     db = get_db_connection()
     
-    query = "SELECT COUNT(*) FROM posts WHERE account_id = %s"
-    result = db.execute_single_fetch(query, (account_id,))
+    placeholders = ", ".join(["%s"] * len(account_ids))
+    if use_denormalized_counts():
+        query = f"SELECT id, post_count FROM fb_accounts WHERE id IN ({placeholders})"
+    else:
+        query = f"""
+            SELECT account_id, COUNT(*)
+            FROM posts
+            WHERE account_id IN ({placeholders})
+            GROUP BY account_id
+        """
+    results = db.execute_query(query, tuple(account_ids), fetch=True, replica=True)
     
-    return result[0] if result else 0
+    counts = {account_id: 0 for account_id in account_ids}
+    if results:
+        for row in results:
+            counts[row[0]] = row[1]
+    
+    return counts
 
 def search_posts(account_id, search_term, limit=50, offset=0):
     """Search posts by content for a specific account"""
     db = get_db_connection()
     
     query = """
-        SELECT id, fb_post_id, content, post_url, posted_at, created_at
+        SELECT id, fb_post_id, content, post_url, posted_at, created_at,
+               fb_comment_count, fb_reaction_count
         FROM posts
         WHERE account_id = %s AND content ILIKE %s
         ORDER BY posted_at DESC
         LIMIT %s OFFSET %s
     """
     search_pattern = f"%{search_term}%"
-    results = db.execute_query(query, (account_id, search_pattern, limit, offset), fetch=True)
+    results = db.execute_query(query, (account_id, search_pattern, limit, offset), fetch=True, replica=True)
     
     posts = []
     if results:
@@ -152,7 +360,34 @@ def search_posts(account_id, search_term, limit=50, offset=0):
                 "content": row[2],
                 "post_url": row[3],
                 "posted_at": row[4],
-                "created_at": row[5]
+                "created_at": row[5],
+                "comment_count": row[6],
+                "reaction_count": row[7]
             })
     
     return posts
+
+def iter_posts(account_id=None, itersize=None):
+    """Lazily iterate over posts (of one account, or all) as PostRow tuples
+    
+    Rows are fetched from a server-side cursor itersize at a time, so batch
+    jobs can scan any number of posts in bounded memory.
+    """
+    db = get_db_connection()
+    
+    query = """
+        SELECT id, fb_post_id, account_id, content, post_url, posted_at,
+               fb_comment_count, fb_reaction_count
+        FROM posts
+    """
+    params = ()
+    
+    if account_id is not None:
+        query += " WHERE account_id = %s"
+        params = (account_id,)
+    
+    query += " ORDER BY id"
+    
+    for rows in db.stream_query(query, params, itersize, replica=True):
+        for row in rows:
+            yield PostRow._make(row)
@@ -0,0 +1,215 @@
+"""Read replicas behind the PostgreSQL connection
+
+Functions in database/*_db.py that only read, and can tolerate a little
+replication lag, pass replica=True to execute_query/execute_single_fetch/
+stream_query/copy_to_csv. Those statements go to one of the replicas in
+the db_replica_urls setting, chosen as follows:
+
+- replicas that failed are skipped for an exponentially growing backoff
+- replication lag is re-checked every HEALTH_CHECK_INTERVAL seconds and
+  replicas further behind than db_replica_max_lag_seconds are skipped
+- of two random remaining replicas the one with the lower recent latency
+  wins, which spreads load while steering away from slow ones
+
+A session that wrote within the max lag plus one health-check interval
+reads from the primary, so a post shows up in listings right after it's
+created. If no replica
+qualifies, or the chosen one fails, the read falls back to the primary.
+"""
+import random
+import threading
+import time
+import psycopg2
+import streamlit as st
+from psycopg2.extensions import parse_dsn
+from streamlit.runtime.scriptrunner import get_script_run_ctx
+from config import get_setting
+
+# Defaults for the db_replica_* settings
+DEFAULT_MAX_LAG_SECONDS = 5.0
+
+# Seconds between replication lag checks of a replica
+HEALTH_CHECK_INTERVAL = 10.0
+
+# Backoff after a replica fails: doubled per consecutive failure, capped
+MIN_RETRY_SECONDS = 5.0
+MAX_RETRY_SECONDS = 300.0
+
+CONNECT_TIMEOUT = 3
+
+# Weight of the latest query in a replica's average latency
+LATENCY_SMOOTHING = 0.2
+
+# Replay lag in seconds; zero when the replica has replayed all it received
+# (otherwise an idle primary would make every replica look behind). NULL when
+# the server isn't streaming from a primary, since it then replays nothing
+# new and "all received" says nothing. The receiver's status is hidden from
+# roles without pg_read_all_stats, who only see whether it is running.
+LAG_QUERY = """
+    SELECT CASE
+        WHEN NOT pg_is_in_recovery() THEN NULL
+        WHEN NOT EXISTS (
+            SELECT 1 FROM pg_stat_wal_receiver WHERE COALESCE(status, 'streaming') = 'streaming'
+        ) THEN NULL
+        WHEN pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0
+        ELSE COALESCE(EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()), 0)
+    END
+"""
+
+SESSION_WRITE_KEY = "db_last_write_at"
+
+# Write times of threads outside a Streamlit session (workers, CLI tools)
+thread_writes = threading.local()
+
+def max_lag():
+    return float(get_setting("db_replica_max_lag_seconds", DEFAULT_MAX_LAG_SECONDS))
+
+def mark_write():
+    """Record that the current session (or thread) just wrote to the primary"""
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        st.session_state[SESSION_WRITE_KEY] = time.monotonic()
+    else:
+        thread_writes.last_write_at = time.monotonic()
+
+def wrote_recently():
+    """Check if the current session wrote recently enough that replicas may lag behind it
+    
+    A replica's lag is only re-measured every HEALTH_CHECK_INTERVAL, so one
+    that looked caught up may have fallen max_lag behind since; the pin
+    covers both.
+    """
+    if get_script_run_ctx(suppress_warning=True) is not None:
+        last_write_at = st.session_state.get(SESSION_WRITE_KEY)
+    else:
+        last_write_at = getattr(thread_writes, "last_write_at", None)
+    return last_write_at is not None and time.monotonic() - last_write_at < max_lag() + HEALTH_CHECK_INTERVAL
+
+class Replica:
+    """One read replica with its shared connection and health state"""
+    
+    def __init__(self, dsn):
+        self.dsn = dsn
+        params = parse_dsn(dsn)
+        self.name = f"{params.get('host', 'localhost')}:{params.get('port', 5432)}"
+        self.lock = threading.Lock()
+        self.conn = None
+        self.failures = 0
+        self.retry_at = 0.0
+        self.checked_at = None
+        self.lag = None
+        self.latency = None
+        self.queries = 0
+        self.errors = 0
+    
+    def open_connection(self, autocommit=False):
+        """Open a new connection to the replica"""
+        conn = psycopg2.connect(self.dsn, connect_timeout=CONNECT_TIMEOUT)
+        conn.autocommit = autocommit
+        return conn
+    
+    def fetch(self, query, params, one=False):
+        """Run a read on the shared connection and return its rows (or first row)"""
+        with self.lock:
+            if self.conn is None or self.conn.closed:
+                # Autocommit, so the shared connection never sits idle in a transaction
+                self.conn = self.open_connection(autocommit=True)
+            cursor = self.conn.cursor()
+            try:
+                cursor.execute(query, params or ())
+                return cursor.fetchone() if one else cursor.fetchall()
+            finally:
+                cursor.close()
+    
+    def is_available(self, now):
+        return now >= self.retry_at
+    
+    def is_caught_up(self, now):
+        """Check replication lag, re-measuring it when the last check is stale"""
+        if self.checked_at is None or now - self.checked_at >= HEALTH_CHECK_INTERVAL:
+            try:
+                lag = self.fetch(LAG_QUERY, None, one=True)[0]
+            except Exception:
+                self.record_failure()
+                return False
+            self.lag = float(lag) if lag is not None else None
+            self.checked_at = now
+        # No lag figure means it isn't replicating, so it could be any amount behind
+        return self.lag is not None and self.lag <= max_lag()
+    
+    def record_success(self, seconds):
+        self.queries += 1
+        self.failures = 0
+        if self.latency is None:
+            self.latency = seconds
+        else:
+            self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+    
+    def record_failure(self):
+        """Back off from the replica and drop its connection"""
+        self.errors += 1
+        self.failures += 1
+        self.retry_at = time.monotonic() + min(MAX_RETRY_SECONDS, MIN_RETRY_SECONDS * 2 ** (self.failures - 1))
+        self.checked_at = None
+        with self.lock:
+            if self.conn is not None:
+                try:
+                    self.conn.close()
+                except Exception:
+                    pass
+                self.conn = None
+    
+    def snapshot(self):
+        now = time.monotonic()
+        if not self.is_available(now):
+            state = f"backing off {self.retry_at - now:.0f}s"
+        elif self.checked_at is not None and self.lag is None:
+            state = "not replicating"
+        else:
+            state = "available"
+        return {
+            "replica": self.name,
+            "state": state,
+            "lag_s": self.lag,
+            "avg_ms": self.latency * 1000 if self.latency is not None else None,
+            "queries": self.queries,
+            "errors": self.errors,
+        }
+
+class ReplicaPool:
+    """The configured replicas and the choice between them"""
+    
+    def __init__(self, dsns):
+        self.replicas = [Replica(dsn) for dsn in dsns]
+    
+    def __bool__(self):
+        return bool(self.replicas)
+    
+    def choose(self):
+        """Pick a healthy, caught-up replica for the current session, or None for the primary"""
+        if not self.replicas or wrote_recently():
+            return None
+        
+        now = time.monotonic()
+        candidates = [replica for replica in self.replicas if replica.is_available(now)]
+        random.shuffle(candidates)
+        
+        healthy = []
+        for replica in candidates:
+            if replica.is_caught_up(now):
+                healthy.append(replica)
+                if len(healthy) == 2:
+                    break
+        
+        if not healthy:
+            return None
+        return min(healthy, key=lambda replica: replica.latency if replica.latency is not None else 0.0)
+    
+    def snapshot(self):
+        return [replica.snapshot() for replica in self.replicas]
+
+def create_pool():
+    """Build the pool from the db_replica_urls setting (a list of DSNs)"""
+    dsns = get_setting("db_replica_urls", None) or []
+    if isinstance(dsns, str):
+        dsns = [dsns]
+    return ReplicaPool(list(dsns))
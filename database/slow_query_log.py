@@ -0,0 +1,99 @@
+import json
+import logging
+import os
+import random
+import re
+import threading
+from datetime import datetime
+from logging.handlers import RotatingFileHandler
+from config import get_setting
+
+# Defaults for the slow_query_* settings
+DEFAULT_THRESHOLD_MS = 500
+DEFAULT_EXPLAIN_RATE = 0.1
+DEFAULT_LOG_PATH = os.path.join("logs", "slow_queries.log")
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 5
+
+# Calls and clauses that make a SELECT do more than read: locks, sequence
+# bumps, settings changes, notifications, row locks and SELECT ... INTO
+SIDE_EFFECT_PATTERN = re.compile(
+    r"\b(?:pg_(?:try_)?advisory_\w*|nextval|setval|set_config|pg_notify)\s*\("
+    r"|\bFOR\s+(?:NO\s+KEY\s+)?(?:UPDATE|SHARE)\b|\bFOR\s+KEY\s+SHARE\b|\bINTO\b",
+    re.IGNORECASE
+)
+
+logger = logging.getLogger("fb_manager.slow_queries")
+_handler_lock = threading.Lock()
+
+def get_threshold_ms():
+    """Get the slow-query threshold in milliseconds, or None when disabled"""
+    threshold = get_setting("slow_query_ms", DEFAULT_THRESHOLD_MS)
+    if threshold is None or float(threshold) <= 0:
+        return None
+    return float(threshold)
+
+def _get_logger():
+    """Attach the rotating file handler on first use"""
+    with _handler_lock:
+        if not logger.handlers:
+            path = get_setting("slow_query_log_path", DEFAULT_LOG_PATH)
+            directory = os.path.dirname(path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            
+            handler = RotatingFileHandler(
+                path,
+                maxBytes=int(get_setting("slow_query_log_max_bytes", DEFAULT_MAX_BYTES)),
+                backupCount=int(get_setting("slow_query_log_backups", DEFAULT_BACKUP_COUNT)),
+                encoding="utf-8"
+            )
+            handler.setFormatter(logging.Formatter("%(message)s"))
+            logger.addHandler(handler)
+            logger.setLevel(logging.INFO)
+            logger.propagate = False
+    return logger
+
+def redact_param(value):
+    """Replace a bound parameter with its type so no user data reaches the log"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        return f"<str:{len(value)}>"
+    if isinstance(value, (list, tuple)):
+        return [redact_param(item) for item in value]
+    return f"<{type(value).__name__}>"
+
+def normalize_statement(query):
+    """Collapse whitespace so each statement logs on one line"""
+    return re.sub(r"\s+", " ", query).strip()
+
+def is_explainable(query):
+    """EXPLAIN ANALYZE executes the statement, so only plain reads are sampled
+    
+    WITH is left out since its CTEs may modify data, and so are SELECTs that
+    call a function with side effects, take row locks or create a table.
+    """
+    if query.lstrip().split(None, 1)[0].upper() != "SELECT":
+        return False
+    return not SIDE_EFFECT_PATTERN.search(query)
+
+def record(db, name, query, params, elapsed):
+    """Log a statement that ran over the threshold, sampling an EXPLAIN plan"""
+    entry = {
+        "timestamp": datetime.now().isoformat(timespec="milliseconds"),
+        "backend": db.name,
+        "caller": name,
+        "duration_ms": round(elapsed * 1000, 2),
+        "statement": normalize_statement(query),
+        "params": redact_param(list(params or ())),
+    }
+    
+    explain_rate = float(get_setting("slow_query_explain_rate", DEFAULT_EXPLAIN_RATE))
+    if is_explainable(query) and random.random() < explain_rate:
+        try:
+            entry["plan"] = db.explain(query, params)
+        except Exception as e:
+            entry["plan_error"] = str(e)
+    
+    _get_logger().info(json.dumps(entry, default=str))
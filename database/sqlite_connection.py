@@ -0,0 +1,146 @@
+import re
+import sqlite3
+import streamlit as st
+from datetime import datetime
+from config import get_setting
+from database.connection import DatabaseConnection
+
+# Store datetimes as ISO 8601 text and parse them back on the way out. Offsets
+# are dropped, matching PostgreSQL TIMESTAMP (without time zone) columns
+sqlite3.register_adapter(datetime, lambda value: value.replace(tzinfo=None).isoformat(" "))
+sqlite3.register_converter("TIMESTAMP", lambda value: datetime.fromisoformat(value.decode()))
+
+class SQLiteConnection(DatabaseConnection):
+    """Embedded SQLite backend for single-node deployments, tests and benchmarks"""
+    
+    name = "sqlite"
+    serial_primary_key = "INTEGER PRIMARY KEY AUTOINCREMENT"
+    
+    def connect(self):
+        """Open the SQLite database file in WAL mode"""
+        try:
+            self.conn = self.open_connection()
+            self.cursor = self.conn.cursor()
+            return True
+        except Exception as e:
+            st.error(f"Database connection error: {e}")
+            return False
+    
+    def open_connection(self):
+        """Open a new connection to the database file"""
+        db_path = get_setting("db_path", "fb_manager.db")
+        
+        # Streamlit reruns scripts on different threads, so connections
+        # can't be tied to the thread that opened them
+        conn = sqlite3.connect(
+            db_path, detect_types=sqlite3.PARSE_DECLTYPES, check_same_thread=False
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("PRAGMA foreign_keys=ON")
+        return conn
+    
+    def is_connected(self):
+        """Check if the SQLite connection is open"""
+        if self.conn is None:
+            return False
+        try:
+            self.conn.total_changes
+            return True
+        except sqlite3.ProgrammingError:
+            return False
+    
+    def disconnect(self):
+        """Close database connection"""
+        super().disconnect()
+        self.conn = None
+        self.cursor = None
+    
+    def begin(self):
+        """Start the transaction before its first statement, which may be a read
+        
+        sqlite3 only begins one implicitly before a write. IMMEDIATE takes the
+        write lock up front, so a unit that reads and then writes can't fail
+        halfway with "database is locked" while another process writes.
+        """
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE")
+    
+    def explain(self, query, params=None):
+        """Return SQLite's query plan (it has no EXPLAIN ANALYZE)"""
+        cursor = self.conn.cursor()
+        try:
+            cursor.execute("EXPLAIN QUERY PLAN " + self.translate_query(query), params or ())
+            return "\n".join(row[3] for row in cursor.fetchall())
+        finally:
+            cursor.close()
+    
+    def translate_query(self, query):
+        """Rewrite PostgreSQL placeholders and operators for SQLite"""
+        query = query.replace("%s", "?")
+        # IS compares NULLs as equal in SQLite, like IS NOT DISTINCT FROM
+        query = query.replace("IS NOT DISTINCT FROM", "IS")
+        # LIKE is already case-insensitive for ASCII in SQLite
+        return re.sub(r"\bILIKE\b", "LIKE", query)
+    
+    def table_exists(self, table_name):
+        """Check if a table exists in the database"""
+        query = "SELECT COUNT(*) FROM sqlite_master WHERE type = 'table' AND name = %s"
+        result = self.execute_single_fetch(query, (table_name,))
+        return bool(result[0]) if result else False
+    
+    def column_exists(self, table_name, column_name):
+        """Check if a column exists on a table"""
+        results = self.execute_query(f"PRAGMA table_info({table_name})", fetch=True)
+        return any(row[1] == column_name for row in results or [])
+    
+    def create_core_tables(self):
+        """Create the original tables if they don't exist"""
+        # Users table
+        self.execute_query("""
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                username VARCHAR(100) UNIQUE NOT NULL,
+                password_hash VARCHAR(255) NOT NULL,
+                email VARCHAR(255),
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        
+        # Facebook accounts table
+        self.execute_query("""
+            CREATE TABLE IF NOT EXISTS fb_accounts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                user_id INTEGER REFERENCES users(id),
+                account_name VARCHAR(100) NOT NULL,
+                access_token TEXT NOT NULL,
+                page_id VARCHAR(255),
+                expires_at TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        
+        # Posts table (for caching/tracking posts)
+        self.execute_query("""
+            CREATE TABLE IF NOT EXISTS posts (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fb_post_id VARCHAR(255) UNIQUE NOT NULL,
+                account_id INTEGER REFERENCES fb_accounts(id),
+                content TEXT,
+                post_url TEXT,
+                posted_at TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
+        
+        # Comments table (for caching/tracking comments)
+        self.execute_query("""
+            CREATE TABLE IF NOT EXISTS comments (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                fb_comment_id VARCHAR(255) UNIQUE NOT NULL,
+                post_id INTEGER REFERENCES posts(id),
+                content TEXT,
+                commented_at TIMESTAMP,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            );
+        """)
@@ -0,0 +1,247 @@
+"""Server-side prepared statements for the hot query set
+
+PostgreSQL parses, analyzes and rewrites every statement it receives. The
+*_db.py functions send the same few dozen query strings over and over, so
+once a query text has run db_prepare_threshold times on the shared
+connection it is PREPAREd there and later calls send a short EXECUTE with
+just the parameters.
+
+Prepared statements belong to the server session: the registry is reset
+whenever the connection is reopened, and a statement that vanished anyway
+(server restart, a pooler running DISCARD ALL) is re-run as plain SQL.
+Queries PostgreSQL can't prepare on their own, e.g. because a parameter's
+type can't be inferred, are remembered and always run as plain SQL.
+
+Compare per-call latency with and without preparing:
+    
+    python -m database.statements --account-id 1
+"""
+import argparse
+import itertools
+import re
+import sys
+import time
+from collections import Counter
+import psycopg2
+import psycopg2.errors
+from psycopg2.extensions import TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS
+from config import get_setting
+
+# Defaults for the db_prepare_* settings; a threshold of 0 turns preparing off
+DEFAULT_THRESHOLD = 5
+DEFAULT_MAX_STATEMENTS = 200
+
+PLACEHOLDER = re.compile(r"%[%s]")
+
+PREPARABLE_COMMANDS = frozenset(("SELECT", "INSERT", "UPDATE", "DELETE", "WITH"))
+
+# Transaction states a statement can be prepared in (not failed, not mid-COPY)
+PREPARE_STATUSES = (TRANSACTION_STATUS_IDLE, TRANSACTION_STATUS_INTRANS)
+
+def to_positional(query):
+    """Rewrite %s placeholders as $1, $2, ... (and %% as %) for PREPARE
+    
+    Returns the rewritten query and its number of parameters.
+    """
+    count = 0
+    
+    def replace(match):
+        nonlocal count
+        if match.group() == "%%":
+            return "%"
+        count += 1
+        return f"${count}"
+    
+    return PLACEHOLDER.sub(replace, query), count
+
+def is_preparable(query):
+    return query.lstrip().split(None, 1)[0].upper() in PREPARABLE_COMMANDS
+
+class StatementRegistry:
+    """Prepared statements of one connection, keyed by query text
+    
+    Callers serialize on the connection's lock, like every other use of
+    the shared cursor.
+    """
+    
+    def __init__(self):
+        self.sequence = itertools.count(1)
+        self.enabled = True
+        self.rejected = set()
+        self.stats = Counter()
+        self.reset()
+    
+    def reset(self):
+        """Forget every statement, e.g. after reconnecting (they die with the session)"""
+        self.statements = {}
+        self.uses = Counter()
+    
+    def execute(self, conn, cursor, query, params):
+        """Run a query on the cursor, as a prepared statement once it's hot"""
+        statement = None
+        if self.enabled:
+            statement = self.statements.get(query) or self.prepare_if_hot(conn, cursor, query)
+        if statement is None:
+            cursor.execute(query, params)
+            return
+        
+        was_idle = conn.info.transaction_status == TRANSACTION_STATUS_IDLE
+        try:
+            cursor.execute(statement, params)
+        except psycopg2.errors.InvalidSqlStatementName:
+            # The statement is gone from the server session; start over, and
+            # re-run it plainly unless that would lose earlier work in the transaction
+            self.reset()
+            self.stats["fallbacks"] += 1
+            if not was_idle:
+                raise
+            conn.rollback()
+            cursor.execute(query, params)
+            return
+        self.stats["executions"] += 1
+    
+    def prepare_if_hot(self, conn, cursor, query):
+        """Prepare a query once it has run often enough; returns its EXECUTE statement or None"""
+        threshold = int(get_setting("db_prepare_threshold", DEFAULT_THRESHOLD))
+        if threshold <= 0 or query in self.rejected:
+            return None
+        
+        max_statements = int(get_setting("db_prepare_max_statements", DEFAULT_MAX_STATEMENTS))
+        # Queries built per call (IN lists, multi-row VALUES) would grow the tally forever
+        if len(self.uses) > 10 * max_statements:
+            self.uses.clear()
+        self.uses[query] += 1
+        if self.uses[query] < threshold:
+            return None
+        
+        # Not now if the cap is reached or the transaction is already failing
+        if len(self.statements) >= max_statements or conn.info.transaction_status not in PREPARE_STATUSES:
+            return None
+        if not is_preparable(query):
+            self.rejected.add(query)
+            return None
+        
+        name = f"fbm_{next(self.sequence)}"
+        positional, count = to_positional(query)
+        if not self.prepare(conn, cursor, name, positional):
+            self.rejected.add(query)
+            self.stats["rejected"] += 1
+            return None
+        
+        statement = f"EXECUTE {name}"
+        if count:
+            statement += f" ({', '.join(['%s'] * count)})"
+        self.statements[query] = statement
+        del self.uses[query]
+        self.stats["prepared"] += 1
+        return statement
+    
+    def prepare(self, conn, cursor, name, query):
+        """PREPARE a statement without disturbing the caller's transaction
+        
+        Reads leave the shared connection inside a transaction, and a failed
+        PREPARE would abort it, so one already open is guarded by a savepoint.
+        """
+        if conn.info.transaction_status == TRANSACTION_STATUS_IDLE:
+            try:
+                cursor.execute(f"PREPARE {name} AS {query}")
+            except psycopg2.Error:
+                conn.rollback()
+                return False
+            return True
+        
+        cursor.execute("SAVEPOINT prepare_statement")
+        try:
+            cursor.execute(f"PREPARE {name} AS {query}")
+        except psycopg2.Error:
+            cursor.execute("ROLLBACK TO SAVEPOINT prepare_statement")
+            return False
+        finally:
+            cursor.execute("RELEASE SAVEPOINT prepare_statement")
+        return True
+    
+    def snapshot(self):
+        return {
+            "statements": len(self.statements),
+            "prepared": self.stats["prepared"],
+            "executions": self.stats["executions"],
+            "rejected": len(self.rejected),
+            "fallbacks": self.stats["fallbacks"],
+        }
+
+def time_calls(function, calls):
+    start = time.perf_counter()
+    for _ in range(calls):
+        function()
+    return (time.perf_counter() - start) / calls
+
+def benchmark(db, account_id, calls=500, rounds=5):
+    """Time hot *_db.py functions with preparing off and on; returns {name: (plain_ms, prepared_ms)}"""
+    from database.account_db import load_account
+    from database.post_db import get_posts_by_account, save_post
+    
+    account = load_account.__wrapped__(account_id)
+    if not account:
+        raise ValueError(f"Account {account_id} not found")
+    posts = get_posts_by_account(account_id, limit=1)
+    if not posts:
+        raise ValueError(f"Account {account_id} has no posts to re-save")
+    post = posts[0]
+    
+    functions = {
+        # Bypass the row cache, which would otherwise answer every call
+        "get_account_by_id": lambda: load_account.__wrapped__(account_id),
+        "get_posts_by_account": lambda: get_posts_by_account(account_id),
+        # An unchanged re-sync: a lookup by fb_post_id and no write
+        "save_post": lambda: save_post(post["fb_post_id"], account_id, post["content"], post["post_url"], post["posted_at"]),
+    }
+    
+    statements = db.statements
+    threshold = int(get_setting("db_prepare_threshold", DEFAULT_THRESHOLD))
+    results = {}
+    for name, function in functions.items():
+        # Warm up until the function's queries are prepared
+        time_calls(function, max(threshold, 1))
+        
+        # Alternate modes so drift hits both alike; keep each mode's best round
+        plain, prepared = [], []
+        for _ in range(rounds):
+            statements.enabled = False
+            try:
+                plain.append(time_calls(function, calls))
+            finally:
+                statements.enabled = True
+            prepared.append(time_calls(function, calls))
+        results[name] = (min(plain) * 1000, min(prepared) * 1000)
+    return results
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark hot queries with and without prepared statements")
+    parser.add_argument("--account-id", type=int, required=True, help="account with at least one post")
+    parser.add_argument("--calls", type=int, default=500, help="calls per timed round")
+    parser.add_argument("--rounds", type=int, default=5, help="rounds per function and mode (best one counts)")
+    args = parser.parse_args(argv)
+    
+    from database.connection import get_db_connection
+    db = get_db_connection()
+    if getattr(db, "statements", None) is None:
+        print(f"The {db.name} backend doesn't use server-side prepared statements", file=sys.stderr)
+        return 1
+    if int(get_setting("db_prepare_threshold", DEFAULT_THRESHOLD)) <= 0:
+        print("Preparing is turned off (db_prepare_threshold = 0)", file=sys.stderr)
+        return 1
+    
+    try:
+        results = benchmark(db, args.account_id, args.calls, args.rounds)
+    except ValueError as e:
+        print(e, file=sys.stderr)
+        return 1
+    
+    print(f"{'function':<24} {'plain ms':>10} {'prepared ms':>12} {'saved':>8}")
+    for name, (plain, prepared) in results.items():
+        print(f"{name:<24} {plain:>10.3f} {prepared:>12.3f} {1 - prepared / plain:>8.1%}")
+    print(db.statements.snapshot())
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,33 +1,41 @@
 from database.connection import get_db_connection
 from passlib.hash import bcrypt
 import streamlit as st
+from config import get_setting
+
+# passlib's own default cost factor
+DEFAULT_BCRYPT_ROUNDS = 12
+
+def get_password_hasher():
+    """Get the bcrypt hasher configured with the current cost factor"""
+    rounds = int(get_setting("bcrypt_rounds", DEFAULT_BCRYPT_ROUNDS))
+    return bcrypt.using(rounds=rounds)
 
 def create_user(username, password, email=None):
     """Create a new user in the database"""
     db = get_db_connection()
     
-    # Check if username already exists
-    query = "SELECT id FROM users WHERE username = %s"
-    result = db.execute_single_fetch(query, (username,))
-    
-    if result:
-        return False, "Username already exists"
-    
     # Hash the password
-    password_hash = bcrypt.hash(password)
+    password_hash = get_password_hasher().hash(password)
     
-    # Insert the new user
+    # Insert the new user; the unique username settles concurrent sign-ups
     query = """
         INSERT INTO users (username, password_hash, email)
         VALUES (%s, %s, %s)
+        ON CONFLICT (username) DO NOTHING
         RETURNING id
     """
-    result = db.execute_single_fetch(query, (username, password_hash, email))
+    try:
+        with db.transaction():
+            result = db.execute_single_fetch(query, (username, password_hash, email))
+    except Exception as e:
+        st.error(f"Query execution error: {e}")
+        return False, "Failed to create user"
     
     if result:
         return True, result[0]
     else:
-        return False, "Failed to create user"
+        return False, "Username already exists"
 
 def authenticate_user(username, password):
     """Authenticate a user by username and password"""
@@ -48,6 +56,29 @@ def authenticate_user(username, password):
     else:
         return False, "Invalid password"
 
+def get_user_credentials(username):
+    """Get id, username and password hash for a username in a single query"""
+    db = get_db_connection()
+    
+    query = "SELECT id, username, password_hash FROM users WHERE username = %s"
+    result = db.execute_single_fetch(query, (username,))
+    
+    if result:
+        return {
+            "id": result[0],
+            "username": result[1],
+            "password_hash": result[2]
+        }
+    else:
+        return None
+
+def update_password_hash(user_id, password_hash):
+    """Replace a user's stored password hash (e.g. after a cost factor change)"""
+    db = get_db_connection()
+    
+    query = "UPDATE users SET password_hash = %s WHERE id = %s"
+    return db.execute_query(query, (password_hash, user_id))
+
 def get_user_by_id(user_id):
     """Get user information by ID"""
     db = get_db_connection()
@@ -83,16 +114,23 @@ def update_password(user_id, current_password, new_password):
         return False, "Current password is incorrect"
     
     # Hash the new password
-    new_hash = bcrypt.hash(new_password)
-    
-    # Update the password
-    query = "UPDATE users SET password_hash = %s WHERE id = %s"
-    success = db.execute_query(query, (new_hash, user_id))
+    new_hash = get_password_hasher().hash(new_password)
+    
+    # Update the password only if it is still the one just verified, so a
+    # concurrent change isn't overwritten; bcrypt stays outside the transaction
+    # so it doesn't hold the shared connection
+    query = "UPDATE users SET password_hash = %s WHERE id = %s AND password_hash = %s RETURNING id"
+    try:
+        with db.transaction():
+            updated = db.execute_single_fetch(query, (new_hash, user_id, current_hash))
+    except Exception as e:
+        st.error(f"Query execution error: {e}")
+        return False, "Failed to update password"
     
-    if success:
+    if updated:
         return True, "Password updated successfully"
     else:
-        return False, "Failed to update password"
+        return False, "Password was changed elsewhere; please try again"
 
 def update_user_profile(user_id, email):
     """Update user profile information"""
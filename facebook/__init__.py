@@ -1,2 +1,10 @@
-# Import all facebook API modules
-from facebook import auth, posts, comments
+# All facebook API modules, imported on first attribute access so that
+# importing one of them doesn't load the rest
+import importlib
+
+__all__ = ["auth", "posts", "comments", "graph", "moderation", "auto_reply", "insights"]
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,14 +1,14 @@
-import requests
 import streamlit as st
 import json
 from database.account_db import get_account_by_id, update_facebook_account
+from facebook.graph import graph_url, graph_request
 from datetime import datetime, timedelta
 
 def get_facebook_pages(access_token):
     """Get all Facebook pages associated with an access token"""
-    url = f"https://graph.facebook.com/v18.0/me/accounts?access_token={access_token}"
+    url = graph_url(f"me/accounts?access_token={access_token}")
     try:
-        response = requests.get(url)
+        response = graph_request("GET", url)
         if response.status_code == 200:
             return response.json().get('data', [])
         else:
@@ -24,7 +24,7 @@ def get_long_lived_token(access_token):
     app_id = st.secrets["fb_app_id"]
     app_secret = st.secrets["fb_app_secret"]
     
-    url = f"https://graph.facebook.com/v18.0/oauth/access_token"
+    url = graph_url("oauth/access_token")
     params = {
         "grant_type": "fb_exchange_token",
         "client_id": app_id,
@@ -33,7 +33,7 @@ def get_long_lived_token(access_token):
     }
     
     try:
-        response = requests.get(url, params=params)
+        response = graph_request("GET", url, params=params)
         if response.status_code == 200:
             data = response.json()
             new_token = data.get("access_token")
@@ -51,14 +51,14 @@ def get_long_lived_token(access_token):
 
 def verify_token(access_token):
     """Verify if a token is valid and get basic information about it"""
-    url = f"https://graph.facebook.com/debug_token"
+    url = graph_url("debug_token", versioned=False)
     params = {
         "input_token": access_token,
         "access_token": access_token
     }
     
     try:
-        response = requests.get(url, params=params)
+        response = graph_request("GET", url, params=params)
         if response.status_code == 200:
             data = response.json().get("data", {})
             is_valid = data.get("is_valid", False)
@@ -0,0 +1,315 @@
+"""Rule-based auto-replies to newly synced comments
+
+Ingestion only matches comments against the account's templates and
+queues one reply per comment in auto_replies; a background dispatcher
+thread sends the queue through the Graph batch API, throttled per account
+with a token bucket and paused when the page hits its rate limit.
+"""
+import logging
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from config import get_setting
+from database.account_db import get_account_by_id
+from database.auto_reply_db import (
+    get_auto_reply_rules,
+    get_first_comment_ids,
+    claim_auto_replies,
+    get_accounts_with_queued_replies,
+    get_queued_auto_replies,
+    requeue_auto_replies,
+    expire_auto_reply_claims,
+    update_auto_reply
+)
+from database.comment_db import save_comment
+from database.connection import get_db_connection
+from database.moderation_db import get_moderated_comment_ids
+from facebook.graph import BATCH_LIMIT, graph_batch
+from facebook.moderation import AhoCorasick, is_word_boundary
+
+logger = logging.getLogger("fb_manager.auto_reply")
+
+# Defaults for the auto_reply_* settings
+DEFAULT_REPLIES_PER_MINUTE = 30
+DEFAULT_BACKOFF_SECONDS = 300
+DEFAULT_MAX_AGE_HOURS = 24
+
+# Longest the dispatcher sleeps before checking the queue on its own
+POLL_INTERVAL = 30
+
+# Seconds after which a claimed reply with no recorded outcome is given up
+# on as 'unknown'; far longer than sending and recording a batch takes
+CLAIM_TIMEOUT_SECONDS = 900
+
+# Graph error codes for app, user and page rate limiting
+RATE_LIMIT_CODES = {4, 17, 32, 613}
+
+class TemplateValues(dict):
+    """Template values that leave unknown {placeholders} as they are"""
+    
+    def __missing__(self, key):
+        return "{" + key + "}"
+
+def render_reply(template, comment, account):
+    """Fill in {name}, {first_name} and {page} in a reply template"""
+    name = (comment.get("from") or {}).get("name") or ""
+    values = TemplateValues(
+        name=name,
+        first_name=name.split(" ")[0] if name else "",
+        page=account["account_name"]
+    )
+    try:
+        return template.format_map(values)
+    except (ValueError, IndexError):
+        return template
+
+def parse_keywords(keywords):
+    """Split a comma-separated keyword list into lowercase keywords"""
+    return [keyword.strip().lower() for keyword in (keywords or "").split(",") if keyword.strip()]
+
+def in_window(rule, hour):
+    """Check an hour of the day falls in a rule's window, which may wrap midnight"""
+    start, end = rule["start_hour"], rule["end_hour"]
+    if start is None or end is None or start == end:
+        return True
+    if start < end:
+        return start <= hour < end
+    return hour >= start or hour < end
+
+class ReplyMatcher:
+    """An account's enabled rules, with every keyword in one automaton"""
+    
+    def __init__(self, rules):
+        self.rules = rules
+        self.keywords = {rule["id"]: parse_keywords(rule["keywords"]) for rule in rules}
+        
+        entries = [(keyword, rule["id"]) for rule in rules for keyword in self.keywords[rule["id"]]]
+        self.keyword_rule_ids = [rule_id for _, rule_id in entries]
+        self.automaton = AhoCorasick(keyword for keyword, _ in entries) if entries else None
+    
+    def keyword_matches(self, text):
+        """Get the ids of rules with a keyword in the text"""
+        matched = set()
+        if not self.automaton or not text:
+            return matched
+        
+        lowered = text.lower()
+        for end, index in self.automaton.find_all(lowered):
+            keyword = self.automaton.keywords[index]
+            if is_word_boundary(lowered, end - len(keyword) + 1, end + 1):
+                matched.add(self.keyword_rule_ids[index])
+        return matched
+    
+    def match(self, text, first_time, hour):
+        """Get the first rule (by id) that applies to a comment, or None"""
+        keyword_hits = self.keyword_matches(text)
+        for rule in self.rules:
+            if self.keywords[rule["id"]] and rule["id"] not in keyword_hits:
+                continue
+            if rule["first_time_only"] and not first_time:
+                continue
+            if not in_window(rule, hour):
+                continue
+            return rule
+        return None
+
+def parse_created_time(comment):
+    created_time = comment.get("created_time")
+    if not created_time:
+        return None
+    return datetime.fromisoformat(created_time.replace('Z', '+00:00'))
+
+def queue_auto_replies(account, comments):
+    """Match freshly synced Graph comments and queue their replies
+    
+    Skips the page's own comments, comments hidden or deleted by
+    moderation and comments older than auto_reply_max_age_hours, so
+    turning a rule on doesn't answer a post's whole history. Sending
+    happens on the dispatcher thread. Returns the number of comments
+    matched (already-queued ones are ignored by the database).
+    """
+    if not comments or not get_setting("auto_reply_enabled", True):
+        return 0
+    
+    rules = get_auto_reply_rules(account["id"], enabled_only=True)
+    if not rules:
+        return 0
+    
+    max_age = timedelta(hours=float(get_setting("auto_reply_max_age_hours", DEFAULT_MAX_AGE_HOURS)))
+    cutoff = datetime.now(timezone.utc) - max_age
+    
+    candidates = []
+    for comment in comments:
+        author_id = (comment.get("from") or {}).get("id")
+        if author_id == account["page_id"]:
+            continue
+        created_time = parse_created_time(comment)
+        if created_time is None or created_time < cutoff:
+            continue
+        candidates.append((comment, author_id, created_time))
+    
+    if not candidates:
+        return 0
+    
+    moderated = get_moderated_comment_ids([comment["id"] for comment, _, _ in candidates], ("hide", "delete"))
+    candidates = [candidate for candidate in candidates if candidate[0]["id"] not in moderated]
+    
+    first_comment_ids = set()
+    if any(rule["first_time_only"] for rule in rules):
+        author_ids = list({author_id for _, author_id, _ in candidates if author_id})
+        first_comment_ids = get_first_comment_ids(account["id"], author_ids)
+    
+    matcher = ReplyMatcher(rules)
+    replies = []
+    for comment, author_id, created_time in candidates:
+        first_time = bool(author_id) and comment["id"] in first_comment_ids
+        rule = matcher.match(comment.get("message", ""), first_time, created_time.astimezone().hour)
+        if rule:
+            replies.append((comment["id"], rule["id"], render_reply(rule["template"], comment, account)))
+    
+    if replies and claim_auto_replies(account["id"], replies):
+        dispatcher.notify()
+    return len(replies)
+
+class TokenBucket:
+    """Allow up to rate_per_minute sends, in bursts of at most capacity"""
+    
+    def __init__(self, rate_per_minute, capacity):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self.updated = time.monotonic()
+    
+    def refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+    
+    def take(self, wanted):
+        """Take up to wanted whole tokens and return how many were granted"""
+        self.refill()
+        granted = min(wanted, int(self.tokens))
+        self.tokens -= granted
+        return granted
+    
+    def give_back(self, count):
+        self.tokens = min(self.capacity, self.tokens + count)
+    
+    def wait_time(self):
+        """Seconds until the next whole token"""
+        self.refill()
+        return max(0.0, (1 - self.tokens) / self.rate) if self.rate else POLL_INTERVAL
+
+def is_rate_limited(body):
+    error = body.get("error") if isinstance(body, dict) else None
+    return bool(error) and error.get("code") in RATE_LIMIT_CODES
+
+class ReplyDispatcher:
+    """Background thread that drains the auto-reply queue"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+        self.buckets = {}
+        self.paused_until = {}
+    
+    def ensure_running(self):
+        """Start the thread unless it's already running"""
+        with self.lock:
+            if self.thread is None or not self.thread.is_alive():
+                self.thread = threading.Thread(target=self.run, name="auto-reply-dispatcher", daemon=True)
+                self.thread.start()
+    
+    def notify(self):
+        """Have the thread check the queue now"""
+        self.ensure_running()
+        self.wake.set()
+    
+    def run(self):
+        while True:
+            self.wake.clear()
+            try:
+                delay = self.dispatch_pending()
+            except Exception:
+                logger.exception("Auto-reply dispatch failed")
+                delay = POLL_INTERVAL
+            self.wake.wait(delay)
+    
+    def bucket(self, account_id):
+        rate = float(get_setting("auto_reply_per_minute", DEFAULT_REPLIES_PER_MINUTE))
+        bucket = self.buckets.get(account_id)
+        if bucket is None or bucket.rate != rate / 60.0:
+            bucket = TokenBucket(rate, min(BATCH_LIMIT, max(1, int(rate))))
+            self.buckets[account_id] = bucket
+        return bucket
+    
+    def dispatch_pending(self):
+        """Send what every account's throttle allows; returns seconds until more can go"""
+        expired = expire_auto_reply_claims(datetime.now() - timedelta(seconds=CLAIM_TIMEOUT_SECONDS))
+        if expired:
+            logger.warning("%d auto-replies were claimed but never settled; marked unknown", expired)
+        
+        delay = POLL_INTERVAL
+        for account_id in get_accounts_with_queued_replies():
+            delay = min(delay, self.dispatch_account(account_id))
+        return delay
+    
+    def dispatch_account(self, account_id):
+        """Send one batch for an account; returns seconds until it may send again"""
+        paused_for = self.paused_until.get(account_id, 0) - time.monotonic()
+        if paused_for > 0:
+            return paused_for
+        
+        bucket = self.bucket(account_id)
+        allowance = bucket.take(BATCH_LIMIT)
+        if not allowance:
+            return bucket.wait_time()
+        
+        replies = get_queued_auto_replies(account_id, allowance)
+        bucket.give_back(allowance - len(replies))
+        if not replies:
+            return POLL_INTERVAL
+        
+        account = get_account_by_id(account_id)
+        if not account:
+            for reply in replies:
+                update_auto_reply(reply["id"], "failed", error="Account not found")
+            return 0
+        
+        calls = [
+            {"method": "POST", "relative_url": f"{reply['fb_comment_id']}/comments", "body": {"message": reply["message"]}}
+            for reply in replies
+        ]
+        results = graph_batch(calls, account["access_token"])
+        
+        # The batch's outcomes are recorded with a single commit
+        throttled = []
+        with get_db_connection().transaction():
+            for reply, (status, body) in zip(replies, results):
+                if status == 200 and isinstance(body, dict) and body.get("id"):
+                    update_auto_reply(reply["id"], "sent", fb_reply_id=body["id"])
+                    if reply["comment_id"]:
+                        save_comment(
+                            body["id"], reply["post_id"], reply["message"], datetime.now(), reply["comment_id"],
+                            author_id=account["page_id"], author_name=account["account_name"]
+                        )
+                elif is_rate_limited(body):
+                    # Graph refused it, so it goes back in the queue for after the pause
+                    throttled.append(reply["id"])
+                elif status is None:
+                    # It may have been posted; never retried, so a comment can't get two replies
+                    update_auto_reply(reply["id"], "unknown", error=str(body)[:500])
+                else:
+                    update_auto_reply(reply["id"], "failed", error=str(body)[:500])
+            requeue_auto_replies(throttled)
+        
+        if throttled:
+            backoff = float(get_setting("auto_reply_backoff_seconds", DEFAULT_BACKOFF_SECONDS))
+            self.paused_until[account_id] = time.monotonic() + backoff
+            logger.warning("Auto-replies for account %s paused for %.0fs after rate limiting", account_id, backoff)
+            return backoff
+        return 0
+
+# Process-wide dispatcher; started by the first queued reply
+dispatcher = ReplyDispatcher()
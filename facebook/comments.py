@@ -1,12 +1,19 @@
-import requests
 import streamlit as st
 from datetime import datetime
 from database.account_db import get_account_by_id
 from database.post_db import get_post_by_id, get_post_by_fb_id
 from database.comment_db import save_comment, get_comment_by_fb_id
+from database.connection import get_db_connection
+from facebook.graph import graph_url, graph_request
+from facebook.moderation import moderate_comments
+from facebook.auto_reply import queue_auto_replies
+from config import get_setting
 
-def get_post_comments(post_id, account_id=None):
-    """Get comments for a specific Facebook post"""
+def get_post_comments(post_id, account_id=None, stats=None):
+    """Get comments for a specific Facebook post
+    
+    stats, if given, is a Counter of inserted/updated/unchanged comments.
+    """
     # Get post and account info
     if account_id:
         account = get_account_by_id(account_id)
@@ -24,35 +31,98 @@ def get_post_comments(post_id, account_id=None):
     access_token = account["access_token"]
     fb_post_id = db_post["fb_post_id"]
     
-    url = f"https://graph.facebook.com/v18.0/{fb_post_id}/comments"
+    # filter=stream returns every comment and reply on the post as one
+    # chronological list, so a whole reply tree costs one paged edge
+    # instead of one /comments call per comment
+    url = graph_url(f"{fb_post_id}/comments")
     params = {
         "access_token": access_token,
-        "fields": "id,message,created_time",
-        "limit": 50
+        "fields": "id,message,created_time,from{id,name},parent{id}",
+        "filter": "stream",
+        "limit": 100
     }
+    max_pages = int(get_setting("comment_sync_max_pages", 20))
     
     try:
-        response = requests.get(url, params=params)
-        if response.status_code == 200:
-            comments = response.json().get("data", [])
+        comments = []
+        for _ in range(max_pages):
+            response = graph_request("GET", url, params=params)
+            if response.status_code != 200:
+                return [], f"Error fetching comments: {response.text}"
             
-            # Process and save comments to database
-            for comment in comments:
-                comment_id = comment.get("id")
-                content = comment.get("message", "")
-                created_time = comment.get("created_time")
-                
-                # Parse ISO 8601 timestamp
-                if created_time:
-                    created_time = datetime.fromisoformat(created_time.replace('Z', '+00:00'))
-                
-                save_comment(comment_id, post_id, content, created_time)
+            data = response.json()
+            comments.extend(data.get("data", []))
             
-            return comments, "Comments fetched successfully"
-        else:
-            return [], f"Error fetching comments: {response.text}"
+            # The next link already carries every query parameter
+            url = data.get("paging", {}).get("next")
+            params = None
+            if not url:
+                break
     except Exception as e:
         return [], f"Error connecting to Facebook: {e}"
+    
+    # Process and save comments to database
+    try:
+        save_graph_comments(comments, post_id, stats)
+    except Exception as e:
+        return [], f"Error saving comments: {e}"
+    
+    # The comments are stored by now, so a failed rules pass is reported on its
+    # own, and no auto-replies go to comments that may still need moderating
+    try:
+        moderate_comments(account, comments)
+    except Exception as e:
+        st.warning(f"Comments were saved, but moderating them failed: {e}")
+        return comments, f"Comments fetched, but moderation failed: {e}"
+    queue_auto_replies(account, comments)
+    
+    return comments, "Comments fetched successfully"
+
+def save_graph_comments(comments, post_id, stats=None):
+    """Save Graph comment objects, linking replies to their parent comments
+    
+    The whole batch is written in one transaction.
+    """
+    local_ids = {}
+    pending = []
+    
+    with get_db_connection().transaction():
+        for comment in comments:
+            if comment.get("parent") and comment["parent"]["id"] not in local_ids:
+                # Parent not seen in this batch yet; it may already be stored
+                parent = get_comment_by_fb_id(comment["parent"]["id"])
+                if parent:
+                    local_ids[comment["parent"]["id"]] = parent["id"]
+                else:
+                    pending.append(comment)
+                    continue
+            
+            save_graph_comment(comment, post_id, local_ids, stats)
+        
+        # Replies that arrived before their parent
+        for comment in pending:
+            save_graph_comment(comment, post_id, local_ids, stats)
+    
+    return local_ids
+
+def save_graph_comment(comment, post_id, local_ids, stats=None):
+    """Save a single Graph comment object, recording its local id"""
+    comment_id = comment.get("id")
+    content = comment.get("message", "")
+    created_time = comment.get("created_time")
+    parent_id = local_ids.get(comment["parent"]["id"]) if comment.get("parent") else None
+    author = comment.get("from") or {}
+    
+    # Parse ISO 8601 timestamp
+    if created_time:
+        created_time = datetime.fromisoformat(created_time.replace('Z', '+00:00'))
+    
+    success, result = save_comment(
+        comment_id, post_id, content, created_time, parent_id, stats,
+        author_id=author.get("id"), author_name=author.get("name")
+    )
+    if success:
+        local_ids[comment_id] = result
 
 def create_comment(post_id, content, account_id=None):
     """Create a new comment on a Facebook post"""
@@ -73,21 +143,22 @@ def create_comment(post_id, content, account_id=None):
     access_token = account["access_token"]
     fb_post_id = db_post["fb_post_id"]
     
-    url = f"https://graph.facebook.com/v18.0/{fb_post_id}/comments"
+    url = graph_url(f"{fb_post_id}/comments")
     params = {
         "access_token": access_token,
         "message": content
     }
     
     try:
-        response = requests.post(url, params=params)
+        response = graph_request("POST", url, params=params)
         if response.status_code == 200:
             data = response.json()
             comment_id = data.get("id")
             
             # Save comment to database
             success, db_comment_id = save_comment(
-                comment_id, post_id, content, datetime.now()
+                comment_id, post_id, content, datetime.now(),
+                author_id=account["page_id"], author_name=account["account_name"]
             )
             
             if success:
@@ -117,14 +188,14 @@ def update_comment(comment_id, content):
     
     access_token = account["access_token"]
     
-    url = f"https://graph.facebook.com/v18.0/{comment_id}"
+    url = graph_url(comment_id)
     params = {
         "access_token": access_token,
         "message": content
     }
     
     try:
-        response = requests.post(url, params=params)
+        response = graph_request("POST", url, params=params)
         if response.status_code == 200:
             # Update comment in database
             success, _ = save_comment(comment_id, post_id, content)
@@ -155,13 +226,13 @@ def delete_comment(comment_id):
     
     access_token = account["access_token"]
     
-    url = f"https://graph.facebook.com/v18.0/{comment_id}"
+    url = graph_url(comment_id)
     params = {
         "access_token": access_token
     }
     
     try:
-        response = requests.delete(url, params=params)
+        response = graph_request("DELETE", url, params=params)
         if response.status_code == 200:
             # Delete comment from database
             from database.comment_db import delete_comment as db_delete_comment
@@ -192,22 +263,27 @@ def reply_to_comment(comment_id, content):
     access_token = account["access_token"]
     
     # Reply by creating a comment on the comment
-    url = f"https://graph.facebook.com/v18.0/{comment_id}/comments"
+    url = graph_url(f"{comment_id}/comments")
     params = {
         "access_token": access_token,
         "message": content
     }
     
     try:
-        response = requests.post(url, params=params)
+        response = graph_request("POST", url, params=params)
         if response.status_code == 200:
             data = response.json()
             reply_id = data.get("id")
             
-            # Save reply as a comment (with parent_id)
-            # Note: This would require modifying the comments table to include parent_id
-            # For now, just return success
-            return True, reply_id
+            # Save reply as a comment under its parent
+            success, _ = save_comment(
+                reply_id, post_id, content, datetime.now(), db_comment["id"],
+                author_id=account["page_id"], author_name=account["account_name"]
+            )
+            if success:
+                return True, reply_id
+            else:
+                return True, "Reply created but failed to save locally"
         else:
             return False, f"Error replying to comment: {response.text}"
     except Exception as e:
@@ -0,0 +1,133 @@
+import json
+import os
+import re
+import time
+import requests
+import metrics
+from facebook import http_cache
+from config import get_setting
+from urllib.parse import urlencode, urlsplit
+
+GRAPH_API_VERSION = "v18.0"
+DEFAULT_GRAPH_BASE_URL = "https://graph.facebook.com"
+
+# Most calls the batch endpoint accepts in one request
+BATCH_LIMIT = 50
+
+# Object IDs such as 1234 or 1234_5678 collapse to {id} in endpoint names
+OBJECT_ID_SEGMENT = re.compile(r"^\d+(_\d+)?$")
+VERSION_SEGMENT = re.compile(r"^v\d+\.\d+$")
+
+# Keep-alive connections to the Graph host are reused across calls
+session = requests.Session()
+
+def get_graph_base_url():
+    """Get the Graph API host, overridable for the local simulator"""
+    # The environment variable lets sync jobs and benchmarks point at a
+    # simulator without a secrets.toml
+    base_url = os.environ.get("GRAPH_BASE_URL") or get_setting("graph_base_url", DEFAULT_GRAPH_BASE_URL)
+    return base_url.rstrip("/")
+
+def graph_url(path, versioned=True):
+    """Build a Graph API URL for a path such as "me/accounts" or "{page_id}/feed" """
+    if versioned:
+        return f"{get_graph_base_url()}/{GRAPH_API_VERSION}/{path.lstrip('/')}"
+    return f"{get_graph_base_url()}/{path.lstrip('/')}"
+
+def endpoint_name(method, url):
+    """Collapse a Graph URL to a low-cardinality label like "GET /{id}/feed" """
+    segments = [segment for segment in urlsplit(url).path.split("/") if segment]
+    if segments and VERSION_SEGMENT.match(segments[0]):
+        segments = segments[1:]
+    segments = ["{id}" if OBJECT_ID_SEGMENT.match(segment) else segment for segment in segments]
+    return f"{method} /{'/'.join(segments)}"
+
+def graph_request(method, url, **kwargs):
+    """Send a Graph API request, recording latency and errors per endpoint
+    
+    GETs go through the response cache: entries within their endpoint's TTL
+    are served without a request, and older ones are revalidated with
+    If-None-Match so an unchanged object comes back as a bodiless 304.
+    """
+    name = endpoint_name(method, url)
+    
+    cacheable = method == "GET" and http_cache.is_enabled() and http_cache.is_cacheable(name)
+    if cacheable:
+        key = http_cache.cache_key(url, kwargs.get("params"))
+        ttl = http_cache.get_ttl(name)
+        entry = http_cache.cache.get(key)
+        if entry is not None and entry.is_fresh(ttl):
+            http_cache.cache.record("fresh_hits", len(entry.body))
+            return entry.to_response(url)
+        if entry is not None and entry.etag:
+            kwargs["headers"] = {**(kwargs.get("headers") or {}), "If-None-Match": entry.etag}
+    
+    start = time.perf_counter()
+    try:
+        response = session.request(method, url, **kwargs)
+    except Exception:
+        metrics.observe("graph_request", name, time.perf_counter() - start, error=True)
+        raise
+    metrics.observe("graph_request", name, time.perf_counter() - start, error=response.status_code >= 400)
+    
+    if cacheable:
+        if response.status_code == 304 and entry is not None:
+            http_cache.cache.record("not_modified", len(entry.body))
+            # Restart the TTL; the 304 carries fresh usage headers
+            entry.stored_at = time.time()
+            http_cache.cache.store(key, entry, http_cache.is_persistable(name))
+            return entry.to_response(url, response.headers)
+        
+        http_cache.cache.record("misses")
+        if response.status_code == 200 and (response.headers.get("ETag") or ttl > 0):
+            http_cache.cache.store(key, http_cache.entry_from_response(response), http_cache.is_persistable(name))
+    
+    return response
+
+def graph_batch(calls, access_token):
+    """Send many Graph calls through the batch endpoint, BATCH_LIMIT per request
+    
+    calls is a list of dicts with "method", "relative_url" and an optional
+    "body" dict. Returns one (status code, parsed body) pair per call. Calls
+    in a batch Graph rejected as a whole get that response's status and
+    body; calls whose outcome is unknown, because the request failed in
+    transit or Graph didn't get to them, get (None, error message).
+    """
+    results = []
+    for start in range(0, len(calls), BATCH_LIMIT):
+        chunk = calls[start:start + BATCH_LIMIT]
+        batch = [
+            {
+                "method": call["method"],
+                "relative_url": call["relative_url"],
+                **({"body": urlencode(call["body"])} if call.get("body") else {}),
+            }
+            for call in chunk
+        ]
+        
+        try:
+            response = graph_request(
+                "POST", graph_url(""), data={"access_token": access_token, "batch": json.dumps(batch)}
+            )
+            if response.status_code != 200:
+                try:
+                    body = response.json()
+                except ValueError:
+                    body = response.text
+                results.extend([(response.status_code, body)] * len(chunk))
+                continue
+            
+            for item in response.json():
+                if item is None:
+                    # Graph returns null for calls it didn't get to
+                    results.append((None, "No response"))
+                    continue
+                try:
+                    body = json.loads(item.get("body") or "null")
+                except ValueError:
+                    body = item.get("body")
+                results.append((item.get("code"), body))
+        except Exception as e:
+            results.extend([(None, str(e))] * len(chunk))
+    
+    return results
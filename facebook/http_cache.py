@@ -0,0 +1,210 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import urlencode
+import requests
+from requests.structures import CaseInsensitiveDict
+from config import get_setting
+
+# Defaults for the graph_cache_* settings
+DEFAULT_MAX_ENTRIES = 1000
+DEFAULT_DISK_MAX_ENTRIES = 10000
+
+# Seconds a cached response is served without revalidation, by endpoint
+# name (see graph.endpoint_name). Everything else is revalidated with
+# If-None-Match on every request.
+DEFAULT_TTLS = {
+    "GET /me/accounts": 3600,
+}
+
+# Endpoints whose response bodies carry access tokens. Token exchanges are
+# never cached; page listings are cached in memory but never written to disk
+UNCACHEABLE_ENDPOINTS = frozenset(("GET /oauth/access_token",))
+MEMORY_ONLY_ENDPOINTS = frozenset(("GET /me/accounts",))
+
+# Check the disk tier's size every this many stores
+DISK_PRUNE_INTERVAL = 100
+
+class CacheEntry:
+    """A cached Graph response body and its validator"""
+    
+    def __init__(self, etag, body, content_type, stored_at=None):
+        self.etag = etag
+        self.body = body
+        self.content_type = content_type
+        self.stored_at = stored_at if stored_at is not None else time.time()
+    
+    def is_fresh(self, ttl):
+        return ttl > 0 and time.time() - self.stored_at < ttl
+    
+    def to_response(self, url, headers=None):
+        """Build a 200 response carrying the cached body"""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = url
+        response._content = self.body
+        response.encoding = "utf-8"
+        response.headers = CaseInsensitiveDict(headers or {})
+        response.headers["Content-Type"] = self.content_type
+        response.headers["Content-Length"] = str(len(self.body))
+        if self.etag:
+            response.headers["ETag"] = self.etag
+        return response
+    
+    def to_json(self):
+        return {
+            "etag": self.etag,
+            "body": self.body.decode("utf-8"),
+            "content_type": self.content_type,
+            "stored_at": self.stored_at,
+        }
+    
+    @classmethod
+    def from_json(cls, data):
+        return cls(data["etag"], data["body"].encode("utf-8"), data["content_type"], data["stored_at"])
+
+class ResponseCache:
+    """LRU cache of Graph GET responses, with an optional on-disk tier
+    
+    Keys are hashes of the full URL including the access token, so pages
+    never share entries and no token ends up in a key or file name. Bodies
+    are written to the disk tier as received, so responses that contain
+    tokens are stored with persist=False (see MEMORY_ONLY_ENDPOINTS).
+    """
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+        self.stores = 0
+        self.reset_stats()
+    
+    def reset_stats(self):
+        self.stats = {
+            "lookups": 0,
+            "fresh_hits": 0,
+            "not_modified": 0,
+            "misses": 0,
+            "bytes_saved": 0,
+        }
+    
+    def disk_dir(self):
+        return get_setting("graph_cache_dir")
+    
+    def disk_path(self, key):
+        return os.path.join(self.disk_dir(), f"{key}.json")
+    
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                self.entries.move_to_end(key)
+                return entry
+        
+        if not self.disk_dir():
+            return None
+        try:
+            with open(self.disk_path(key), encoding="utf-8") as file:
+                entry = CacheEntry.from_json(json.load(file))
+        except (OSError, ValueError, KeyError):
+            return None
+        
+        self.remember(key, entry)
+        return entry
+    
+    def remember(self, key, entry):
+        max_entries = int(get_setting("graph_cache_max_entries", DEFAULT_MAX_ENTRIES))
+        with self.lock:
+            self.entries[key] = entry
+            self.entries.move_to_end(key)
+            while len(self.entries) > max_entries:
+                self.entries.popitem(last=False)
+    
+    def store(self, key, entry, persist=True):
+        self.remember(key, entry)
+        
+        directory = self.disk_dir()
+        if not directory or not persist:
+            return
+        try:
+            os.makedirs(directory, exist_ok=True)
+            path = self.disk_path(key)
+            partial = f"{path}.{threading.get_ident()}.tmp"
+            with open(partial, "w", encoding="utf-8") as file:
+                json.dump(entry.to_json(), file)
+            os.replace(partial, path)
+        except OSError:
+            return
+        
+        with self.lock:
+            self.stores += 1
+            prune = self.stores % DISK_PRUNE_INTERVAL == 0
+        if prune:
+            self.prune_disk(directory)
+    
+    def prune_disk(self, directory):
+        """Drop the oldest files once the disk tier grows past its limit"""
+        max_entries = int(get_setting("graph_cache_disk_max_entries", DEFAULT_DISK_MAX_ENTRIES))
+        try:
+            paths = [os.path.join(directory, name) for name in os.listdir(directory) if name.endswith(".json")]
+            if len(paths) <= max_entries:
+                return
+            paths.sort(key=os.path.getmtime)
+            for path in paths[:len(paths) - max_entries]:
+                os.remove(path)
+        except OSError:
+            pass
+    
+    def record(self, outcome, bytes_saved=0):
+        with self.lock:
+            self.stats["lookups"] += 1
+            self.stats[outcome] += 1
+            self.stats["bytes_saved"] += bytes_saved
+    
+    def snapshot(self):
+        with self.lock:
+            stats = dict(self.stats)
+            stats["entries"] = len(self.entries)
+        hits = stats["fresh_hits"] + stats["not_modified"]
+        stats["hit_ratio"] = hits / stats["lookups"] if stats["lookups"] else 0.0
+        return stats
+    
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+        self.reset_stats()
+
+def is_enabled():
+    return bool(get_setting("graph_cache_enabled", True))
+
+def is_cacheable(name):
+    return name not in UNCACHEABLE_ENDPOINTS
+
+def is_persistable(name):
+    """Check if an endpoint's responses may be written to the disk tier"""
+    return name not in MEMORY_ONLY_ENDPOINTS and name not in UNCACHEABLE_ENDPOINTS
+
+def cache_key(url, params=None):
+    """Hash the request URL and its query parameters in a stable order"""
+    if params:
+        url = f"{url}?{urlencode(sorted(params.items()))}"
+    return hashlib.sha256(url.encode("utf-8")).hexdigest()
+
+def get_ttl(name):
+    """Get the no-revalidation TTL in seconds for an endpoint name"""
+    ttls = dict(DEFAULT_TTLS)
+    ttls.update(get_setting("graph_cache_ttls", None) or {})
+    return float(ttls.get(name, 0))
+
+def entry_from_response(response):
+    """Build a cache entry from a 200 response"""
+    return CacheEntry(
+        response.headers.get("ETag"),
+        response.content,
+        response.headers.get("Content-Type", "application/json")
+    )
+
+# Process-wide cache shared by every Graph call
+cache = ResponseCache()
@@ -0,0 +1,151 @@
+"""Incremental Insights sync into the insights time-series tables
+
+Daily page metrics are pulled from the day after the last stored one
+(minus a few days Facebook may still revise), in ranges of at most
+MAX_RANGE_DAYS, then the weekly and monthly rollups covering the new days
+are recomputed. Lifetime metrics of recent posts are fetched through the
+batch API and stored as one value per post per sync day.
+
+Run it for every account, e.g. from cron, with:
+    
+    python -m facebook.insights
+"""
+import argparse
+import sys
+from datetime import datetime, timedelta, timezone
+from urllib.parse import urlencode
+from config import get_setting
+from database.account_db import get_account_by_id, iter_accounts
+from database.post_db import get_recent_post_ids
+from database.insights_db import (
+    PAGE_LEVEL,
+    save_insight_values,
+    get_last_insight_day,
+    refresh_insight_rollups
+)
+from facebook.graph import graph_url, graph_request, graph_batch
+
+PAGE_METRICS = ("page_impressions", "page_impressions_unique", "page_engaged_users")
+POST_METRICS = ("post_impressions", "post_impressions_unique", "post_engaged_users")
+
+METRIC_LABELS = {
+    "page_impressions": "Impressions",
+    "page_impressions_unique": "Reach",
+    "page_engaged_users": "Engaged users",
+    "post_impressions": "Impressions",
+    "post_impressions_unique": "Reach",
+    "post_engaged_users": "Engaged users",
+}
+
+# Graph rejects since/until ranges longer than 93 days
+MAX_RANGE_DAYS = 90
+
+# Recent days are re-fetched because Facebook keeps adjusting them
+SETTLE_DAYS = 3
+
+# Defaults for the insights_* settings
+DEFAULT_BACKFILL_DAYS = 365
+DEFAULT_POST_DAYS = 28
+
+def parse_end_time(end_time):
+    """Get the day a daily value covers from its end_time (the following midnight)"""
+    end = datetime.strptime(end_time, "%Y-%m-%dT%H:%M:%S%z")
+    return (end - timedelta(days=1)).astimezone(timezone.utc).date()
+
+def day_timestamp(day):
+    return int(datetime(day.year, day.month, day.day, tzinfo=timezone.utc).timestamp())
+
+def fetch_page_insights(account, since, until):
+    """Fetch daily page metrics for since <= day < until as (metric, day, value) rows"""
+    rows = []
+    start = since
+    while start < until:
+        end = min(start + timedelta(days=MAX_RANGE_DAYS), until)
+        params = {
+            "access_token": account["access_token"],
+            "metric": ",".join(PAGE_METRICS),
+            "period": "day",
+            "since": day_timestamp(start),
+            "until": day_timestamp(end),
+        }
+        response = graph_request("GET", graph_url(f"{account['page_id']}/insights"), params=params)
+        if response.status_code != 200:
+            raise RuntimeError(f"Error fetching page insights: {response.text}")
+        
+        for series in response.json().get("data", []):
+            for point in series.get("values", []):
+                if "end_time" in point and isinstance(point.get("value"), (int, float)):
+                    rows.append((series["name"], parse_end_time(point["end_time"]), int(point["value"])))
+        start = end
+    
+    return rows
+
+def fetch_post_insights(account, posts):
+    """Fetch lifetime metrics of posts given as (id, fb_post_id) as (post_id, metric, value) rows"""
+    query = urlencode({"metric": ",".join(POST_METRICS)})
+    calls = [{"method": "GET", "relative_url": f"{fb_post_id}/insights?{query}"} for _, fb_post_id in posts]
+    
+    rows = []
+    for (post_id, _), (status, body) in zip(posts, graph_batch(calls, account["access_token"])):
+        if status != 200 or not isinstance(body, dict):
+            continue
+        for series in body.get("data", []):
+            values = series.get("values") or [{}]
+            value = values[-1].get("value")
+            if isinstance(value, (int, float)):
+                rows.append((post_id, series["name"], int(value)))
+    
+    return rows
+
+def sync_insights(account_id):
+    """Pull new page and post Insights for an account
+    
+    Returns (success, message).
+    """
+    account = get_account_by_id(account_id)
+    if not account:
+        return False, "Account not found"
+    
+    today = datetime.now(timezone.utc).date()
+    last_day = get_last_insight_day(account_id)
+    if last_day is None:
+        since = today - timedelta(days=int(get_setting("insights_backfill_days", DEFAULT_BACKFILL_DAYS)))
+    else:
+        since = min(last_day + timedelta(days=1), today) - timedelta(days=SETTLE_DAYS)
+    
+    try:
+        page_rows = fetch_page_insights(account, since, today)
+        
+        post_days = int(get_setting("insights_post_days", DEFAULT_POST_DAYS))
+        posts = get_recent_post_ids(account_id, datetime.now() - timedelta(days=post_days))
+        post_rows = fetch_post_insights(account, posts) if posts else []
+    except Exception as e:
+        return False, f"Error fetching insights: {e}"
+    
+    rows = [(PAGE_LEVEL, metric, day, value) for metric, day, value in page_rows]
+    rows += [(post_id, metric, today, value) for post_id, metric, value in post_rows]
+    if not save_insight_values(account_id, rows):
+        return False, "Failed to save insights"
+    
+    if page_rows and not refresh_insight_rollups(account_id, min(day for _, day, _ in page_rows)):
+        return False, "Failed to update insight rollups"
+    
+    days = len({day for _, day, _ in page_rows})
+    return True, f"Synced {days} days of page insights and {len({row[0] for row in post_rows})} posts"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Sync page and post Insights")
+    parser.add_argument("--account-id", type=int, action="append", help="account to sync (default: all)")
+    args = parser.parse_args(argv)
+    
+    account_ids = args.account_id or [account.id for account in iter_accounts()]
+    
+    failed = False
+    for account_id in account_ids:
+        success, message = sync_insights(account_id)
+        print(f"account {account_id}: {message}", file=sys.stdout if success else sys.stderr)
+        failed = failed or not success
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
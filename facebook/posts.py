@@ -1,25 +1,46 @@
-import requests
+import time
 import streamlit as st
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from database.account_db import get_account_by_id
-from database.post_db import save_post, get_post_by_fb_id
+from database.connection import get_db_connection
+from database.post_db import save_post, save_posts, get_post_by_fb_id
+from facebook.graph import graph_url, graph_request
+from facebook.comments import save_graph_comments
+from facebook.moderation import moderate_comments
+from facebook.auto_reply import queue_auto_replies
+from analytics.best_time import refresh_best_time_bins
+from config import get_setting
 import json
 
-def create_post(account_id, content, link=None, image=None):
-    """Create a new post on Facebook"""
-    account = get_account_by_id(account_id)
-    if not account:
-        return False, "Account not found"
+# Concurrent Graph calls per multi-page publish; requests' connection pool
+# keeps 10 connections per host
+DEFAULT_PUBLISH_WORKERS = 8
+
+def publish_to_page(account, content, link=None, image=None):
+    """Publish a post to one page and report the outcome
     
-    access_token = account["access_token"]
-    page_id = account["page_id"]
+    Only talks to Graph (no database or Streamlit calls), so it is safe to
+    run from worker threads. image is a (file name, bytes) pair.
+    """
+    start = time.perf_counter()
+    outcome = {
+        "account_id": account["id"],
+        "account_name": account["account_name"],
+        "success": False,
+        "post_id": None,
+        "error": None,
+    }
     
+    page_id = account["page_id"]
     if not page_id:
-        return False, "No page ID associated with this account"
+        outcome["error"] = "No page ID associated with this account"
+        outcome["seconds"] = time.perf_counter() - start
+        return outcome
     
-    url = f"https://graph.facebook.com/v18.0/{page_id}/feed"
+    url = graph_url(f"{page_id}/feed")
     params = {
-        "access_token": access_token,
+        "access_token": account["access_token"],
         "message": content
     }
     
@@ -28,40 +49,93 @@ def create_post(account_id, content, link=None, image=None):
     
     files = {}
     if image:
-        # If image is a file buffer from st.file_uploader
         files = {"source": image}
-        url = f"https://graph.facebook.com/v18.0/{page_id}/photos"
+        url = graph_url(f"{page_id}/photos")
     
     try:
         if files:
-            response = requests.post(url, params=params, files=files)
+            response = graph_request("POST", url, params=params, files=files)
         else:
-            response = requests.post(url, params=params)
+            response = graph_request("POST", url, params=params)
         
         if response.status_code == 200:
             data = response.json()
-            post_id = data.get("id")
-            
-            # Get post details to save
-            post_details = get_post_details(post_id, access_token)
-            
-            # Save post to database
-            post_url = f"https://facebook.com/{post_id}"
-            success, db_post_id = save_post(
-                post_id, account_id, content, post_url, datetime.now()
-            )
-            
-            if success:
-                return True, post_id
-            else:
-                return True, "Post created but failed to save locally"
+            # Photo uploads return the photo id plus the id of the feed post
+            outcome["post_id"] = data.get("post_id") or data.get("id")
+            outcome["success"] = True
         else:
-            return False, f"Error creating post: {response.text}"
+            outcome["error"] = f"Error creating post: {response.text}"
     except Exception as e:
-        return False, f"Error connecting to Facebook: {e}"
+        outcome["error"] = f"Error connecting to Facebook: {e}"
+    
+    outcome["seconds"] = time.perf_counter() - start
+    return outcome
 
-def get_user_posts(account_id, limit=10):
-    """Get recent posts for a Facebook account"""
+def create_post(account_id, content, link=None, image=None):
+    """Create a new post on Facebook"""
+    account = get_account_by_id(account_id)
+    if not account:
+        return False, "Account not found"
+    
+    if image:
+        # If image is a file buffer from st.file_uploader
+        image = (image.name, image.getvalue())
+    
+    outcome = publish_to_page(account, content, link, image)
+    if not outcome["success"]:
+        return False, outcome["error"]
+    
+    post_id = outcome["post_id"]
+    
+    # Save post to database
+    post_url = f"https://facebook.com/{post_id}"
+    success, db_post_id = save_post(
+        post_id, account_id, content, post_url, datetime.now()
+    )
+    
+    if success:
+        return True, post_id
+    else:
+        return True, "Post created but failed to save locally"
+
+def publish_to_pages(account_ids, content, link=None, image=None):
+    """Publish one post to several pages concurrently
+    
+    Accounts are loaded and results saved on the calling thread; only the
+    Graph calls run in the pool, so total time is about one publish. Returns
+    one outcome dict per account (see publish_to_page), with "saved" set
+    for the successful ones.
+    """
+    accounts = [get_account_by_id(account_id) for account_id in account_ids]
+    accounts = [account for account in accounts if account]
+    if not accounts:
+        return []
+    
+    if image:
+        # Every thread gets its own copy of the upload
+        image = (image.name, image.getvalue())
+    
+    workers = min(len(accounts), int(get_setting("publish_workers", DEFAULT_PUBLISH_WORKERS)))
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="publish") as pool:
+        outcomes = list(pool.map(lambda account: publish_to_page(account, content, link, image), accounts))
+    
+    # Record every published post in one write
+    posted_at = datetime.now()
+    saved = save_posts([
+        (outcome["post_id"], outcome["account_id"], content, f"https://facebook.com/{outcome['post_id']}", posted_at)
+        for outcome in outcomes if outcome["success"]
+    ])
+    for outcome in outcomes:
+        outcome["saved"] = outcome["post_id"] in saved
+    
+    return outcomes
+
+def get_user_posts(account_id, limit=10, post_stats=None, comment_stats=None):
+    """Get recent posts for a Facebook account
+    
+    post_stats and comment_stats, if given, are Counters of inserted,
+    updated and unchanged rows.
+    """
     account = get_account_by_id(account_id)
     if not account:
         return []
@@ -72,31 +146,64 @@ def get_user_posts(account_id, limit=10):
     if not page_id:
         return []
     
-    url = f"https://graph.facebook.com/v18.0/{page_id}/feed"
+    # Nested field expansion inlines comment/reaction totals and the latest
+    # comments of every post, so one feed page needs no per-post follow-ups
+    preview_limit = int(get_setting("feed_comment_preview_limit", 3))
+    url = graph_url(f"{page_id}/feed")
     params = {
         "access_token": access_token,
-        "fields": "id,message,created_time,permalink_url",
+        "fields": (
+            "id,message,created_time,permalink_url,"
+            f"comments.order(reverse_chronological).limit({preview_limit}).summary(true){{id,message,created_time,from{{id,name}}}},"
+            "reactions.limit(0).summary(true)"
+        ),
         "limit": limit
     }
     
     try:
-        response = requests.get(url, params=params)
+        response = graph_request("GET", url, params=params)
         if response.status_code == 200:
             posts = response.json().get("data", [])
             
-            # Process and save posts to database
-            for post in posts:
-                # Save post to database
-                post_id = post.get("id")
-                content = post.get("message", "")
-                post_url = post.get("permalink_url")
-                created_time = post.get("created_time")
-                
-                # Parse ISO 8601 timestamp
-                if created_time:
-                    created_time = datetime.fromisoformat(created_time.replace('Z', '+00:00'))
-                
-                save_post(post_id, account_id, content, post_url, created_time)
+            # Process and save posts to database, committing the feed page once
+            synced_comments = []
+            with get_db_connection().transaction():
+                for post in posts:
+                    # Save post to database
+                    post_id = post.get("id")
+                    content = post.get("message", "")
+                    post_url = post.get("permalink_url")
+                    created_time = post.get("created_time")
+                    comments = post.get("comments", {})
+                    comment_count = comments.get("summary", {}).get("total_count")
+                    reaction_count = post.get("reactions", {}).get("summary", {}).get("total_count")
+                    
+                    # Parse ISO 8601 timestamp
+                    if created_time:
+                        created_time = datetime.fromisoformat(created_time.replace('Z', '+00:00'))
+                    
+                    success, db_post_id = save_post(
+                        post_id, account_id, content, post_url, created_time,
+                        comment_count=comment_count, reaction_count=reaction_count, stats=post_stats
+                    )
+                    
+                    # Save the inlined comment previews
+                    if success and comments.get("data"):
+                        save_graph_comments(comments["data"], db_post_id, comment_stats)
+                        synced_comments.extend(comments["data"])
+            
+            # One rules pass and one batch of Graph actions for the whole feed page.
+            # The page is stored by now, so a failed pass is reported on its own,
+            # and no auto-replies go to comments that may still need moderating
+            try:
+                moderate_comments(account, synced_comments)
+            except Exception as e:
+                st.warning(f"Posts were saved, but moderating their comments failed: {e}")
+            else:
+                queue_auto_replies(account, synced_comments)
+            
+            # Fold new posts and changed engagement into the best-time bins
+            refresh_best_time_bins(account_id)
             
             return posts
         else:
@@ -108,14 +215,14 @@ def get_user_posts(account_id, limit=10):
 
 def get_post_details(post_id, access_token):
     """Get details of a specific Facebook post"""
-    url = f"https://graph.facebook.com/v18.0/{post_id}"
+    url = graph_url(post_id)
     params = {
         "access_token": access_token,
         "fields": "id,message,created_time,permalink_url"
     }
     
     try:
-        response = requests.get(url, params=params)
+        response = graph_request("GET", url, params=params)
         if response.status_code == 200:
             return response.json()
         else:
@@ -146,14 +253,14 @@ def update_post(post_id, content, account_id=None):
         
         access_token = account["access_token"]
     
-    url = f"https://graph.facebook.com/v18.0/{post_id}"
+    url = graph_url(post_id)
     params = {
         "access_token": access_token,
         "message": content
     }
     
     try:
-        response = requests.post(url, params=params)
+        response = graph_request("POST", url, params=params)
         if response.status_code == 200:
             # Update post in database
             success, _ = save_post(post_id, account["id"], content)
@@ -186,13 +293,13 @@ def delete_post(post_id, account_id=None):
         
         access_token = account["access_token"]
     
-    url = f"https://graph.facebook.com/v18.0/{post_id}"
+    url = graph_url(post_id)
     params = {
         "access_token": access_token
     }
     
     try:
-        response = requests.delete(url, params=params)
+        response = graph_request("DELETE", url, params=params)
         if response.status_code == 200:
             # Delete post from database if exists
             if db_post:
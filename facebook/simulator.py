@@ -0,0 +1,640 @@
+"""Local Graph API stand-in for offline load and integration testing
+
+Run it with:
+    
+    python -m facebook.simulator --port 8765 --pages 3 --posts 200
+
+then point the app at it with graph_base_url = "http://127.0.0.1:8765" in
+.streamlit/secrets.toml (or GRAPH_BASE_URL in the environment). The user
+token printed at startup lists the seeded pages and their page tokens via
+/me/accounts, exactly like the real API.
+
+Only the standard library is used so the simulator can run anywhere.
+"""
+import argparse
+import base64
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qsl, urlencode, urlsplit
+
+WORDS = (
+    "launch sale today new product team thanks everyone weekend event live "
+    "question price delivery order support great love amazing service store "
+    "update summer winter offer free shipping happy customers review photo "
+    "video contest winner announcement hours open closed city local community"
+).split()
+
+NAMES = (
+    "Alex Sam Jordan Taylor Morgan Casey Riley Jamie Avery Quinn Rowan Parker "
+    "Drew Reese Skyler Emerson Finley Hayden Kendall Logan"
+).split()
+
+# Fields returned when a request doesn't ask for any
+DEFAULT_FIELDS = {
+    "page": "id,name",
+    "post": "id,message,created_time",
+    "comment": "id,message,created_time,from",
+}
+
+# Insights metrics the simulator can report
+PAGE_METRICS = ("page_impressions", "page_impressions_unique", "page_engaged_users")
+POST_METRICS = ("post_impressions", "post_impressions_unique", "post_engaged_users")
+
+VERSION_PREFIX = re.compile(r"^/v\d+\.\d+")
+
+class GraphError(Exception):
+    """A Graph API error response"""
+    
+    def __init__(self, status, code, message, error_type="OAuthException", transient=False):
+        super().__init__(message)
+        self.status = status
+        self.code = code
+        self.message = message
+        self.error_type = error_type
+        self.transient = transient
+    
+    def body(self):
+        error = {"message": self.message, "type": self.error_type, "code": self.code}
+        if self.transient:
+            error["is_transient"] = True
+        return {"error": error}
+
+def format_time(value):
+    """Format a datetime the way the Graph API does"""
+    return value.strftime("%Y-%m-%dT%H:%M:%S+0000")
+
+def encode_cursor(index):
+    return base64.urlsafe_b64encode(str(index).encode()).decode()
+
+def decode_cursor(cursor):
+    try:
+        return int(base64.urlsafe_b64decode(cursor.encode()).decode())
+    except Exception:
+        raise GraphError(400, 100, "Invalid cursor", "GraphMethodException")
+
+def parse_fields(spec):
+    """Parse a fields parameter with nested expansion and modifiers
+    
+    "id,comments.limit(5).summary(true){id,message}" becomes
+    [("id", {}, []), ("comments", {"limit": "5", "summary": "true"}, [("id", {}, []), ...])]
+    """
+    pos = 0
+    
+    def parse_list(end_char):
+        nonlocal pos
+        items = []
+        while pos < len(spec) and spec[pos] != end_char:
+            match = re.compile(r"\s*(\w+)").match(spec, pos)
+            if not match:
+                raise GraphError(400, 100, f"Syntax error in fields near '{spec[pos:]}'", "GraphMethodException")
+            name = match.group(1)
+            pos = match.end()
+            modifiers = {}
+            while pos < len(spec) and spec[pos] == ".":
+                match = re.compile(r"\.(\w+)\(([^)]*)\)").match(spec, pos)
+                if not match:
+                    raise GraphError(400, 100, f"Syntax error in fields near '{spec[pos:]}'", "GraphMethodException")
+                modifiers[match.group(1)] = match.group(2)
+                pos = match.end()
+            children = []
+            if pos < len(spec) and spec[pos] == "{":
+                pos += 1
+                children = parse_list("}")
+                pos += 1
+            items.append((name, modifiers, children))
+            if pos < len(spec) and spec[pos] == ",":
+                pos += 1
+        return items
+    
+    return parse_list(None)
+
+class GraphState:
+    """In-memory pages, posts and comments plus per-token call accounting"""
+    
+    def __init__(self, rate_limit=200, rate_window=60.0, latency_ms=0, jitter_ms=0, error_rate=0.0):
+        self.lock = threading.RLock()
+        self.objects = {}
+        self.tokens = {}
+        self.feeds = {}
+        self.comment_edges = {}
+        self.calls = {}
+        self.counter = 0
+        self.rate_limit = rate_limit
+        self.rate_window = rate_window
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.error_rate = error_rate
+        self.user_token = "sim-user-token"
+        self.tokens[self.user_token] = {"type": "USER", "id": "100000000000001"}
+        self.objects["100000000000001"] = {"type": "user", "id": "100000000000001", "name": "Simulator User"}
+    
+    def next_id(self):
+        self.counter += 1
+        return self.counter
+    
+    # Seeding
+    
+    def seed(self, pages=3, posts_per_page=100, comments_per_post=10, reply_rate=0.3, seed=42):
+        """Fill the graph with synthetic pages, posts, comments and replies"""
+        rng = random.Random(seed)
+        now = datetime.now(timezone.utc).replace(microsecond=0)
+        
+        with self.lock:
+            for page_number in range(pages):
+                page = self.add_page(f"Simulated Page {page_number + 1}")
+                
+                for post_number in range(posts_per_page):
+                    posted_at = now - timedelta(hours=(posts_per_page - post_number) * rng.randint(2, 12))
+                    post = self.add_post(page["id"], self.sentence(rng, 8, 30), posted_at)
+                    post["reactions"] = rng.randint(0, 500)
+                    
+                    for _ in range(rng.randint(0, comments_per_post * 2)):
+                        commented_at = posted_at + timedelta(minutes=rng.randint(1, 60 * 48))
+                        comment = self.add_comment(post["id"], self.sentence(rng, 3, 20), commented_at, self.person(rng))
+                        
+                        if rng.random() < reply_rate:
+                            replied_at = commented_at + timedelta(minutes=rng.randint(1, 600))
+                            author = {"id": page["id"], "name": page["name"]} if rng.random() < 0.5 else self.person(rng)
+                            self.add_comment(comment["id"], self.sentence(rng, 3, 15), replied_at, author)
+    
+    def sentence(self, rng, low, high):
+        return " ".join(rng.choice(WORDS) for _ in range(rng.randint(low, high))).capitalize()
+    
+    def person(self, rng):
+        index = rng.randint(0, 999)
+        return {"id": str(200000000000000 + index), "name": f"{NAMES[index % len(NAMES)]} {index}"}
+    
+    def add_page(self, name):
+        page_id = str(100000000000000 + self.next_id() * 1000)
+        token = f"sim-page-token-{page_id}"
+        page = {"type": "page", "id": page_id, "name": name, "category": "Local Business", "access_token": token}
+        self.objects[page_id] = page
+        self.tokens[token] = {"type": "PAGE", "id": page_id}
+        self.feeds[page_id] = []
+        return page
+    
+    def add_post(self, page_id, message, created_time=None):
+        post_id = f"{page_id}_{self.next_id()}"
+        post = {
+            "type": "post",
+            "id": post_id,
+            "page_id": page_id,
+            "message": message,
+            "created_time": created_time or datetime.now(timezone.utc),
+            "reactions": 0,
+        }
+        self.objects[post_id] = post
+        self.comment_edges[post_id] = []
+        # Feeds are kept newest first
+        feed = self.feeds[page_id]
+        feed.append(post_id)
+        feed.sort(key=lambda object_id: self.objects[object_id]["created_time"], reverse=True)
+        return post
+    
+    def add_comment(self, parent_id, message, created_time=None, author=None):
+        parent = self.objects[parent_id]
+        post_id = parent_id if parent["type"] == "post" else parent["post_id"]
+        post = self.objects[post_id]
+        comment_id = f"{post_id.split('_')[1]}_{self.next_id()}"
+        comment = {
+            "type": "comment",
+            "id": comment_id,
+            "post_id": post_id,
+            "parent_id": parent_id if parent["type"] == "comment" else None,
+            "message": message,
+            "created_time": created_time or datetime.now(timezone.utc),
+            "from": author or {"id": post["page_id"], "name": self.objects[post["page_id"]]["name"]},
+            "is_hidden": False,
+        }
+        self.objects[comment_id] = comment
+        self.comment_edges[comment_id] = []
+        # Comment edges are kept oldest first
+        edge = self.comment_edges[parent_id]
+        edge.append(comment_id)
+        edge.sort(key=lambda object_id: self.objects[object_id]["created_time"])
+        return comment
+    
+    def remove(self, object_id):
+        obj = self.objects.pop(object_id)
+        for child_id in list(self.comment_edges.pop(object_id, [])):
+            self.remove(child_id)
+        if obj["type"] == "post":
+            self.feeds[obj["page_id"]].remove(object_id)
+        elif obj["type"] == "comment":
+            parent_id = obj["parent_id"] or obj["post_id"]
+            if parent_id in self.comment_edges:
+                self.comment_edges[parent_id].remove(object_id)
+    
+    # Accounting
+    
+    def authenticate(self, token):
+        identity = self.tokens.get(token)
+        if not identity:
+            raise GraphError(400, 190, "Invalid OAuth access token - Cannot parse access token")
+        return identity
+    
+    def record_call(self, token):
+        """Count a call against the token and raise once it's over the limit"""
+        now = time.monotonic()
+        with self.lock:
+            history = self.calls.setdefault(token, deque())
+            while history and history[0] <= now - self.rate_window:
+                history.popleft()
+            history.append(now)
+            used = len(history)
+        
+        usage = min(100, int(used * 100 / self.rate_limit)) if self.rate_limit else 0
+        if self.rate_limit and used > self.rate_limit:
+            if self.tokens.get(token, {}).get("type") == "PAGE":
+                raise GraphError(403, 32, "Page request limit reached", transient=True)
+            raise GraphError(403, 4, "Application request limit reached", transient=True)
+        return usage
+    
+    def usage_headers(self, token, usage):
+        usage_json = json.dumps({"call_count": usage, "total_cputime": usage // 2, "total_time": usage // 2})
+        headers = {"X-App-Usage": usage_json}
+        identity = self.tokens.get(token)
+        if identity and identity["type"] == "PAGE":
+            headers["X-Page-Usage"] = usage_json
+        return headers
+    
+    def simulate_latency(self):
+        if self.latency_ms or self.jitter_ms:
+            delay = self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)
+            time.sleep(max(0.0, delay) / 1000.0)
+    
+    # Rendering
+    
+    def render(self, obj, fields, params, base_url):
+        spec = fields if fields is not None else parse_fields(DEFAULT_FIELDS[obj["type"]])
+        result = {}
+        for name, modifiers, children in spec:
+            value = self.render_field(obj, name, modifiers, children, params, base_url)
+            if value is not None:
+                result[name] = value
+        return result
+    
+    def render_field(self, obj, name, modifiers, children, params, base_url):
+        if name == "comments" and obj["type"] in ("post", "comment"):
+            edge_params = dict(modifiers)
+            return self.render_edge(obj["id"], "comments", children or None, edge_params, base_url)
+        if name == "reactions" and obj["type"] == "post":
+            return self.render_reactions(obj, modifiers)
+        if name == "created_time" and name in obj:
+            return format_time(obj["created_time"])
+        if name == "permalink_url" and obj["type"] == "post":
+            return f"https://www.facebook.com/{obj['id']}"
+        if name == "parent":
+            return {"id": obj["parent_id"]} if obj.get("parent_id") else None
+        if name == "comment_count" and obj["type"] == "comment":
+            return len(self.comment_edges.get(obj["id"], []))
+        if name == "can_hide" and obj["type"] == "comment":
+            return True
+        if name == "type":
+            return None
+        return obj.get(name)
+    
+    def render_reactions(self, post, modifiers):
+        total = post.get("reactions", 0)
+        limit = int(modifiers.get("limit", 25))
+        data = [{"id": str(300000000000000 + i), "type": "LIKE"} for i in range(min(limit, total))]
+        edge = {"data": data}
+        if modifiers.get("summary") == "true":
+            edge["summary"] = {"total_count": total, "viewer_reaction": "NONE"}
+        return edge
+    
+    def edge_items(self, object_id, edge, params):
+        obj = self.objects[object_id]
+        if edge == "feed" and obj["type"] == "page":
+            return list(self.feeds[object_id])
+        if edge == "comments":
+            if params.get("filter") == "stream" and obj["type"] == "post":
+                # Every comment and reply on the post in chronological order
+                stream = []
+                pending = list(self.comment_edges[object_id])
+                while pending:
+                    comment_id = pending.pop()
+                    stream.append(comment_id)
+                    pending.extend(self.comment_edges.get(comment_id, []))
+                stream.sort(
+                    key=lambda comment_id: self.objects[comment_id]["created_time"],
+                    reverse=params.get("order") == "reverse_chronological"
+                )
+                return stream
+            items = list(self.comment_edges.get(object_id, []))
+            if params.get("order") == "reverse_chronological":
+                items.reverse()
+            return items
+        raise GraphError(400, 100, f"Tried accessing nonexisting field ({edge})", "GraphMethodException")
+    
+    def render_edge(self, object_id, edge, fields, params, base_url, path=None):
+        items = self.edge_items(object_id, edge, params)
+        limit = min(int(params.get("limit", 25)), 100)
+        start = decode_cursor(params["after"]) + 1 if params.get("after") else 0
+        page_ids = items[start:start + limit]
+        
+        result = {"data": [self.render(self.objects[item_id], fields, params, base_url) for item_id in page_ids]}
+        
+        if page_ids:
+            cursors = {"before": encode_cursor(start), "after": encode_cursor(start + len(page_ids) - 1)}
+            result["paging"] = {"cursors": cursors}
+            if start + len(page_ids) < len(items) and path:
+                next_params = {key: value for key, value in params.items() if key != "after"}
+                next_params["after"] = cursors["after"]
+                result["paging"]["next"] = f"{base_url}{path}?{urlencode(next_params)}"
+        
+        if params.get("summary") == "true":
+            result["summary"] = {"total_count": len(items), "order": "chronological", "can_comment": True}
+        
+        return result
+    
+    # Insights
+    
+    def insights(self, obj, params):
+        """Synthetic daily page metrics and lifetime post metrics"""
+        metrics = [name for name in params.get("metric", "").split(",") if name]
+        known = PAGE_METRICS if obj["type"] == "page" else POST_METRICS
+        unknown = [name for name in metrics if name not in known]
+        if not metrics or unknown:
+            raise GraphError(400, 100, "(#100) The value must be a valid insights metric", "GraphMethodException")
+        
+        if obj["type"] == "post":
+            comments = len(self.comment_edges.get(obj["id"], []))
+            reactions = obj.get("reactions", 0)
+            engaged = reactions + comments * 2
+            values = {
+                "post_impressions": engaged * 14 + 50,
+                "post_impressions_unique": engaged * 9 + 30,
+                "post_engaged_users": engaged,
+            }
+            return {"data": [
+                {"name": name, "period": "lifetime", "values": [{"value": values[name]}], "id": f"{obj['id']}/insights/{name}/lifetime"}
+                for name in metrics
+            ]}
+        
+        # Days are reported by their end, midnight Pacific (08:00 UTC)
+        now = datetime.now(timezone.utc)
+        until = datetime.fromtimestamp(int(params.get("until", now.timestamp())), timezone.utc)
+        since = datetime.fromtimestamp(int(params.get("since", (until - timedelta(days=2)).timestamp())), timezone.utc)
+        if until - since > timedelta(days=93):
+            raise GraphError(400, 100, "(#100) There cannot be more than 93 days (8035200 s) between since and until", "GraphMethodException")
+        
+        days = []
+        day = since.date()
+        while day < min(until, now).date():
+            days.append(day)
+            day += timedelta(days=1)
+        
+        data = []
+        for name in metrics:
+            values = []
+            for day in days:
+                rng = random.Random(f"{obj['id']}:{day.isoformat()}")
+                weekly = 1.3 if day.weekday() >= 5 else 1.0
+                impressions = int(rng.randint(800, 2400) * weekly)
+                value = {
+                    "page_impressions": impressions,
+                    "page_impressions_unique": int(impressions * rng.uniform(0.5, 0.7)),
+                    "page_engaged_users": int(impressions * rng.uniform(0.04, 0.1)),
+                }[name]
+                end_time = datetime(day.year, day.month, day.day, 8, tzinfo=timezone.utc) + timedelta(days=1)
+                values.append({"value": value, "end_time": end_time.strftime("%Y-%m-%dT%H:%M:%S+0000")})
+            data.append({"name": name, "period": "day", "values": values, "id": f"{obj['id']}/insights/{name}/day"})
+        return {"data": data}
+    
+    # Request handling
+    
+    def handle(self, method, path, params, base_url):
+        """Dispatch one Graph request and return (status, body, headers)"""
+        token = params.get("access_token", "")
+        usage = 0
+        try:
+            if self.error_rate and random.random() < self.error_rate:
+                raise GraphError(500, 2, "An unexpected error has occurred. Please retry your request later.", transient=True)
+            
+            path = VERSION_PREFIX.sub("", path) or "/"
+            
+            if path == "/debug_token":
+                usage = self.record_call(token)
+                return 200, self.debug_token(params.get("input_token", "")), self.usage_headers(token, usage)
+            
+            if path == "/oauth/access_token":
+                exchanged = params.get("fb_exchange_token", "")
+                self.authenticate(exchanged)
+                return 200, {"access_token": exchanged, "token_type": "bearer", "expires_in": 60 * 24 * 60 * 60}, {}
+            
+            identity = self.authenticate(token)
+            usage = self.record_call(token)
+            headers = self.usage_headers(token, usage)
+            
+            if path == "/" and method == "POST" and "batch" in params:
+                return 200, self.batch(params, base_url), headers
+            
+            with self.lock:
+                body = self.route(method, path, params, identity, base_url)
+            return 200, body, headers
+        except GraphError as e:
+            headers = self.usage_headers(token, usage) if token in self.tokens else {}
+            return e.status, e.body(), headers
+    
+    def route(self, method, path, params, identity, base_url):
+        parts = [part for part in path.split("/") if part]
+        fields = parse_fields(params["fields"]) if params.get("fields") else None
+        
+        if parts == ["me", "accounts"] and method == "GET":
+            if identity["type"] != "USER":
+                raise GraphError(400, 100, "(#100) Tried accessing nonexisting field (accounts)", "GraphMethodException")
+            pages = [obj for obj in self.objects.values() if obj["type"] == "page"]
+            page_fields = fields or parse_fields("id,name,access_token,category")
+            return {"data": [self.render(page, page_fields, params, base_url) for page in pages]}
+        
+        if parts and parts[0] == "me" and identity["type"] == "PAGE":
+            parts[0] = identity["id"]
+        
+        if not parts or parts[0] not in self.objects:
+            raise GraphError(400, 100, f"Unsupported {method.lower()} request. Object with ID '{parts[0] if parts else ''}' does not exist", "GraphMethodException")
+        
+        obj = self.objects[parts[0]]
+        
+        if len(parts) == 1:
+            if method == "GET":
+                return self.render(obj, fields, params, base_url)
+            if method == "POST":
+                if "message" in params:
+                    obj["message"] = params["message"]
+                    obj["updated_time"] = format_time(datetime.now(timezone.utc))
+                if "is_hidden" in params and obj["type"] == "comment":
+                    obj["is_hidden"] = params["is_hidden"] == "true"
+                return {"success": True}
+            if method == "DELETE":
+                self.remove(obj["id"])
+                return {"success": True}
+        
+        if len(parts) == 2:
+            edge = parts[1]
+            if method == "GET" and edge == "insights" and obj["type"] in ("page", "post"):
+                return self.insights(obj, params)
+            if method == "GET":
+                return self.render_edge(obj["id"], edge, fields, params, base_url, path=path)
+            if method == "POST" and edge in ("feed", "photos") and obj["type"] == "page":
+                post = self.add_post(obj["id"], params.get("message", ""))
+                if edge == "photos":
+                    return {"id": post["id"].split("_")[1], "post_id": post["id"]}
+                return {"id": post["id"]}
+            if method == "POST" and edge == "comments" and obj["type"] in ("post", "comment"):
+                author = None
+                if identity["type"] == "PAGE":
+                    author = {"id": identity["id"], "name": self.objects[identity["id"]]["name"]}
+                comment = self.add_comment(obj["id"], params.get("message", ""), author=author)
+                return {"id": comment["id"]}
+        
+        raise GraphError(400, 100, f"Unsupported {method.lower()} request", "GraphMethodException")
+    
+    def debug_token(self, input_token):
+        identity = self.tokens.get(input_token)
+        if not identity:
+            return {"data": {"is_valid": False, "error": {"code": 190, "message": "Invalid OAuth access token."}}}
+        expires_at = int(time.time()) + 60 * 24 * 60 * 60
+        data = {
+            "app_id": "sim-app",
+            "type": identity["type"],
+            "application": "Graph Simulator",
+            "is_valid": True,
+            "expires_at": expires_at,
+            "data_access_expires_at": expires_at,
+            "scopes": ["pages_show_list", "pages_read_engagement", "pages_manage_posts", "pages_read_user_content"],
+            "user_id": "100000000000001",
+        }
+        if identity["type"] == "PAGE":
+            data["profile_id"] = identity["id"]
+        return {"data": data}
+    
+    def batch(self, params, base_url):
+        """Run a batch request; each item counts against the rate limit"""
+        try:
+            items = json.loads(params["batch"])
+        except ValueError:
+            raise GraphError(400, 100, "The parameter batch must be a JSON array", "GraphMethodException")
+        if len(items) > 50:
+            raise GraphError(400, 100, "Too many requests in batch message. Maximum batch size is 50", "GraphBatchException")
+        
+        responses = []
+        for item in items:
+            split = urlsplit("/" + item.get("relative_url", "").lstrip("/"))
+            item_params = dict(parse_qsl(split.query))
+            item_params.update(dict(parse_qsl(item.get("body", ""))))
+            item_params.setdefault("access_token", params.get("access_token", ""))
+            status, body, headers = self.handle(item.get("method", "GET").upper(), split.path, item_params, base_url)
+            responses.append({
+                "code": status,
+                "headers": [{"name": "Content-Type", "value": "application/json"}]
+                + [{"name": name, "value": value} for name, value in headers.items()],
+                "body": json.dumps(body),
+            })
+        return responses
+
+class GraphRequestHandler(BaseHTTPRequestHandler):
+    """HTTP front end that forwards requests to the shared GraphState"""
+    
+    state = None
+    quiet = False
+    
+    def read_params(self):
+        split = urlsplit(self.path)
+        params = dict(parse_qsl(split.query))
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            body = self.rfile.read(length)
+            if self.headers.get("Content-Type", "").startswith("application/x-www-form-urlencoded"):
+                params.update(dict(parse_qsl(body.decode())))
+        return split.path, params
+    
+    def dispatch(self, method):
+        path, params = self.read_params()
+        self.state.simulate_latency()
+        base_url = f"http://{self.headers.get('Host', 'localhost')}"
+        status, body, headers = self.state.handle(method, path, params, base_url)
+        
+        payload = json.dumps(body).encode()
+        
+        # Like the real API, successful reads carry an ETag and a matching
+        # If-None-Match gets a bodiless 304
+        if method == "GET" and status == 200:
+            etag = f'"{hashlib.sha1(payload).hexdigest()}"'
+            headers = {**headers, "ETag": etag}
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.end_headers()
+                return
+        
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=UTF-8")
+        self.send_header("Content-Length", str(len(payload)))
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def do_GET(self):
+        self.dispatch("GET")
+    
+    def do_POST(self):
+        self.dispatch("POST")
+    
+    def do_DELETE(self):
+        self.dispatch("DELETE")
+    
+    def log_message(self, format, *args):
+        if not self.quiet:
+            super().log_message(format, *args)
+
+def run_server(state, host="127.0.0.1", port=8765, quiet=False):
+    """Create a threaded HTTP server for a GraphState (call serve_forever on it)"""
+    handler = type("BoundGraphRequestHandler", (GraphRequestHandler,), {"state": state, "quiet": quiet})
+    return ThreadingHTTPServer((host, port), handler)
+
+def main():
+    parser = argparse.ArgumentParser(description="Local Graph API simulator")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--pages", type=int, default=3, help="number of pages to seed")
+    parser.add_argument("--posts", type=int, default=100, help="posts per page")
+    parser.add_argument("--comments", type=int, default=10, help="average comments per post")
+    parser.add_argument("--reply-rate", type=float, default=0.3, help="share of comments that get a reply")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--latency-ms", type=float, default=0, help="added latency per request")
+    parser.add_argument("--jitter-ms", type=float, default=0, help="random +/- latency jitter")
+    parser.add_argument("--rate-limit", type=int, default=200, help="calls per token per window (0 disables)")
+    parser.add_argument("--rate-window", type=float, default=60.0, help="throttling window in seconds")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="share of calls failing with a transient error")
+    parser.add_argument("--quiet", action="store_true", help="don't log every request")
+    args = parser.parse_args()
+    
+    state = GraphState(args.rate_limit, args.rate_window, args.latency_ms, args.jitter_ms, args.error_rate)
+    state.seed(args.pages, args.posts, args.comments, args.reply_rate, args.seed)
+    
+    server = run_server(state, args.host, args.port, args.quiet)
+    print(f"Graph simulator listening on http://{args.host}:{args.port}")
+    print(f"User access token: {state.user_token}")
+    for obj in state.objects.values():
+        if obj["type"] == "page":
+            print(f"  page {obj['id']} ({obj['name']}): {obj['access_token']}")
+    
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+if __name__ == "__main__":
+    main()
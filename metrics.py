@@ -0,0 +1,189 @@
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Latency buckets in seconds, shared by every histogram
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# name -> (help text, label name)
+HISTOGRAMS = {
+    "db_query": ("Database query latency by calling function", "query"),
+    "graph_request": ("Graph API request latency by method and endpoint", "endpoint"),
+    "page_render": ("Streamlit rerun duration by page", "page"),
+}
+
+METRIC_PREFIX = "fbm"
+
+class Histogram:
+    """Cumulative latency histogram with an error counter"""
+    
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+    
+    def observe(self, seconds, error=False):
+        self.count += 1
+        self.total += seconds
+        if error:
+            self.errors += 1
+        for index, bound in enumerate(self.buckets):
+            if seconds <= bound:
+                self.counts[index] += 1
+                break
+    
+    def cumulative_counts(self):
+        running = 0
+        for count in self.counts:
+            running += count
+            yield running
+    
+    def quantile(self, q):
+        """Estimate a quantile by linear interpolation inside its bucket"""
+        if not self.count:
+            return None
+        target = q * self.count
+        lower = 0.0
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            if count and seen + count >= target:
+                return lower + (bound - lower) * (target - seen) / count
+            seen += count
+            lower = bound
+        # Beyond the largest bucket
+        return self.buckets[-1]
+
+class MetricsRegistry:
+    """Thread-safe store of histograms keyed by metric name and label value"""
+    
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.series = {}
+    
+    def observe(self, metric, label, seconds, error=False):
+        with self.lock:
+            histogram = self.series.get((metric, label))
+            if histogram is None:
+                histogram = self.series[(metric, label)] = Histogram()
+            histogram.observe(seconds, error)
+    
+    @contextmanager
+    def timer(self, metric, label):
+        """Time a block, counting it as an error if it raises
+        
+        Streamlit's st.rerun()/st.stop() unwind with BaseException subclasses;
+        those still count as completed reruns rather than errors.
+        """
+        start = time.perf_counter()
+        error = False
+        try:
+            yield
+        except Exception:
+            error = True
+            raise
+        finally:
+            self.observe(metric, label, time.perf_counter() - start, error)
+    
+    def snapshot(self):
+        """Summarize every series as a list of dicts (for the admin panel)"""
+        with self.lock:
+            rows = []
+            for (metric, label), histogram in sorted(self.series.items()):
+                rows.append({
+                    "metric": metric,
+                    "name": label,
+                    "count": histogram.count,
+                    "errors": histogram.errors,
+                    "error_rate": histogram.errors / histogram.count if histogram.count else 0.0,
+                    "avg_ms": histogram.total / histogram.count * 1000 if histogram.count else 0.0,
+                    "p50_ms": (histogram.quantile(0.5) or 0.0) * 1000,
+                    "p95_ms": (histogram.quantile(0.95) or 0.0) * 1000,
+                    "total_s": histogram.total,
+                })
+            return rows
+    
+    def render_prometheus(self):
+        """Render all series in the Prometheus text exposition format"""
+        lines = []
+        with self.lock:
+            for metric, (help_text, label_name) in HISTOGRAMS.items():
+                series = sorted((label, h) for (name, label), h in self.series.items() if name == metric)
+                if not series:
+                    continue
+                
+                name = f"{METRIC_PREFIX}_{metric}_duration_seconds"
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} histogram")
+                for label, histogram in series:
+                    label_value = escape_label(label)
+                    for bound, count in zip(histogram.buckets, histogram.cumulative_counts()):
+                        lines.append(f'{name}_bucket{{{label_name}="{label_value}",le="{bound}"}} {count}')
+                    lines.append(f'{name}_bucket{{{label_name}="{label_value}",le="+Inf"}} {histogram.count}')
+                    lines.append(f'{name}_sum{{{label_name}="{label_value}"}} {histogram.total}')
+                    lines.append(f'{name}_count{{{label_name}="{label_value}"}} {histogram.count}')
+                
+                errors_name = f"{METRIC_PREFIX}_{metric}_errors_total"
+                lines.append(f"# HELP {errors_name} Failed calls by {label_name}")
+                lines.append(f"# TYPE {errors_name} counter")
+                for label, histogram in series:
+                    lines.append(f'{errors_name}{{{label_name}="{escape_label(label)}"}} {histogram.errors}')
+        
+        return "\n".join(lines) + "\n"
+    
+    def reset(self):
+        with self.lock:
+            self.series.clear()
+
+def escape_label(value):
+    """Escape a label value for the Prometheus text format"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+# Process-wide registry shared by the DB layer, the Graph client and app.py
+registry = MetricsRegistry()
+
+def observe(metric, label, seconds, error=False):
+    registry.observe(metric, label, seconds, error)
+
+def timer(metric, label):
+    return registry.timer(metric, label)
+
+class MetricsRequestHandler(BaseHTTPRequestHandler):
+    """Serve the registry at /metrics"""
+    
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        
+        payload = registry.render_prometheus().encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+    
+    def log_message(self, format, *args):
+        pass
+
+_server = None
+_server_lock = threading.Lock()
+
+def start_metrics_server(host="127.0.0.1", port=9464):
+    """Start the /metrics endpoint once per process
+    
+    Returns the bound address, or None if the port is unavailable (for example
+    when several app processes share a host and another one already owns it).
+    """
+    global _server
+    with _server_lock:
+        if _server is None:
+            try:
+                _server = ThreadingHTTPServer((host, port), MetricsRequestHandler)
+            except OSError:
+                return None
+            thread = threading.Thread(target=_server.serve_forever, name="metrics-server", daemon=True)
+            thread.start()
+        return _server.server_address
@@ -1,11 +1,36 @@
-# Import all page modules
-from pages import login, dashboard, accounts, posts, profile
+# Page modules are imported on first use, so a rerun only loads the
+# active page and its dependencies
+import importlib
+import sys
+import time
+import metrics
 
-# Define available pages
+# Page name -> module in this package
 PAGES = {
-    "Login": login,
-    "Dashboard": dashboard,
-    "Accounts": accounts,
-    "Posts": posts,
-    "Profile": profile
+    "Login": "login",
+    "Dashboard": "dashboard",
+    "Accounts": "accounts",
+    "Posts": "posts",
+    "Moderation": "moderation",
+    "Profile": "profile",
+    "Admin": "admin"
 }
+
+__all__ = list(PAGES.values())
+
+def load_page(name):
+    """Import a page's module, timing the first (cold) import"""
+    module_name = f"{__name__}.{PAGES[name]}"
+    module = sys.modules.get(module_name)
+    if module is not None:
+        return module
+    
+    start = time.perf_counter()
+    module = importlib.import_module(module_name)
+    metrics.observe("page_import", name, time.perf_counter() - start)
+    return module
+
+def __getattr__(name):
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -7,6 +7,7 @@ from database.account_db import (
     update_facebook_account,
     delete_facebook_account
 )
+from database.post_db import count_posts_by_accounts
 from facebook.auth import get_facebook_pages, get_long_lived_token
 from utils.ui import display_message, glossy_header, danger_button, success_button
 
@@ -35,6 +36,9 @@ def view_accounts(accounts, user_id):
         # Create a styled table for accounts
         st.markdown('<div class="card-container">', unsafe_allow_html=True)
         
+        # Post counts for every account in one query
+        post_counts = count_posts_by_accounts([account["id"] for account in accounts])
+        
         # Convert to pandas DataFrame for better display
         account_data = []
         for account in accounts:
@@ -50,6 +54,7 @@ def view_accounts(accounts, user_id):
                 "ID": account["id"],
                 "Account Name": account["account_name"],
                 "Page ID": account["page_id"] or "-",
+                "Posts": post_counts.get(account["id"], 0),
                 "Token Expires": expires_at,
                 "Status": f"<span style='color:{status_color}; font-weight:bold;'>{status_text}</span>"
             })
@@ -0,0 +1,176 @@
+import streamlit as st
+import pandas as pd
+import metrics
+from config import get_setting
+from database import cache, partitions
+from facebook import http_cache
+from database.connection import get_db_connection
+from utils.session import is_admin
+from utils.ui import glossy_header
+
+METRIC_LABELS = {
+    "db_query": "Database queries",
+    "db_replica": "Replica reads",
+    "graph_request": "Graph API calls",
+    "page_render": "Page reruns",
+    "page_import": "Page imports (first load)",
+}
+
+def show():
+    """Display the admin panel with hot-path metrics"""
+    st.title("Admin")
+    
+    if not is_admin(st.session_state.username):
+        st.error("You don't have access to the admin panel")
+        return
+    
+    show_metrics()
+    show_graph_cache()
+    show_entity_cache()
+    
+    db = get_db_connection()
+    if getattr(db, "statements", None) is not None:
+        show_prepared_statements(db)
+    if db.replicas:
+        show_replicas(db)
+    if db.name == "postgres" and get_setting("comments_partitioned", False):
+        show_partitions(db)
+
+def show_metrics():
+    """Display latency, volume and error rates per metric"""
+    glossy_header("Performance Metrics", "Latency, volume and error rates since this process started")
+    
+    address = st.session_state.get("metrics_address")
+    if address:
+        st.caption(f"Prometheus endpoint: http://{address[0]}:{address[1]}/metrics")
+    
+    rows = metrics.registry.snapshot()
+    if not rows:
+        st.info("No metrics recorded yet.")
+        return
+    
+    df = pd.DataFrame(rows)
+    
+    for metric, label in METRIC_LABELS.items():
+        section = df[df["metric"] == metric].drop(columns=["metric"])
+        if section.empty:
+            continue
+        
+        st.markdown(f"### {label}")
+        section = section.sort_values("total_s", ascending=False)
+        st.dataframe(
+            section.style.format({
+                "error_rate": "{:.1%}",
+                "avg_ms": "{:.1f}",
+                "p50_ms": "{:.1f}",
+                "p95_ms": "{:.1f}",
+                "total_s": "{:.2f}",
+            }),
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    col1, col2 = st.columns([1, 3])
+    with col1:
+        if st.button("Reset Metrics", use_container_width=True):
+            metrics.registry.reset()
+            st.rerun()
+    
+    with col2:
+        if st.button("Recount Post/Comment Counters"):
+            if get_db_connection().recount_denormalized_counts():
+                st.success("Denormalized counters rebuilt")
+    
+    with st.expander("Prometheus text format"):
+        st.code(metrics.registry.render_prometheus(), language="text")
+
+def show_graph_cache():
+    """Display hit ratio and savings of the Graph response cache"""
+    glossy_header("Graph Response Cache", "Conditional GETs and TTL hits since this process started")
+    
+    stats = http_cache.cache.snapshot()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Hit ratio", f"{stats['hit_ratio']:.1%}")
+    col2.metric("Served fresh", stats["fresh_hits"])
+    col3.metric("304 Not Modified", stats["not_modified"])
+    col4.metric("Saved", f"{stats['bytes_saved'] / 1024:.1f} KB")
+    st.caption(f"{stats['lookups']} cacheable requests, {stats['misses']} misses, {stats['entries']} entries in memory")
+    
+    if st.button("Clear Graph Cache"):
+        http_cache.cache.clear()
+        st.rerun()
+
+def show_entity_cache():
+    """Display hit ratio and invalidations of the account/post row cache"""
+    glossy_header("Row Cache", "Cached account and post rows, evicted across replicas via NOTIFY")
+    
+    stats = cache.cache.snapshot()
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Hit ratio", f"{stats['hit_ratio']:.1%}")
+    col2.metric("Entries", stats["entries"])
+    col3.metric("Local invalidations", stats["local_invalidations"])
+    col4.metric("Remote invalidations", stats["remote_invalidations"])
+    
+    if not get_db_connection().supports_notify:
+        listener = "not available on this backend; entries expire after the TTL"
+    elif cache.listener.connected:
+        listener = "listening"
+    else:
+        listener = "reconnecting"
+    st.caption(f"{stats['hits']} hits, {stats['misses']} misses, {stats['flushes']} full flushes. Invalidation listener: {listener}")
+    
+    if st.button("Clear Row Cache"):
+        cache.cache.clear()
+        st.rerun()
+
+def show_prepared_statements(db):
+    """Display how many hot queries run as server-side prepared statements"""
+    glossy_header("Prepared Statements", "Hot queries prepared on the shared PostgreSQL connection")
+    
+    stats = db.statements.snapshot()
+    col1, col2, col3 = st.columns(3)
+    col1.metric("Prepared", stats["statements"])
+    col2.metric("Executions", stats["executions"])
+    col3.metric("Run as plain SQL", stats["rejected"])
+    st.caption(f"{stats['prepared']} prepared since start, {stats['fallbacks']} re-run after a statement vanished")
+
+def show_replicas(db):
+    """Display health, lag and load of the read replicas"""
+    glossy_header("Read Replicas", "Listing, search and export reads; sessions read from the primary right after writing")
+    
+    st.dataframe(
+        pd.DataFrame(db.replicas.snapshot()).style.format({"lag_s": "{:.1f}", "avg_ms": "{:.1f}"}, na_rep="-"),
+        use_container_width=True,
+        hide_index=True
+    )
+
+def show_partitions(db):
+    """Display comment partitions with maintenance controls"""
+    glossy_header("Comment Partitions", "Monthly partitions, retention and archives")
+    
+    status = partitions.partition_status(db)
+    if status:
+        st.dataframe(pd.DataFrame(status), use_container_width=True, hide_index=True)
+    
+    if st.button("Run Partition Maintenance"):
+        try:
+            created, retired = partitions.maintain(db)
+        except Exception as e:
+            st.error(f"Partition maintenance failed: {e}")
+        else:
+            st.success(f"Created {len(created)} partitions, retired {len(retired)}")
+    
+    archived = [row["partition"] for row in status if row["state"] in ("archived", "detached")]
+    if archived:
+        col1, col2 = st.columns([3, 1])
+        with col1:
+            name = st.selectbox("Restore partition", archived)
+        with col2:
+            st.write("")
+            if st.button("Restore", use_container_width=True):
+                try:
+                    partitions.restore_partition(db, name)
+                except Exception as e:
+                    st.error(f"Restore failed: {e}")
+                else:
+                    st.success(f"{name} reattached")
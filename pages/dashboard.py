@@ -1,11 +1,21 @@
 import streamlit as st
 import pandas as pd
 import time
+import altair as alt
+from datetime import date, timedelta
 from database.account_db import get_user_facebook_accounts
 from database.post_db import count_posts_by_account
-from utils.ui import create_card, create_two_columns, glossy_header, metric_card
+from database.insights_db import get_insight_rollups, get_top_post_insights
+from database.best_time_db import reset_best_time_bins
+from analytics.comments import account_analytics
+from analytics.best_time import best_times, refresh_best_time_bins
+from facebook.insights import METRIC_LABELS, sync_insights
+from utils.ui import create_card, create_two_columns, display_message, glossy_header, metric_card
 from utils.session import get_current_account, set_current_account
 
+# Days of history on the Insights charts
+INSIGHTS_HISTORY_DAYS = 365
+
 def show():
     """Display the dashboard page"""
     st.title("Dashboard")
@@ -49,9 +59,16 @@ def show():
         post_count = count_posts_by_account(account_id)
         metric_card("Total Posts", post_count)
     
+    # A year of weekly rollups feeds both this card and the Insights tab
+    since = date.today() - timedelta(days=INSIGHTS_HISTORY_DAYS)
+    weekly = get_insight_rollups(account_id, "week", since)
+    
     with col2:
-        # Placeholder for engagement metric
-        metric_card("Total Engagement", "Coming Soon")
+        engaged = [rollup["total"] for rollup in weekly if rollup["metric"] == "page_engaged_users"][-4:]
+        if engaged:
+            metric_card("Engaged Users", f"{sum(engaged):,}", "last 4 weeks")
+        else:
+            metric_card("Engaged Users", "—", "Sync Insights to see engagement")
     
     with col3:
         # Display active since date
@@ -77,7 +94,7 @@ def show():
     st.markdown("### Recent Activity")
     
     # Create tabs for different activity views
-    tab1, tab2 = st.tabs(["Post Activity", "Engagement"])
+    tab1, tab2, tab3, tab4 = st.tabs(["Post Activity", "Engagement", "Insights", "Best Time"])
     
     with tab1:
         with st.container():
@@ -102,10 +119,22 @@ def show():
     with tab2:
         with st.container():
             st.markdown('<div class="card-container">', unsafe_allow_html=True)
-            
-            # Placeholder for engagement data
-            st.info("Connect your Facebook account to see engagement analytics here.")
-            
+            show_engagement(account_id)
+            st.markdown('</div>', unsafe_allow_html=True)
+    
+    with tab3:
+        with st.container():
+            st.markdown('<div class="card-container">', unsafe_allow_html=True)
+            show_insights(account_id, weekly, since)
+            st.markdown('</div>', unsafe_allow_html=True)
+    
+    # Precomputed from the best-time bins, so this is instant after the first call
+    best = best_times(account_id)
+    
+    with tab4:
+        with st.container():
+            st.markdown('<div class="card-container">', unsafe_allow_html=True)
+            show_best_time(account_id, best)
             st.markdown('</div>', unsafe_allow_html=True)
     
     # Tips and insights section
@@ -115,8 +144,7 @@ def show():
     col1, col2 = st.columns(2)
     
     with col1:
-        create_card("🕒 Best Time to Post", 
-                   "Posts published between 1-3 PM typically get the highest engagement rates.")
+        create_card("🕒 Best Time to Post", best_time_tip(best))
         
         create_card("📊 Content Strategy", 
                    "Mix up your content with 70% valuable content, 20% shared content, and 10% promotional content.")
@@ -127,3 +155,122 @@ def show():
         
         create_card("💬 Engagement Tip", 
                    "Respond to comments within 60 minutes to increase customer satisfaction by up to 25%.")
+
+def show_engagement(account_id):
+    """Display comment analytics for the selected account"""
+    with st.spinner("Crunching comment analytics..."):
+        analytics = account_analytics(account_id)
+    
+    responses = analytics["responses"]
+    if not responses["audience_comments"] and analytics["volume"].empty:
+        st.info("No comments synced yet. Refresh comments on the Posts page to see engagement analytics here.")
+        return
+    
+    col1, col2, col3, col4 = st.columns(4)
+    with col1:
+        metric_card("Audience Comments", responses["audience_comments"])
+    with col2:
+        metric_card("Response Rate", f"{responses['response_rate']:.0%}")
+    with col3:
+        median = responses["median_response_minutes"]
+        metric_card("Median Response", f"{median:.0f} min" if median is not None else "—")
+    with col4:
+        metric_card("Repeat Commenters", f"{analytics['recurrence']['repeat_rate']:.0%}",
+                    f"of {analytics['recurrence']['commenters']} people")
+    
+    st.markdown("#### Comment Volume")
+    st.line_chart(analytics["volume"])
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        st.markdown("#### Top Keywords")
+        if not analytics["keywords"].empty:
+            st.bar_chart(analytics["keywords"].set_index("keyword"))
+    with col2:
+        st.markdown("#### Most Active Commenters")
+        st.dataframe(
+            analytics["commenters"].head(10)[["name", "comments", "posts", "last_seen"]],
+            use_container_width=True,
+            hide_index=True
+        )
+    
+    st.markdown("#### Engagement by Post")
+    st.dataframe(analytics["posts"].head(20), use_container_width=True, hide_index=True)
+    
+    if st.button("🔄 Recompute Analytics"):
+        account_analytics.clear()
+        st.rerun()
+
+def rollup_chart(rollups):
+    """Average daily value per rollup period, one column per metric"""
+    df = pd.DataFrame(rollups)
+    df["value"] = df["total"] / df["days"]
+    chart = df.pivot(index="period_start", columns="metric", values="value")
+    return chart.rename(columns=METRIC_LABELS)
+
+def show_insights(account_id, weekly, since):
+    """Display page Insights charts from the stored rollups"""
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        period = st.radio("Granularity", ["Weekly", "Monthly"], horizontal=True, key="insights_period")
+    with col2:
+        if st.button("🔄 Sync Insights", use_container_width=True):
+            with st.spinner("Fetching Insights from Facebook..."):
+                success, message = sync_insights(account_id)
+            display_message("success" if success else "error", message)
+            if success:
+                st.rerun()
+    
+    rollups = weekly if period == "Weekly" else get_insight_rollups(account_id, "month", since)
+    if not rollups:
+        st.info("No Insights synced yet. Sync Insights to chart impressions, reach and engaged users.")
+        return
+    
+    st.markdown(f"#### Average per Day, {period}")
+    st.line_chart(rollup_chart(rollups))
+    
+    top_posts = get_top_post_insights(account_id, "post_impressions_unique")
+    if top_posts:
+        st.markdown("#### Top Recent Posts by Reach")
+        df = pd.DataFrame(top_posts)[["content", "posted_at", "value"]]
+        df.columns = ["Post", "Posted", "Reach"]
+        st.dataframe(df, use_container_width=True, hide_index=True)
+
+def format_slot(slot):
+    return f"{slot['weekday']} {slot['hour']:02d}:00"
+
+def best_time_tip(best):
+    """Best-time card text from the account's own posts, or the general rule of thumb"""
+    if not best or not best["slots"]:
+        return "Posts published between 1-3 PM typically get the highest engagement rates."
+    
+    top = best["slots"][0]
+    slots = ", ".join(format_slot(slot) for slot in best["slots"])
+    return f"Your posts do best around {slots}; {format_slot(top)} averages {top['lift']:+.0%} engagement vs. a typical slot."
+
+def show_best_time(account_id, best):
+    """Display the weekday/hour engagement heatmap and recommended slots"""
+    if not best:
+        st.info("No posts with engagement yet. Refresh posts on the Posts page to see when your audience is most active.")
+        return
+    
+    if best["slots"]:
+        cols = st.columns(len(best["slots"]))
+        for col, slot in zip(cols, best["slots"]):
+            with col:
+                metric_card(format_slot(slot), f"{slot['score']:.1f}", f"expected engagement ({slot['lift']:+.0%})")
+    
+    heatmap = best["heatmap"].rename_axis("day").reset_index().melt("day", var_name="hour", value_name="engagement")
+    chart = alt.Chart(heatmap).mark_rect().encode(
+        x=alt.X("hour:O", title="Hour"),
+        y=alt.Y("day:O", sort=list(best["heatmap"].index), title=None),
+        color=alt.Color("engagement:Q", title="Expected engagement", scale=alt.Scale(scheme="blues")),
+        tooltip=["day", "hour", alt.Tooltip("engagement:Q", format=".1f")]
+    )
+    st.altair_chart(chart, use_container_width=True)
+    st.caption(f"Smoothed engagement per post across {best['posts']} posts, by the hour they were published.")
+    
+    if st.button("🔄 Recount Best Times"):
+        reset_best_time_bins(account_id)
+        refresh_best_time_bins(account_id)
+        st.rerun()
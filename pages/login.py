@@ -1,5 +1,6 @@
 import streamlit as st
-from database.user_db import authenticate_user, create_user
+from database.user_db import create_user
+from utils.auth import login_user
 from utils.ui import display_message, success_button
 
 def show():
@@ -36,14 +37,10 @@ def show():
                 
                 if submit_button:
                     if username and password:
-                        success, result = authenticate_user(username, password)
+                        # Sets session state on success
+                        success, result = login_user(username, password)
                         
                         if success:
-                            # Set session state
-                            st.session_state.authenticated = True
-                            st.session_state.user_id = result
-                            st.session_state.username = username
-                            
                             st.success("Login successful! Redirecting...")
                             st.rerun()
                         else:
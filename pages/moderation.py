@@ -0,0 +1,242 @@
+import re
+import streamlit as st
+import pandas as pd
+from database.account_db import get_user_facebook_accounts
+from database.moderation_db import (
+    MATCH_TYPES,
+    ACTIONS,
+    add_moderation_rule,
+    get_moderation_rules,
+    set_moderation_rule_enabled,
+    delete_moderation_rule,
+    get_recent_moderation_actions
+)
+from database.auto_reply_db import (
+    add_auto_reply_rule,
+    get_auto_reply_rules,
+    set_auto_reply_rule_enabled,
+    delete_auto_reply_rule,
+    count_auto_replies_by_status,
+    get_recent_auto_replies
+)
+from utils.session import get_current_account, set_current_account
+from utils.ui import display_message, glossy_header, danger_button
+
+def show():
+    """Display the comment moderation page"""
+    st.title("Moderation")
+    
+    user_id = st.session_state.user_id
+    accounts = get_user_facebook_accounts(user_id)
+    
+    if not accounts:
+        st.info("You haven't added any Facebook accounts yet. Go to the Accounts page to add one.")
+        return
+    
+    current_account_id = get_current_account()
+    if not current_account_id or not any(a["id"] == current_account_id for a in accounts):
+        current_account_id = accounts[0]["id"]
+        set_current_account(current_account_id)
+    
+    selected_account = st.selectbox(
+        "Select Account",
+        [(a["id"], a["account_name"]) for a in accounts],
+        index=[i for i, a in enumerate(accounts) if a["id"] == current_account_id][0],
+        format_func=lambda x: x[1]
+    )
+    
+    if selected_account[0] != current_account_id:
+        current_account_id = selected_account[0]
+        set_current_account(current_account_id)
+    
+    tab1, tab2, tab3 = st.tabs(["Rules", "Recent Actions", "Auto-Replies"])
+    
+    with tab1:
+        view_rules(current_account_id)
+        add_rule(current_account_id)
+    
+    with tab2:
+        recent_actions(current_account_id)
+    
+    with tab3:
+        view_reply_rules(current_account_id)
+        add_reply_rule(current_account_id)
+        recent_replies(current_account_id)
+
+def view_rules(account_id):
+    """List an account's rules with enable and delete controls"""
+    glossy_header("Moderation Rules", "Applied to new comments every time they are synced")
+    
+    rules = get_moderation_rules(account_id)
+    if not rules:
+        st.info("No rules yet. Comments are stored as they are.")
+        return
+    
+    for rule in rules:
+        col1, col2, col3 = st.columns([4, 1, 1])
+        with col1:
+            st.markdown(f"`{rule['pattern']}`  \n{rule['match_type']} → **{rule['action']}**")
+        with col2:
+            enabled = st.checkbox("Enabled", value=rule["enabled"], key=f"rule_enabled_{rule['id']}")
+            if enabled != rule["enabled"]:
+                set_moderation_rule_enabled(rule["id"], account_id, enabled)
+                st.rerun()
+        with col3:
+            if danger_button("Delete", key=f"rule_delete_{rule['id']}"):
+                delete_moderation_rule(rule["id"], account_id)
+                st.rerun()
+
+def add_rule(account_id):
+    """Form for adding a keyword or regex rule"""
+    glossy_header("Add Rule")
+    
+    with st.form("add_moderation_rule", clear_on_submit=True):
+        pattern = st.text_input("Pattern", help="A word or phrase, or a regular expression")
+        col1, col2 = st.columns(2)
+        with col1:
+            match_type = st.selectbox("Match", MATCH_TYPES)
+        with col2:
+            action = st.selectbox("Action", ACTIONS)
+        
+        submitted = st.form_submit_button("Add Rule")
+    
+    if submitted:
+        pattern = pattern.strip()
+        if not pattern:
+            display_message("error", "Pattern is required")
+            return
+        
+        if match_type == "regex":
+            try:
+                re.compile(pattern)
+            except re.error as e:
+                display_message("error", f"Invalid regular expression: {e}")
+                return
+        
+        success, result = add_moderation_rule(account_id, pattern, match_type, action)
+        if success:
+            st.rerun()
+        else:
+            display_message("error", result)
+
+def recent_actions(account_id):
+    """Table of the latest moderation outcomes"""
+    glossy_header("Recent Actions", "Hidden, deleted and flagged comments")
+    
+    actions = get_recent_moderation_actions(account_id)
+    if not actions:
+        st.info("No comments have been moderated yet.")
+        return
+    
+    df = pd.DataFrame(actions).rename(columns={
+        "fb_comment_id": "Comment",
+        "action": "Action",
+        "status": "Status",
+        "error": "Error",
+        "created_at": "When",
+        "pattern": "Rule"
+    })
+    st.dataframe(df, use_container_width=True, hide_index=True)
+
+def describe_reply_rule(rule):
+    """One-line summary of when a reply rule fires"""
+    conditions = []
+    if rule["keywords"]:
+        conditions.append(f"mentions {rule['keywords']}")
+    if rule["first_time_only"]:
+        conditions.append("first comment from this person")
+    if rule["start_hour"] is not None and rule["end_hour"] is not None and rule["start_hour"] != rule["end_hour"]:
+        conditions.append(f"between {rule['start_hour']:02d}:00 and {rule['end_hour']:02d}:00")
+    return ", ".join(conditions) if conditions else "every comment"
+
+def view_reply_rules(account_id):
+    """List an account's auto-reply rules with enable and delete controls"""
+    glossy_header("Auto-Reply Rules", "The first matching rule answers each new comment once")
+    
+    rules = get_auto_reply_rules(account_id)
+    if not rules:
+        st.info("No auto-reply rules yet.")
+        return
+    
+    for rule in rules:
+        col1, col2, col3 = st.columns([4, 1, 1])
+        with col1:
+            st.markdown(f"**{rule['name']}** ({describe_reply_rule(rule)})  \n> {rule['template']}")
+        with col2:
+            enabled = st.checkbox("Enabled", value=rule["enabled"], key=f"reply_rule_enabled_{rule['id']}")
+            if enabled != rule["enabled"]:
+                set_auto_reply_rule_enabled(rule["id"], account_id, enabled)
+                st.rerun()
+        with col3:
+            if danger_button("Delete", key=f"reply_rule_delete_{rule['id']}"):
+                delete_auto_reply_rule(rule["id"], account_id)
+                st.rerun()
+
+def add_reply_rule(account_id):
+    """Form for adding an auto-reply rule"""
+    glossy_header("Add Auto-Reply")
+    
+    with st.form("add_auto_reply_rule", clear_on_submit=True):
+        name = st.text_input("Name")
+        template = st.text_area("Reply", help="{name}, {first_name} and {page} are filled in")
+        keywords = st.text_input("Keywords", help="Comma-separated; leave empty to match any comment")
+        first_time_only = st.checkbox("Only a person's first comment")
+        use_window = st.checkbox("Only during certain hours")
+        col1, col2 = st.columns(2)
+        with col1:
+            start_hour = st.number_input("From hour", min_value=0, max_value=23, value=9)
+        with col2:
+            end_hour = st.number_input("To hour", min_value=0, max_value=23, value=17)
+        
+        submitted = st.form_submit_button("Add Auto-Reply")
+    
+    if submitted:
+        name = name.strip()
+        template = template.strip()
+        if not name or not template:
+            display_message("error", "Name and reply are required")
+            return
+        
+        try:
+            template.format_map({"name": "", "first_name": "", "page": ""})
+        except (KeyError, ValueError, IndexError) as e:
+            display_message("error", f"Invalid placeholder in reply: {e}")
+            return
+        
+        success, result = add_auto_reply_rule(
+            account_id, name, template, keywords.strip(), first_time_only,
+            int(start_hour) if use_window else None, int(end_hour) if use_window else None
+        )
+        if success:
+            st.rerun()
+        else:
+            display_message("error", result)
+
+def recent_replies(account_id):
+    """Queue size and the latest auto-replies"""
+    glossy_header("Recent Auto-Replies")
+    
+    counts = count_auto_replies_by_status(account_id)
+    col1, col2, col3, col4 = st.columns(4)
+    col1.metric("Queued", counts.get("queued", 0) + counts.get("sending", 0))
+    col2.metric("Sent", counts.get("sent", 0))
+    col3.metric("Failed", counts.get("failed", 0))
+    col4.metric(
+        "Unknown", counts.get("unknown", 0),
+        help="Replies that may or may not have been posted; they are never resent"
+    )
+    
+    replies = get_recent_auto_replies(account_id)
+    if not replies:
+        return
+    
+    df = pd.DataFrame(replies).rename(columns={
+        "fb_comment_id": "Comment",
+        "message": "Reply",
+        "status": "Status",
+        "error": "Error",
+        "created_at": "Queued",
+        "sent_at": "Sent",
+        "rule": "Rule"
+    })
+    st.dataframe(df, use_container_width=True, hide_index=True)
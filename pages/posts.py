@@ -1,13 +1,22 @@
+import os
+import time
 import streamlit as st
 import pandas as pd
+from collections import Counter
 from datetime import datetime
 from database.account_db import get_user_facebook_accounts, get_account_by_id
-from database.post_db import get_posts_by_account, get_post_by_id, search_posts
-from facebook.posts import create_post, update_post, delete_post, get_user_posts
-from facebook.comments import get_post_comments, create_comment
+from database.post_db import get_posts_by_account, get_post_by_id, search_posts, get_feed_page
+from facebook.posts import create_post, update_post, delete_post, get_user_posts, publish_to_pages
+from facebook.comments import get_post_comments, create_comment, reply_to_comment
+from database.comment_db import get_latest_comments_for_posts, count_comments_by_posts
+from database.export import EXPORTS, FORMATS, MIME_TYPES, ExportError, export_filename, export_to_file, prune_exports
+from config import get_setting
 from utils.session import get_current_account, set_current_account, get_current_post, set_current_post
 from utils.ui import post_card, display_message, glossy_header, danger_button, success_button
 
+# Posts per page of the unified feed
+FEED_PAGE_SIZE = 20
+
 def show():
     """Display the posts management page"""
     st.title("Posts")
@@ -49,13 +58,23 @@ def show():
         set_current_post(None)
     
     # Create tabs for viewing and creating posts
-    tab1, tab2 = st.tabs(["View Posts", "Create New Post"])
+    tab1, tab2, tab3, tab4 = st.tabs(["View Posts", "Unified Feed", "Create New Post", "Export"])
     
     with tab1:
         view_posts(current_account_id, user_id)
     
     with tab2:
-        create_new_post(current_account_id)
+        unified_feed(accounts, user_id)
+    
+    with tab3:
+        create_new_post(current_account_id, accounts)
+    
+    with tab4:
+        export_data(current_account_id)
+
+def sync_summary(stats):
+    """Describe a sync's inserted/updated/unchanged counts"""
+    return f"{stats['inserted']} new, {stats['updated']} updated, {stats['unchanged']} unchanged"
 
 def view_posts(account_id, user_id):
     """Display posts for the selected account"""
@@ -70,9 +89,10 @@ def view_posts(account_id, user_id):
             account = get_account_by_id(account_id, user_id)
             if account:
                 with st.spinner("Refreshing posts from Facebook..."):
-                    posts = get_user_posts(account_id)
+                    stats = Counter()
+                    posts = get_user_posts(account_id, post_stats=stats)
                     if posts:
-                        st.success(f"Successfully refreshed {len(posts)} posts")
+                        st.success(f"Successfully refreshed {len(posts)} posts ({sync_summary(stats)})")
                     else:
                         st.info("No posts found or couldn't connect to Facebook")
     
@@ -96,6 +116,11 @@ def view_posts(account_id, user_id):
         st.markdown("</div>", unsafe_allow_html=True)
         return
     
+    # Latest comments for every listed post in one query
+    post_ids = [post["id"] for post in posts]
+    previews = get_latest_comments_for_posts(post_ids, per_post=2)
+    stored_counts = count_comments_by_posts(post_ids)
+    
     # Display posts with improved styling
     for post in posts:
         # Post container
@@ -116,6 +141,13 @@ def view_posts(account_id, user_id):
             # Post URL if available
             if post["post_url"]:
                 st.markdown(f"<a href='{post['post_url']}' target='_blank' style='color: #1877F2; text-decoration: none; font-size: 0.9rem;'><i>View on Facebook</i></a>", unsafe_allow_html=True)
+            
+            # Engagement totals from the last feed sync and locally stored comments
+            stored = stored_counts.get(post["id"], 0)
+            st.markdown(f"<div class='post-time'>👍 {post['reaction_count'] or 0} &nbsp; 💬 {post['comment_count'] or stored} &nbsp; ({stored} synced)</div>", unsafe_allow_html=True)
+            
+            for comment in previews.get(post["id"], []):
+                st.markdown(f"<div class='comment-content' style='font-size: 0.9rem; color: #65676B;'>💬 {comment['content']}</div>", unsafe_allow_html=True)
         
         with col2:
             # Action buttons stacked vertically with improved styling
@@ -148,8 +180,54 @@ def view_posts(account_id, user_id):
     if "view_comments_post_id" in st.session_state and st.session_state.view_comments_post_id:
         view_post_comments(st.session_state.view_comments_post_id)
 
-def create_new_post(account_id):
-    """Form to create a new post"""
+def unified_feed(accounts, user_id):
+    """Display posts from all of the user's accounts in one timeline"""
+    glossy_header("Unified Feed", "Latest posts across all your pages")
+    
+    account_names = {a["id"]: a["account_name"] for a in accounts}
+    selected = st.multiselect(
+        "Filter by account",
+        list(account_names),
+        format_func=lambda account_id: account_names[account_id],
+        placeholder="All accounts",
+        key="feed_accounts"
+    )
+    
+    # Cursors of the pages visited so far; reset whenever the filter changes
+    if st.session_state.get("feed_filter") != selected:
+        st.session_state.feed_filter = selected
+        st.session_state.feed_cursors = [None]
+    cursors = st.session_state.feed_cursors
+    
+    posts, next_cursor = get_feed_page(user_id, selected, cursors[-1], limit=FEED_PAGE_SIZE)
+    
+    if not posts:
+        st.info("No posts yet. Refresh an account on the View Posts tab to fetch its posts.")
+        return
+    
+    for post in posts:
+        date_str = post["posted_at"].strftime("%B %d, %Y at %I:%M %p")
+        post_card(
+            post["account_name"],
+            post["content"],
+            date_str,
+            [f"👍 {post['reaction_count'] or 0}", f"💬 {post['comment_count'] or 0}"]
+        )
+    
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        if len(cursors) > 1 and st.button("← Newer", use_container_width=True):
+            cursors.pop()
+            st.rerun()
+    with col2:
+        st.caption(f"Page {len(cursors)}")
+    with col3:
+        if next_cursor and st.button("Older →", use_container_width=True):
+            cursors.append(next_cursor)
+            st.rerun()
+
+def create_new_post(account_id, accounts):
+    """Form to create a new post on one or more pages"""
     glossy_header("Create New Post", "Share updates with your audience")
     
     # Stylish form container
@@ -169,6 +247,14 @@ def create_new_post(account_id):
             uploaded_image = st.file_uploader("Add an image (optional)", 
                                             type=["jpg", "jpeg", "png"])
         
+        account_names = {a["id"]: a["account_name"] for a in accounts}
+        target_ids = st.multiselect(
+            "Publish to",
+            list(account_names),
+            default=[account_id],
+            format_func=lambda target_id: account_names[target_id]
+        )
+        
         # Preview section
         if content or link or uploaded_image:
             st.markdown("### Preview")
@@ -193,9 +279,16 @@ def create_new_post(account_id):
         if submit_button:
             if not content:
                 st.error("Please enter post content")
+            elif not target_ids:
+                st.error("Please select at least one page")
+            elif len(target_ids) > 1:
+                with st.spinner(f"Posting to {len(target_ids)} pages..."):
+                    start = time.perf_counter()
+                    outcomes = publish_to_pages(target_ids, content, link, uploaded_image)
+                    st.session_state.publish_outcomes = (outcomes, time.perf_counter() - start)
             else:
                 with st.spinner("Posting to Facebook..."):
-                    success, result = create_post(account_id, content, link, uploaded_image)
+                    success, result = create_post(target_ids[0], content, link, uploaded_image)
                     
                     if success:
                         st.success("Post created successfully!")
@@ -206,6 +299,9 @@ def create_new_post(account_id):
     
     st.markdown('</div>', unsafe_allow_html=True)
     
+    if st.session_state.get("publish_outcomes"):
+        publish_results(*st.session_state.publish_outcomes)
+    
     # Tips for effective posting
     with st.expander("Tips for more engaging posts"):
         st.markdown("""
@@ -216,6 +312,91 @@ def create_new_post(account_id):
         - **Post at optimal times**: Typically weekdays between 1pm-3pm
         """)
 
+def publish_results(outcomes, elapsed):
+    """Show the per-page outcome of a multi-page publish"""
+    published = sum(1 for outcome in outcomes if outcome["success"])
+    if published == len(outcomes):
+        st.success(f"Published to {published} pages in {elapsed:.1f}s")
+    else:
+        st.warning(f"Published to {published} of {len(outcomes)} pages in {elapsed:.1f}s")
+    
+    st.dataframe(
+        pd.DataFrame([{
+            "Page": outcome["account_name"],
+            "Status": "✅ Published" if outcome["success"] else "❌ Failed",
+            "Saved locally": outcome.get("saved", False),
+            "Post ID": outcome["post_id"],
+            "Time (s)": round(outcome["seconds"], 2),
+            "Error": outcome["error"],
+        } for outcome in outcomes]),
+        use_container_width=True,
+        hide_index=True
+    )
+    
+    if st.button("Dismiss", key="dismiss_publish_outcomes"):
+        st.session_state.publish_outcomes = None
+        st.rerun()
+
+def export_data(account_id):
+    """Export the account's posts or comments to a downloadable file"""
+    glossy_header("Export", "Download posts or comments as CSV, NDJSON or Parquet")
+    
+    col1, col2 = st.columns(2)
+    with col1:
+        kind = st.selectbox("Data", sorted(EXPORTS), format_func=str.capitalize, key="export_kind")
+    with col2:
+        fmt = st.selectbox("Format", FORMATS, format_func=str.upper, key="export_format")
+    
+    if st.button("📦 Prepare Export", use_container_width=True):
+        export_dir = get_setting("export_dir", "exports")
+        # Exports that were never downloaded don't pile up
+        prune_exports(export_dir, float(get_setting("export_max_age_minutes", 60)) * 60)
+        discard_export()
+        
+        # Rows are streamed to disk chunk by chunk rather than built up in memory
+        path = os.path.join(export_dir, export_filename(kind, account_id, fmt))
+        try:
+            with st.spinner("Exporting..."):
+                count = export_to_file(kind, account_id, fmt, path)
+        except ExportError as e:
+            st.error(str(e))
+        except Exception as e:
+            st.error(f"Export failed: {e}")
+        else:
+            st.session_state.export_file = (path, fmt)
+            st.success(f"Exported {count} {kind}")
+    
+    export_file = st.session_state.get("export_file")
+    if not export_file:
+        return
+    if not os.path.exists(export_file[0]):
+        st.session_state.export_file = None
+        return
+    
+    # The file is read only when the button is clicked, then removed
+    path, fmt = export_file
+    st.download_button(
+        f"⬇️ Download {os.path.basename(path)}",
+        data=lambda: take_export_file(path),
+        file_name=os.path.basename(path),
+        mime=MIME_TYPES[fmt],
+        use_container_width=True
+    )
+
+def take_export_file(path):
+    """Read a prepared export for download and delete it from disk"""
+    with open(path, "rb") as file:
+        data = file.read()
+    os.remove(path)
+    return data
+
+def discard_export():
+    """Delete this session's prepared export if it wasn't downloaded"""
+    export_file = st.session_state.get("export_file")
+    if export_file and os.path.exists(export_file[0]):
+        os.remove(export_file[0])
+    st.session_state.export_file = None
+
 def edit_post(post_id):
     """Form to edit an existing post"""
     post = get_post_by_id(post_id)
@@ -338,15 +519,16 @@ def view_post_comments(post_id):
     # Refresh comments button
     if st.button("🔄 Refresh Comments", use_container_width=False):
         with st.spinner("Fetching comments from Facebook..."):
-            comments, message = get_post_comments(post_id)
+            stats = Counter()
+            comments, message = get_post_comments(post_id, stats=stats)
             if comments:
-                st.success(f"Successfully fetched {len(comments)} comments")
+                st.success(f"Successfully fetched {len(comments)} comments ({sync_summary(stats)})")
             else:
                 st.info(message or "No comments found")
     
-    # Get comments from database
-    from database.comment_db import get_comments_by_post
-    comments = get_comments_by_post(post_id)
+    # Get comments with their reply trees from database
+    from database.comment_db import get_comment_thread
+    comments = get_comment_thread(post_id)
     
     # Add new comment form in a card
     st.markdown('<div class="card-container">', unsafe_allow_html=True)
@@ -388,11 +570,13 @@ def view_post_comments(post_id):
             # Format date
             date_str = comment["commented_at"].strftime("%B %d, %Y at %I:%M %p") if comment["commented_at"] else "Unknown date"
             
-            # Comment container with modern styling
-            st.markdown('<div class="comment-container">', unsafe_allow_html=True)
+            # Comment container with modern styling, replies indented under their parent
+            indent = min(comment["depth"], 4) * 32
+            st.markdown(f'<div class="comment-container" style="margin-left: {indent}px;">', unsafe_allow_html=True)
             
             # Comment author and timestamp
-            st.markdown(f"<div class='comment-author'>User Comment</div>", unsafe_allow_html=True)
+            author_label = "Reply" if comment["parent_id"] else "User Comment"
+            st.markdown(f"<div class='comment-author'>{author_label}</div>", unsafe_allow_html=True)
             
             # Comment content
             st.markdown(f"<div class='comment-content'>{comment['content']}</div>", unsafe_allow_html=True)
@@ -401,7 +585,7 @@ def view_post_comments(post_id):
             st.markdown(f"<div class='comment-time'>{date_str}</div>", unsafe_allow_html=True)
             
             # Comment actions
-            col1, col2, col3 = st.columns([1, 1, 3])
+            col1, col2, col3, col4 = st.columns([1, 1, 1, 2])
             
             with col1:
                 if st.button("✏️ Edit", key=f"edit_comment_{comment['id']}", use_container_width=True):
@@ -409,8 +593,17 @@ def view_post_comments(post_id):
                     st.rerun()
             
             with col2:
+                if st.button("↩️ Reply", key=f"reply_comment_{comment['id']}", use_container_width=True):
+                    st.session_state.reply_comment_id = comment["id"]
+                    st.rerun()
+            
+            with col3:
                 danger_button("🗑️ Delete", key=f"delete_comment_{comment['id']}")
             
+            # Inline reply form under the selected comment
+            if st.session_state.get("reply_comment_id") == comment["id"]:
+                reply_form(comment)
+            
             st.markdown('</div>', unsafe_allow_html=True)
     
     # Back button with improved styling
@@ -420,3 +613,34 @@ def view_post_comments(post_id):
             del st.session_state.view_comments_post_id
         st.rerun()
     st.markdown('</div>', unsafe_allow_html=True)
+
+def reply_form(comment):
+    """Form to reply to a comment"""
+    with st.form(f"reply_form_{comment['id']}"):
+        reply_content = st.text_area("Write a reply", height=80, placeholder="Reply to this comment...")
+        
+        col1, col2 = st.columns(2)
+        
+        with col1:
+            submit_button = st.form_submit_button("Post Reply", use_container_width=True)
+        
+        with col2:
+            cancel_button = st.form_submit_button("Cancel", use_container_width=True)
+        
+        if submit_button:
+            if not reply_content:
+                st.error("Please enter reply content")
+            else:
+                with st.spinner("Posting reply to Facebook..."):
+                    success, result = reply_to_comment(comment["fb_comment_id"], reply_content)
+                    
+                    if success:
+                        st.success("Reply posted successfully!")
+                        del st.session_state.reply_comment_id
+                        st.rerun()
+                    else:
+                        st.error(f"Failed to post reply: {result}")
+        
+        if cancel_button:
+            del st.session_state.reply_comment_id
+            st.rerun()
@@ -0,0 +1,74 @@
+"""Shared fixtures: a fresh SQLite database and a local Graph simulator per test
+
+Settings are read through config.get_setting, which reads st.secrets, so
+each test swaps st.secrets for a plain dict it can edit.
+"""
+import threading
+import pytest
+import streamlit as st
+from database import connection
+from database.account_db import add_facebook_account, get_account_by_id
+from database.cache import cache
+from database.user_db import create_user
+from facebook import http_cache
+from facebook.simulator import GraphState, run_server
+
+@pytest.fixture
+def settings(monkeypatch, tmp_path):
+    values = {
+        "db_backend": "sqlite",
+        "db_path": str(tmp_path / "test.db"),
+        "bcrypt_rounds": 4,
+        # Keep tests from writing slow-query logs or starting the reply thread
+        "slow_query_ms": 0,
+        "graph_cache_enabled": False,
+        "auto_reply_enabled": False,
+    }
+    monkeypatch.setattr(st, "secrets", values)
+    return values
+
+@pytest.fixture
+def db(settings, monkeypatch):
+    monkeypatch.setattr(connection, "db", None)
+    cache.clear()
+    http_cache.cache.clear()
+    conn = connection.get_db_connection()
+    yield conn
+    conn.disconnect()
+    cache.clear()
+
+@pytest.fixture
+def user_id(db):
+    success, result = create_user("tester", "secret")
+    assert success, result
+    return result
+
+@pytest.fixture
+def account_id(user_id):
+    """An account with no Graph behind it, for database-only tests"""
+    success, result = add_facebook_account(user_id, "Test Page", "test-token", "page-1")
+    assert success, result
+    return result
+
+@pytest.fixture
+def graph(settings, monkeypatch):
+    """A Graph simulator on a free port that the app is pointed at"""
+    state = GraphState()
+    server = run_server(state, port=0, quiet=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.delenv("GRAPH_BASE_URL", raising=False)
+    settings["graph_base_url"] = f"http://127.0.0.1:{server.server_address[1]}"
+    yield state
+    server.shutdown()
+    server.server_close()
+
+@pytest.fixture
+def page(graph):
+    return graph.add_page("Simulated Page")
+
+@pytest.fixture
+def graph_account(user_id, page):
+    """An account backed by the simulator's page"""
+    success, result = add_facebook_account(user_id, page["name"], page["access_token"], page["id"])
+    assert success, result
+    return get_account_by_id(result)
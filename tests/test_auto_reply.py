@@ -0,0 +1,87 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+import facebook.auto_reply as auto_reply
+from database.account_db import update_facebook_account
+from database.auto_reply_db import (
+    claim_auto_replies,
+    get_queued_auto_replies,
+    requeue_auto_replies,
+    expire_auto_reply_claims,
+    count_auto_replies_by_status
+)
+from facebook.auto_reply import ReplyDispatcher
+
+def queue(account_id, count):
+    claim_auto_replies(account_id, [(f"c{number}", None, "Thanks!") for number in range(count)])
+
+def test_claims_are_disjoint_and_marked_sending(account_id):
+    queue(account_id, 5)
+    # A comment is only ever queued once
+    queue(account_id, 1)
+    
+    first = get_queued_auto_replies(account_id, 2)
+    rest = get_queued_auto_replies(account_id, 10)
+    
+    assert [reply["fb_comment_id"] for reply in first] == ["c0", "c1"]
+    assert [reply["fb_comment_id"] for reply in rest] == ["c2", "c3", "c4"]
+    assert get_queued_auto_replies(account_id, 10) == []
+    assert count_auto_replies_by_status(account_id) == {"sending": 5}
+
+def test_requeued_replies_can_be_claimed_again(account_id):
+    queue(account_id, 2)
+    claimed = get_queued_auto_replies(account_id, 2)
+    
+    requeue_auto_replies([claimed[0]["id"]])
+    
+    assert [reply["id"] for reply in get_queued_auto_replies(account_id, 2)] == [claimed[0]["id"]]
+
+def test_stale_claims_expire_as_unknown_and_are_never_resent(account_id):
+    queue(account_id, 3)
+    get_queued_auto_replies(account_id, 2)
+    
+    assert expire_auto_reply_claims(datetime.now() - timedelta(minutes=1)) == 0
+    assert expire_auto_reply_claims(datetime.now() + timedelta(minutes=1)) == 2
+    
+    assert count_auto_replies_by_status(account_id) == {"unknown": 2, "queued": 1}
+    assert [reply["fb_comment_id"] for reply in get_queued_auto_replies(account_id, 10)] == ["c2"]
+
+@pytest.fixture
+def graph_comments(graph, page):
+    now = datetime.now(timezone.utc)
+    post = graph.add_post(page["id"], "Post", now - timedelta(hours=1))
+    visitor = {"id": "200000000000001", "name": "Visitor"}
+    return [graph.add_comment(post["id"], f"Question {number}", now, visitor) for number in range(3)]
+
+def test_dispatcher_sends_each_reply_once(graph, graph_account, graph_comments):
+    claim_auto_replies(graph_account["id"], [(comment["id"], None, "Thanks!") for comment in graph_comments])
+    dispatcher = ReplyDispatcher()
+    
+    dispatcher.dispatch_account(graph_account["id"])
+    dispatcher.dispatch_account(graph_account["id"])
+    
+    assert count_auto_replies_by_status(graph_account["id"]) == {"sent": 3}
+    for comment in graph_comments:
+        assert len(graph.comment_edges[comment["id"]]) == 1
+
+@pytest.mark.parametrize("outcome, status", [
+    ((None, "Read timed out"), "unknown"),
+    ((400, {"error": {"code": 190, "message": "Session has expired"}}), "failed"),
+    ((200, {"error": {"code": 4, "message": "Application request limit reached"}}), "queued"),
+])
+def test_dispatcher_outcomes(monkeypatch, graph_account, graph_comments, outcome, status):
+    claim_auto_replies(graph_account["id"], [(comment["id"], None, "Thanks!") for comment in graph_comments])
+    monkeypatch.setattr(auto_reply, "graph_batch", lambda calls, access_token: [outcome] * len(calls))
+    
+    ReplyDispatcher().dispatch_account(graph_account["id"])
+    
+    assert count_auto_replies_by_status(graph_account["id"]) == {status: 3}
+
+def test_expired_token_fails_the_batch_instead_of_pausing(graph, user_id, graph_account, graph_comments):
+    claim_auto_replies(graph_account["id"], [(comment["id"], None, "Thanks!") for comment in graph_comments])
+    update_facebook_account(graph_account["id"], user_id, access_token="expired-token")
+    dispatcher = ReplyDispatcher()
+    
+    dispatcher.dispatch_account(graph_account["id"])
+    
+    assert count_auto_replies_by_status(graph_account["id"]) == {"failed": 3}
+    assert not dispatcher.paused_until
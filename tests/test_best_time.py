@@ -0,0 +1,41 @@
+from datetime import datetime
+import analytics.best_time as best_time
+from analytics.best_time import refresh_best_time_bins
+from database.best_time_db import get_best_time_bins, iter_unbinned_posts
+from database.post_db import save_post, delete_post
+
+# A Wednesday
+START = datetime(2024, 5, 1, 9, 0, 0)
+
+def bins(account_id):
+    return {(weekday, hour): (posts, engagement) for weekday, hour, posts, engagement in get_best_time_bins(account_id) if posts}
+
+def test_refresh_folds_new_posts_and_engagement_changes(account_id):
+    save_post("p1", account_id, "One", posted_at=START, comment_count=2, reaction_count=3)
+    save_post("p2", account_id, "Two", posted_at=START, comment_count=1)
+    
+    assert refresh_best_time_bins(account_id) == 2
+    assert refresh_best_time_bins(account_id) == 0
+    
+    save_post("p1", account_id, "One", posted_at=START, comment_count=2, reaction_count=10)
+    assert refresh_best_time_bins(account_id) == 1
+    assert bins(account_id) == {(2, 9): (2, 13)}
+
+def test_a_refresh_with_stale_rows_adds_nothing(monkeypatch, account_id):
+    save_post("p1", account_id, "One", posted_at=START, comment_count=5)
+    stale = [list(rows) for rows in iter_unbinned_posts(account_id)]
+    refresh_best_time_bins(account_id)
+    
+    monkeypatch.setattr(best_time, "iter_unbinned_posts", lambda account_id, itersize=None: iter(stale))
+    
+    assert refresh_best_time_bins(account_id) == 0
+    assert bins(account_id) == {(2, 9): (1, 5)}
+
+def test_deleted_posts_leave_their_slot(account_id):
+    _, first_id = save_post("p1", account_id, "One", posted_at=START, comment_count=5)
+    save_post("p2", account_id, "Two", posted_at=START, comment_count=1)
+    refresh_best_time_bins(account_id)
+    
+    delete_post(first_id)
+    
+    assert bins(account_id) == {(2, 9): (1, 1)}
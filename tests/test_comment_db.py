@@ -0,0 +1,56 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from database.comment_db import save_comment, get_comment_thread, count_comments_by_post
+from database.post_db import save_post
+
+START = datetime(2024, 5, 1, 12, 0, 0)
+
+def at(minutes):
+    return START + timedelta(minutes=minutes)
+
+def test_thread_is_depth_first_with_siblings_oldest_first(account_id):
+    _, post_id = save_post("p1", account_id, "Post", posted_at=START)
+    _, first = save_comment("c1", post_id, "first", at(1))
+    _, second = save_comment("c2", post_id, "second", at(2))
+    # Replies stored out of order, and a reply to a reply
+    _, late_reply = save_comment("r1", post_id, "late reply", at(10), first)
+    _, early_reply = save_comment("r2", post_id, "early reply", at(5), first)
+    save_comment("r3", post_id, "nested", at(6), early_reply)
+    
+    thread = get_comment_thread(post_id)
+    
+    assert [(c["fb_comment_id"], c["depth"]) for c in thread] == [
+        ("c1", 0), ("r2", 1), ("r3", 2), ("r1", 1), ("c2", 0)
+    ]
+
+def test_thread_of_one_comment_is_its_subtree(account_id):
+    _, post_id = save_post("p1", account_id, "Post", posted_at=START)
+    _, first = save_comment("c1", post_id, "first", at(1))
+    save_comment("c2", post_id, "second", at(2))
+    save_comment("r1", post_id, "reply", at(3), first)
+    
+    thread = get_comment_thread(post_id, first)
+    
+    assert [(c["fb_comment_id"], c["depth"]) for c in thread] == [("c1", 0), ("r1", 1)]
+
+def test_equal_timestamps_keep_id_order(account_id):
+    _, post_id = save_post("p1", account_id, "Post", posted_at=START)
+    # Enough siblings that a lexical sort of unpadded ids would misplace them
+    for number in range(12):
+        save_comment(f"c{number}", post_id, "same time", at(1))
+    
+    thread = get_comment_thread(post_id)
+    
+    assert [c["fb_comment_id"] for c in thread] == [f"c{number}" for number in range(12)]
+
+def test_save_comment_counts_and_skips_unchanged_rows(settings, account_id):
+    settings["denormalized_counts"] = True
+    _, post_id = save_post("p1", account_id, "Post", posted_at=START)
+    stats = Counter()
+    
+    save_comment("c1", post_id, "hello", at(1), stats=stats)
+    save_comment("c1", post_id, "hello", at(1), stats=stats)
+    save_comment("c1", post_id, "hello again", at(1), stats=stats)
+    
+    assert stats == Counter(inserted=1, unchanged=1, updated=1)
+    assert count_comments_by_post(post_id) == 1
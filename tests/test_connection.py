@@ -0,0 +1,41 @@
+import pytest
+
+def state_keys(db):
+    return {row[0] for row in db.execute_query("SELECT key FROM app_state", fetch=True) or []}
+
+def test_transaction_commits_on_success(db):
+    with db.transaction():
+        db.execute_query("INSERT INTO app_state (key, value) VALUES (%s, %s)", ("a", "1"))
+        assert db.in_transaction()
+    
+    assert not db.in_transaction()
+    assert "a" in state_keys(db)
+
+def test_transaction_rolls_back_on_error(db):
+    with pytest.raises(RuntimeError):
+        with db.transaction():
+            db.execute_query("INSERT INTO app_state (key, value) VALUES (%s, %s)", ("a", "1"))
+            raise RuntimeError("boom")
+    
+    assert db.tx_depth == 0
+    assert "a" not in state_keys(db)
+
+def test_nested_failure_rolls_back_only_the_inner_block(db):
+    with db.transaction():
+        db.execute_query("INSERT INTO app_state (key, value) VALUES (%s, %s)", ("outer", "1"))
+        with pytest.raises(RuntimeError):
+            with db.transaction():
+                db.execute_query("INSERT INTO app_state (key, value) VALUES (%s, %s)", ("inner", "1"))
+                raise RuntimeError("boom")
+        db.execute_query("INSERT INTO app_state (key, value) VALUES (%s, %s)", ("after", "1"))
+    
+    assert state_keys(db) >= {"outer", "after"}
+    assert "inner" not in state_keys(db)
+
+def test_failed_statement_inside_transaction_raises(db):
+    with pytest.raises(Exception):
+        with db.transaction():
+            db.execute_query("INSERT INTO app_state (key, value) VALUES (%s, %s)", ("a", "1"))
+            db.execute_query("INSERT INTO app_state (key, value) VALUES (%s, %s)", ("a", "2"))
+    
+    assert "a" not in state_keys(db)
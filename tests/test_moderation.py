@@ -0,0 +1,80 @@
+from datetime import datetime, timedelta, timezone
+from database.comment_db import get_comment_by_fb_id
+from database.moderation_db import add_moderation_rule, get_recent_moderation_actions
+from facebook.moderation import ModerationEngine, moderate_comments
+from facebook.posts import get_user_posts
+
+def rule(rule_id, pattern, match_type, action):
+    return {"id": rule_id, "pattern": pattern, "match_type": match_type, "action": action}
+
+def test_overlapping_regex_rules_all_match_and_the_strictest_wins():
+    engine = ModerationEngine([rule(1, "buy", "regex", "flag"), rule(2, "buy now", "regex", "delete")])
+    
+    assert engine.matching_rules("Buy now!") == {1, 2}
+    assert engine.decide("Buy now!")[0] == "delete"
+    assert engine.decide("buy later")[0] == "flag"
+
+def test_keywords_match_whole_words_and_bad_patterns_are_skipped():
+    engine = ModerationEngine([rule(1, "spam", "keyword", "hide"), rule(2, "(", "regex", "delete")])
+    
+    assert engine.decide("this is spam") == ("hide", engine.rules[1])
+    assert engine.decide("spammer") is None
+
+def seed_comments(graph, page, messages, from_page=()):
+    """Add a post with comments, oldest first, and return them by message"""
+    now = datetime.now(timezone.utc)
+    post = graph.add_post(page["id"], "Our new product", now - timedelta(hours=2))
+    visitor = {"id": "200000000000001", "name": "Visitor"}
+    
+    comments = {}
+    for number, message in enumerate(messages):
+        author = {"id": page["id"], "name": page["name"]} if message in from_page else visitor
+        commented_at = now - timedelta(minutes=len(messages) - number)
+        comments[message] = graph.add_comment(post["id"], message, commented_at, author)
+    return comments
+
+def actions_by_comment(account_id):
+    return {
+        (action["fb_comment_id"], action["action"], action["status"])
+        for action in get_recent_moderation_actions(account_id)
+    }
+
+def test_sync_hides_deletes_and_flags_matching_comments(settings, graph, page, graph_account):
+    settings["feed_comment_preview_limit"] = 10
+    own = "Buy now at our store"
+    comments = seed_comments(
+        graph, page, ["Buy now, cheap pills", "This is spam", "Nice post", "Hello there", own], from_page=(own,)
+    )
+    add_moderation_rule(graph_account["id"], r"buy\s+now", "regex", "delete")
+    add_moderation_rule(graph_account["id"], "spam", "keyword", "hide")
+    add_moderation_rule(graph_account["id"], "nice", "keyword", "flag")
+    
+    get_user_posts(graph_account["id"])
+    
+    deleted = comments["Buy now, cheap pills"]["id"]
+    hidden = comments["This is spam"]["id"]
+    flagged = comments["Nice post"]["id"]
+    assert deleted not in graph.objects
+    assert get_comment_by_fb_id(deleted) is None
+    assert graph.objects[hidden]["is_hidden"]
+    assert not graph.objects[flagged]["is_hidden"]
+    # The page's own comments are never moderated
+    assert comments[own]["id"] in graph.objects
+    assert actions_by_comment(graph_account["id"]) == {
+        (deleted, "delete", "done"), (hidden, "hide", "done"), (flagged, "flag", "done")
+    }
+
+def test_flagged_comment_can_still_be_deleted_by_a_later_rule(graph, page, graph_account):
+    comment = seed_comments(graph, page, ["Nice post"])["Nice post"]
+    synced = [{"id": comment["id"], "message": comment["message"], "from": comment["from"]}]
+    add_moderation_rule(graph_account["id"], "nice", "keyword", "flag")
+    
+    assert len(moderate_comments(graph_account, synced)) == 1
+    # Flags aren't repeated
+    assert moderate_comments(graph_account, synced) == []
+    
+    add_moderation_rule(graph_account["id"], "post", "keyword", "delete")
+    logged = moderate_comments(graph_account, synced)
+    
+    assert [(action, status) for _, _, action, status, _ in logged] == [("delete", "done")]
+    assert comment["id"] not in graph.objects
@@ -0,0 +1,74 @@
+from collections import Counter
+from datetime import datetime, timedelta
+from database.post_db import (
+    save_post,
+    save_posts,
+    delete_post,
+    get_feed_page,
+    count_posts_by_account
+)
+
+START = datetime(2024, 5, 1, 12, 0, 0)
+
+def test_save_post_counts_inserted_unchanged_and_updated(account_id):
+    stats = Counter()
+    
+    success, post_id = save_post("p1", account_id, "Hello", posted_at=START, comment_count=1, stats=stats)
+    assert success
+    assert save_post("p1", account_id, "Hello", posted_at=START, comment_count=1, stats=stats) == (True, post_id)
+    assert save_post("p1", account_id, "Hello!", posted_at=START, comment_count=1, stats=stats) == (True, post_id)
+    
+    assert stats == Counter(inserted=1, unchanged=1, updated=1)
+
+def test_save_posts_returns_ids_of_new_and_already_stored_posts(account_id):
+    _, existing_id = save_post("p1", account_id, "Synced first", posted_at=START)
+    
+    ids = save_posts([
+        ("p1", account_id, "Published", None, START),
+        ("p2", account_id, "Published", None, START),
+    ])
+    
+    assert ids["p1"] == existing_id
+    assert set(ids) == {"p1", "p2"}
+    assert count_posts_by_account(account_id) == 2
+
+def test_denormalized_post_counts_follow_saves_and_deletes(settings, account_id):
+    settings["denormalized_counts"] = True
+    
+    _, first_id = save_post("p1", account_id, "One", posted_at=START)
+    save_post("p1", account_id, "One", posted_at=START)
+    save_posts([("p1", account_id, "One", None, START), ("p2", account_id, "Two", None, START)])
+    assert count_posts_by_account(account_id) == 2
+    
+    delete_post(first_id)
+    assert count_posts_by_account(account_id) == 1
+
+def test_feed_pages_cover_every_post_once_newest_first(user_id, account_id):
+    # Pairs of posts share a timestamp, so the id tie-break is exercised
+    for number in range(25):
+        save_post(f"p{number}", account_id, f"Post {number}", posted_at=START + timedelta(hours=number // 2))
+    
+    pages = []
+    cursor = None
+    while True:
+        posts, cursor = get_feed_page(user_id, cursor=cursor, limit=10)
+        pages.append(posts)
+        if cursor is None:
+            break
+    
+    assert [len(posts) for posts in pages] == [10, 10, 5]
+    feed = [post for posts in pages for post in posts]
+    keys = [(post["posted_at"], post["id"]) for post in feed]
+    assert len(set(keys)) == 25
+    assert keys == sorted(keys, reverse=True)
+
+def test_feed_page_filters_by_account(user_id, account_id):
+    from database.account_db import add_facebook_account
+    _, other_id = add_facebook_account(user_id, "Other Page", "other-token", "page-2")
+    save_post("p1", account_id, "Mine", posted_at=START)
+    save_post("p2", other_id, "Other", posted_at=START)
+    
+    posts, cursor = get_feed_page(user_id, account_ids=[other_id])
+    
+    assert [post["fb_post_id"] for post in posts] == ["p2"]
+    assert cursor is None
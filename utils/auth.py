@@ -1,28 +1,160 @@
 import streamlit as st
-from database.user_db import authenticate_user, get_user_by_id
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+from config import get_setting
+from database.user_db import get_user_credentials, get_password_hasher, update_password_hash
 
-def login_user(username, password):
-    """Log in a user and set session state"""
-    success, result = authenticate_user(username, password)
+# Login throttling defaults: attempts allowed per sliding window
+LOGIN_WINDOW_SECONDS = 300
+MAX_ATTEMPTS_PER_USERNAME = 5
+MAX_ATTEMPTS_PER_IP = 20
+
+class LoginThrottle:
+    """Sliding-window attempt counter keyed by username and client IP"""
+    
+    def __init__(self):
+        self.attempts = {}
+        self.lock = threading.Lock()
     
-    if success:
-        user_id = result
-        user_info = get_user_by_id(user_id)
+    def _prune(self, key, now, window):
+        history = self.attempts.get(key)
+        if history is None:
+            return None
+        while history and history[0] <= now - window:
+            history.popleft()
+        if not history:
+            del self.attempts[key]
+            return None
+        return history
+    
+    def check_and_record(self, keys, window):
+        """Record an attempt for every key unless one of them is over its limit
         
-        # Set session state variables
-        st.session_state.authenticated = True
-        st.session_state.user_id = user_id
-        st.session_state.username = user_info["username"]
+        keys is a list of (key, limit) pairs. Returns the number of seconds to
+        wait when throttled, or 0 when the attempt may proceed.
+        """
+        now = time.monotonic()
+        with self.lock:
+            for key, limit in keys:
+                history = self._prune(key, now, window)
+                if history and len(history) >= limit:
+                    return int(history[0] + window - now) + 1
+            
+            for key, _ in keys:
+                self.attempts.setdefault(key, deque()).append(now)
         
-        return True, "Login successful"
-    else:
+        return 0
+    
+    def reset(self, key):
+        """Forget recorded attempts for a key (after a successful login)"""
+        with self.lock:
+            self.attempts.pop(key, None)
+
+throttle = LoginThrottle()
+
+# Bcrypt runs in a small bounded pool so a burst of logins can't pin every core
+# or stall the Streamlit script threads of other sessions
+_verify_pool = None
+_verify_slots = None
+_pool_lock = threading.Lock()
+
+def _get_verify_pool():
+    """Create the bcrypt worker pool and its admission semaphore on first use"""
+    global _verify_pool, _verify_slots
+    with _pool_lock:
+        if _verify_pool is None:
+            workers = int(get_setting("login_workers", 2))
+            queue_size = int(get_setting("login_queue_size", workers * 4))
+            _verify_pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+            _verify_slots = threading.BoundedSemaphore(workers + queue_size)
+    return _verify_pool, _verify_slots
+
+def _verify_and_rehash(password, password_hash):
+    """Verify a password and compute a replacement hash if the cost changed"""
+    hasher = get_password_hasher()
+    if not hasher.verify(password, password_hash):
+        return False, None
+    
+    if hasher.needs_update(password_hash):
+        return True, hasher.hash(password)
+    
+    return True, None
+
+def verify_password(password, password_hash):
+    """Run bcrypt verification in the worker pool
+    
+    Returns (verified, new_hash) or (None, message) when the pool is saturated.
+    """
+    pool, slots = _get_verify_pool()
+    if not slots.acquire(blocking=False):
+        return None, "Too many logins in progress, please try again shortly"
+    
+    try:
+        future = pool.submit(_verify_and_rehash, password, password_hash)
+    except Exception:
+        slots.release()
+        raise
+    # The slot stays taken until the job is finished or cancelled, so timed-out
+    # logins still count against the bound while bcrypt runs for them
+    future.add_done_callback(lambda _: slots.release())
+    
+    try:
+        return future.result(timeout=float(get_setting("login_timeout", 10)))
+    except TimeoutError:
+        # Drop the job if it hasn't started; a running one finishes and frees its slot
+        future.cancel()
+        return None, "Login timed out, please try again"
+
+def get_client_ip():
+    """Get the client IP of the current session, if Streamlit exposes it"""
+    try:
+        return getattr(st.context, "ip_address", None)
+    except Exception:
+        return None
+
+def login_user(username, password):
+    """Log in a user and set session state"""
+    window = int(get_setting("login_window_seconds", LOGIN_WINDOW_SECONDS))
+    keys = [(f"user:{username.lower()}", int(get_setting("login_max_attempts_user", MAX_ATTEMPTS_PER_USERNAME)))]
+    client_ip = get_client_ip()
+    if client_ip:
+        keys.append((f"ip:{client_ip}", int(get_setting("login_max_attempts_ip", MAX_ATTEMPTS_PER_IP))))
+    
+    wait = throttle.check_and_record(keys, window)
+    if wait:
+        return False, f"Too many login attempts. Try again in {wait} seconds"
+    
+    # One query for id, username and hash
+    user = get_user_credentials(username)
+    if not user:
+        return False, "User not found"
+    
+    verified, result = verify_password(password, user["password_hash"])
+    if verified is None:
         return False, result
+    if not verified:
+        return False, "Invalid password"
+    
+    # Transparently upgrade the stored hash when the configured cost changed
+    if result:
+        update_password_hash(user["id"], result)
+    
+    throttle.reset(keys[0][0])
+    
+    # Set session state variables
+    st.session_state.authenticated = True
+    st.session_state.user_id = user["id"]
+    st.session_state.username = user["username"]
+    
+    return True, "Login successful"
 
 def check_auth():
     """Check if user is authenticated"""
     if "authenticated" not in st.session_state:
         st.session_state.authenticated = False
-        
+    
     return st.session_state.authenticated
 
 def logout_user():
@@ -0,0 +1,72 @@
+"""Cold-start import cost of the app and of each page
+
+Every target is imported in a fresh interpreter with -X importtime, and
+the self time of the modules it pulls in is summed per top-level package,
+so a slow page can be traced to the dependency that makes it slow:
+    
+    python -m utils.import_report
+    python -m utils.import_report --top 5 pages.dashboard
+"""
+import argparse
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def import_times(module):
+    """Import a module in a fresh interpreter and get [(module, self µs, cumulative µs)]"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=PROJECT_ROOT,
+        capture_output=True,
+        text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed: {result.stderr.strip().splitlines()[-1]}")
+    
+    rows = []
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        rows.append((name.strip(), int(self_us), int(cumulative_us)))
+    return rows
+
+def package_totals(rows):
+    """Sum self time per top-level package, slowest first"""
+    totals = defaultdict(int)
+    for name, self_us, _ in rows:
+        totals[name.split(".")[0]] += self_us
+    return sorted(totals.items(), key=lambda item: item[1], reverse=True)
+
+def report(module, top):
+    rows = import_times(module)
+    total = next((cumulative for name, _, cumulative in rows if name == module), sum(row[1] for row in rows))
+    
+    print(f"{module}: {total / 1000:.0f} ms, {len(rows)} modules")
+    for package, self_us in package_totals(rows)[:top]:
+        print(f"    {package:<24} {self_us / 1000:8.1f} ms")
+
+def main(argv=None):
+    from pages import PAGES
+    
+    parser = argparse.ArgumentParser(description="Report cold import time of the app and its pages")
+    parser.add_argument("modules", nargs="*", help="modules to import (default: app and every page)")
+    parser.add_argument("--top", type=int, default=8, help="packages listed per module")
+    args = parser.parse_args(argv)
+    
+    modules = args.modules or ["app"] + [f"pages.{module}" for module in PAGES.values()]
+    
+    failed = False
+    for module in modules:
+        try:
+            report(module, args.top)
+        except RuntimeError as e:
+            print(e, file=sys.stderr)
+            failed = True
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,4 +1,5 @@
 import streamlit as st
+from config import get_setting
 
 def init_session_state():
     """Initialize session state variables if they don't exist"""
@@ -49,3 +50,14 @@ def clear_current_selection():
     
     if "current_post_id" in st.session_state:
         st.session_state.current_post_id = None
+
+def is_admin(username):
+    """Check if a user may see the admin panel
+    
+    Only usernames listed in the admin_users setting (a list) qualify; nobody
+    does while it is unset or not a list.
+    """
+    admin_users = get_setting("admin_users")
+    if not isinstance(admin_users, (list, tuple)):
+        return False
+    return username in admin_users